@@ -0,0 +1,3 @@
+from .filters import FilterEngine, check_filter, load_filter_engine
+from .orderbook import BookSide, PairBook, VolumeGrid, calculate_price, volume_grid
+from .best_volume import BestVolume, best_volume, best_volume_list, best_volumes
@@ -0,0 +1,112 @@
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from analytics.orderbook import PairBook, VolumeGrid
+
+# Чистый профит на q купленных монет: bid_vol_usdt - ask_vol_usdt - maker_fee * ask_vol_usdt.
+# Покупается q монет по asks (стоимость A(q)), продаются дошедшие после вывода q - f по
+# bids (выручка B(q - f)), обе функции кусочно-линейные по накопленным объёмам уровней:
+#   P(q) = B(q - f) - (1 + m) * A(q)
+# P(q) тоже кусочно-линейна, её изломы - накопленные объёмы asks и накопленные объёмы
+# bids, сдвинутые на +f. Максимум линейной функции на отрезке - в одном из концов,
+# поэтому кандидаты - изломы внутри диапазона и его концы; поиск линейный по числу
+# уровней, без перебора объёмов.
+
+
+@dataclass(frozen=True)
+class BestVolume:
+    """Наилучший объём пары в диапазоне пользователя"""
+    volume_usdt: float   # потрачено на покупку
+    coins: float
+    buy_price: float
+    sell_price: float
+    spread: float
+    profit: float        # bid_vol_usdt - ask_vol_usdt, как profit в паре
+    net_profit: float    # profit минус maker_fee на покупку
+    total_fee: float
+
+
+def breakpoints(book: PairBook) -> np.ndarray:
+    """Изломы P(q) в монетах на (withdrawal_fee, max_coins] - кандидаты на максимум без ограничений"""
+    limit = book.max_coins()
+    points = np.union1d(book.asks.cum_amount, book.bids.cum_amount + book.withdrawal_fee)
+    return points[(points > book.withdrawal_fee) & (points <= limit)]
+
+
+def _net_profit(grid: VolumeGrid, maker_fee: float) -> np.ndarray:
+    net = grid.profit - maker_fee * grid.ask_vol_usdt
+    return np.where(grid.valid & np.isfinite(net), net, -np.inf)
+
+
+def _coin_range(book: PairBook, volume_min: np.ndarray, volume_max: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Диапазон пользователя в USDT покупки -> монеты; 0 - без ограничения"""
+    limit = book.max_coins()
+    q_min = np.where(volume_min > 0, book.asks.coins_for_quote(volume_min), 0.0)
+    q_max = np.where(volume_max > 0, book.asks.coins_for_quote(volume_max), limit)
+    # объём больше глубины стакана - ограничивает сам стакан
+    q_max = np.fmin(np.nan_to_num(q_max, nan=limit), limit)
+    q_min = np.nan_to_num(q_min, nan=np.inf)
+    # до вывода должна дойти хотя бы часть монет: q > withdrawal_fee
+    q_min = np.maximum(q_min, np.nextafter(book.withdrawal_fee, np.inf))
+    return q_min, q_max
+
+
+def best_volumes(book: PairBook, volume_min: Sequence[float], volume_max: Sequence[float]) -> Tuple[np.ndarray, VolumeGrid]:
+    """Наилучшие объёмы сразу для многих диапазонов (групп пользователей).
+
+    Возвращает (чистый профит, VolumeGrid в найденных объёмах). Где в диапазоне нет
+    исполнимого объёма, valid = False и профит -inf.
+    """
+    volume_min = np.asarray(volume_min, dtype=np.float64)
+    volume_max = np.asarray(volume_max, dtype=np.float64)
+    q_min, q_max = _coin_range(book, volume_min, volume_max)
+
+    # изломы считаются один раз на пару, на диапазон остаются маска и два конца
+    candidates = breakpoints(book)
+    candidate_net = _net_profit(book.evaluate_coins(candidates), book.maker_fee)
+    inside = (candidates[None, :] >= q_min[:, None]) & (candidates[None, :] <= q_max[:, None])
+    inside_net = np.where(inside, candidate_net[None, :], -np.inf)
+    inner = np.argmax(inside_net, axis=1) if len(candidates) else np.zeros(len(q_min), dtype=np.int64)
+
+    rows = np.arange(len(q_min))
+    options = np.stack((
+        candidates[inner] if len(candidates) else np.full(len(q_min), np.nan),
+        q_min, q_max,
+    ), axis=1)
+    options = np.where((q_min <= q_max)[:, None], options, np.nan)
+    options_net = _net_profit(book.evaluate_coins(options), book.maker_fee)
+    if len(candidates):
+        options_net[:, 0] = np.where(inside[rows, inner], inside_net[rows, inner], -np.inf)
+    best = np.argmax(options_net, axis=1)
+    return options_net[rows, best], book.evaluate_coins(options[rows, best])
+
+
+def _result(net: np.ndarray, grid: VolumeGrid, i: int) -> Optional[BestVolume]:
+    if not grid.valid[i]:
+        return None
+    return BestVolume(
+        volume_usdt=float(grid.ask_vol_usdt[i]),
+        coins=float(grid.coins[i]),
+        buy_price=float(grid.buy_price[i]),
+        sell_price=float(grid.sell_price[i]),
+        spread=float(grid.spread[i]),
+        profit=float(grid.profit[i]),
+        net_profit=float(net[i]),
+        total_fee=float(grid.total_fee[i]),
+    )
+
+
+def best_volume(book: PairBook, volume_min: float = 0.0, volume_max: float = 0.0) -> Optional[BestVolume]:
+    """Объём с наибольшим чистым профитом в [volume_min, volume_max] USDT (0 - без ограничения)"""
+    net, grid = best_volumes(book, [volume_min], [volume_max])
+    return _result(net, grid, 0)
+
+
+def best_volume_list(book: PairBook, ranges: Sequence[Tuple[float, float]]) -> List[Optional[BestVolume]]:
+    """best_volume для списка диапазонов (volume_min, volume_max) за один проход"""
+    if not ranges:
+        return []
+    net, grid = best_volumes(book, [r[0] for r in ranges], [r[1] for r in ranges])
+    return [_result(net, grid, i) for i in range(len(ranges))]
@@ -0,0 +1,260 @@
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+from sqlalchemy import select
+
+from config.main import SHARD_WORKERS, UPDATES_PINNED
+from database.cache import UserSettings, add_settings_listener, remove_settings_listener
+from database.main import AsyncSessionLocal
+from database.models import User
+from models.consts import EXCHANGES_LIST
+from models.models import ServerData
+
+logger = logging.getLogger(__name__)
+
+# Имя биржи из пары -> бит маски (в паре приходит "Mexc", в Go бывает "MEXC")
+EXCHANGE_BITS: Dict[str, int] = {name.lower(): bit for bit, name in EXCHANGES_LIST}
+
+# Диапазонные фильтры: значение пары, колонка min, колонка max
+_RANGES = (
+    ('spread', 'spread_min', 'spread_max'),
+    ('profit', 'profit_min', 'profit_max'),
+    ('volume', 'volume_min', 'volume_max'),
+)
+
+# Колонки движка. Фильтры хранятся уже "эффективными" границами: 0 (фильтр
+# выключен) заменён на -inf для минимума и +inf для максимума, поэтому проверка
+# каждого фильтра - одно сравнение без ветвлений
+_FLOAT_COLUMNS = (
+    'spread_min', 'spread_max', 'profit_min', 'profit_max', 'volume_min', 'volume_max',
+    'total_fee_max', 'daily_turnover_min',
+)
+_MIN_COLUMNS = frozenset(('spread_min', 'profit_min', 'volume_min', 'daily_turnover_min'))
+
+
+def _bound(column: str, value: float) -> float:
+    if value > 0:
+        return value
+    return -np.inf if column in _MIN_COLUMNS else np.inf
+
+
+def pair_ranges(pair: ServerData) -> Dict[str, tuple]:
+    """Диапазоны значений пары между минимальным (low) и максимальным (up) объёмом"""
+    up, low = pair.data.up, pair.data.low
+    volume_lo, volume_hi = sorted((low.ask_vol_usdt, up.ask_vol_usdt))
+    return {
+        'spread': tuple(sorted((low.spread, up.spread))),
+        'profit': tuple(sorted((low.profit, up.profit))),
+        'volume': (volume_lo, volume_hi),
+        # комиссия растёт с объёмом: минимальная - на минимальном объёме
+        'fee_min': pair.maker_fee * volume_lo + pair.withdrawal_fee,
+    }
+
+
+def check_filter(user: UserSettings, pair: ServerData) -> bool:
+    """Проверка одной пары для одного пользователя - эталон для FilterEngine.
+
+    Фильтр со значением 0 выключен. Диапазонный фильтр проходит, если диапазон
+    пары (от low до up объёма) пересекается с [min, max] пользователя.
+    """
+    if not user.active:
+        return False
+    ranges = pair_ranges(pair)
+    for value, min_column, max_column in _RANGES:
+        lo, hi = ranges[value]
+        if hi < _bound(min_column, getattr(user, min_column)):
+            return False
+        if lo > _bound(max_column, getattr(user, max_column)):
+            return False
+    if ranges['fee_min'] > _bound('total_fee_max', user.total_fee_max):
+        return False
+    if pair.volume24h < _bound('daily_turnover_min', user.daily_turnover_min):
+        return False
+    if user.check_contract and not pair.same_contracts:
+        return False
+    if user.blacklisted_withdraw_exchanges & EXCHANGE_BITS.get(pair.withdrawal_exchange.lower(), 0):
+        return False
+    if user.blacklisted_deposit_exchanges & EXCHANGE_BITS.get(pair.deposit_exchange.lower(), 0):
+        return False
+    if pair.symbol in user.blacklisted_coins or pair.withdrawal_network in user.blacklisted_nets:
+        return False
+    return True
+
+
+class FilterEngine:
+    """Фильтры всех пользователей в колонках NumPy: пара проверяется сразу для всех.
+
+    Строка на пользователя, удалённые строки переиспользуются. Черные списки
+    монет и сетей хранятся обратным индексом значение -> строки.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._rows: Dict[int, int] = {}   # tg_id -> строка
+        self._free: List[int] = []
+        self._size = 0                    # занятая часть колонок
+        self._capacity = 0
+        self._columns: Dict[str, np.ndarray] = {}
+        self._blacklists: Dict[str, Dict[str, Set[int]]] = {'coins': defaultdict(set), 'nets': defaultdict(set)}
+        self._blacklist_arrays: Dict[tuple, np.ndarray] = {}
+        self._row_blacklists: Dict[int, tuple] = {}
+        self._grow(capacity)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, tg_id: int) -> bool:
+        return tg_id in self._rows
+
+    def _grow(self, capacity: int):
+        dtypes = {name: np.float64 for name in _FLOAT_COLUMNS}
+        dtypes.update(
+            tg_id=np.int64,
+            live=np.bool_,
+            check_contract=np.bool_,
+            blacklisted_withdraw_exchanges=np.uint32,
+            blacklisted_deposit_exchanges=np.uint32,
+        )
+        for name, dtype in dtypes.items():
+            column = np.zeros(capacity, dtype=dtype)
+            if name in self._columns:
+                column[:self._size] = self._columns[name][:self._size]
+            self._columns[name] = column
+        self._capacity = capacity
+
+    @classmethod
+    def from_settings(cls, users: Iterable[UserSettings]) -> "FilterEngine":
+        users = list(users)
+        engine = cls(capacity=max(1024, len(users)))
+        for user in users:
+            engine.upsert(user)
+        return engine
+
+    def upsert(self, user: UserSettings):
+        """Добавляет или обновляет строку пользователя"""
+        row = self._rows.get(user.tg_id)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                if self._size == self._capacity:
+                    self._grow(self._capacity * 2)
+                row = self._size
+                self._size += 1
+            self._rows[user.tg_id] = row
+
+        columns = self._columns
+        columns['tg_id'][row] = user.tg_id
+        # неактивный пользователь хранится, но не проходит ни одну пару
+        columns['live'][row] = bool(user.active)
+        for name in _FLOAT_COLUMNS:
+            columns[name][row] = _bound(name, getattr(user, name))
+        columns['check_contract'][row] = bool(user.check_contract)
+        columns['blacklisted_withdraw_exchanges'][row] = user.blacklisted_withdraw_exchanges & 0xFFFFFFFF
+        columns['blacklisted_deposit_exchanges'][row] = user.blacklisted_deposit_exchanges & 0xFFFFFFFF
+        self._set_blacklists(row, tuple(user.blacklisted_coins), tuple(user.blacklisted_nets))
+
+    def remove(self, tg_id: int):
+        row = self._rows.pop(tg_id, None)
+        if row is None:
+            return
+        self._columns['live'][row] = False
+        self._set_blacklists(row, (), ())
+        self._free.append(row)
+
+    def apply(self, tg_id: int, user: Optional[UserSettings]):
+        """Слушатель изменений настроек (database.cache.add_settings_listener)"""
+        if user is None:
+            self.remove(tg_id)
+        else:
+            self.upsert(user)
+
+    def watch(self):
+        """Подписывает движок на коммиты изменений User в этом процессе"""
+        add_settings_listener(self.apply)
+
+    def unwatch(self):
+        remove_settings_listener(self.apply)
+
+    def _set_blacklists(self, row: int, coins: tuple, nets: tuple):
+        old_coins, old_nets = self._row_blacklists.pop(row, ((), ()))
+        for kind, old, new in (('coins', old_coins, coins), ('nets', old_nets, nets)):
+            if old == new:
+                continue
+            index = self._blacklists[kind]
+            for value in set(old) - set(new):
+                index[value].discard(row)
+                if not index[value]:
+                    del index[value]
+                self._blacklist_arrays.pop((kind, value), None)
+            for value in set(new) - set(old):
+                index[value].add(row)
+                self._blacklist_arrays.pop((kind, value), None)
+        if coins or nets:
+            self._row_blacklists[row] = (coins, nets)
+
+    def _blacklisted_rows(self, kind: str, value: str) -> Optional[np.ndarray]:
+        rows = self._blacklists[kind].get(value)
+        if not rows:
+            return None
+        key = (kind, value)
+        array = self._blacklist_arrays.get(key)
+        if array is None:
+            array = self._blacklist_arrays[key] = np.fromiter(rows, dtype=np.int64, count=len(rows))
+        return array
+
+    def match_mask(self, pair: ServerData) -> np.ndarray:
+        """Булева маска по строкам [0, size): пользователь получает пару"""
+        n = self._size
+        c = {name: column[:n] for name, column in self._columns.items()}
+        ranges = pair_ranges(pair)
+
+        mask = c['live'].copy()
+        for value, min_column, max_column in _RANGES:
+            lo, hi = ranges[value]
+            mask &= c[min_column] <= hi
+            mask &= c[max_column] >= lo
+        mask &= c['total_fee_max'] >= ranges['fee_min']
+        mask &= c['daily_turnover_min'] <= pair.volume24h
+        if not pair.same_contracts:
+            mask &= ~c['check_contract']
+
+        withdraw_bit = EXCHANGE_BITS.get(pair.withdrawal_exchange.lower(), 0)
+        if withdraw_bit:
+            mask &= (c['blacklisted_withdraw_exchanges'] & np.uint32(withdraw_bit)) == 0
+        deposit_bit = EXCHANGE_BITS.get(pair.deposit_exchange.lower(), 0)
+        if deposit_bit:
+            mask &= (c['blacklisted_deposit_exchanges'] & np.uint32(deposit_bit)) == 0
+
+        for kind, value in (('coins', pair.symbol), ('nets', pair.withdrawal_network)):
+            rows = self._blacklisted_rows(kind, value)
+            if rows is not None:
+                mask[rows] = False
+        return mask
+
+    def match(self, pair: ServerData) -> np.ndarray:
+        """tg_id пользователей, чьи фильтры проходит пара"""
+        # compress заметно быстрее индексации булевой маской при ~половине совпадений
+        return np.compress(self.match_mask(pair), self._columns['tg_id'][:self._size])
+
+    def count(self, pair: ServerData) -> int:
+        return int(np.count_nonzero(self.match_mask(pair)))
+
+
+async def load_filter_engine(watch: Optional[bool] = None) -> FilterEngine:
+    """Строит движок по таблице users; с watch=True дальше обновляется по коммитам.
+
+    По умолчанию подписка включается, только если все изменения пользователей проходят
+    через этот процесс (один процесс polling или webhook с привязкой). Иначе коммиты
+    других процессов движку не видны - его нужно периодически строить заново.
+    """
+    if watch is None:
+        watch = UPDATES_PINNED and SHARD_WORKERS == 0
+    async with AsyncSessionLocal() as session:
+        users = (await session.scalars(select(User))).all()
+        engine = FilterEngine.from_settings(UserSettings.from_user(user) for user in users)
+    if watch:
+        engine.watch()
+    logger.info(f"Filter engine loaded: {len(engine)} users")
+    return engine
@@ -0,0 +1,171 @@
+from dataclasses import dataclass
+from typing import Sequence, Union
+
+import numpy as np
+
+from models.compact import CompactOrderBook, CompactServerData
+from models.models import Order, ServerData
+
+# Объёмы стакана считаются как в сканере (и в данных mock_server_data):
+# на q монет покупка идёт по asks, а продаются дошедшие после вывода q - withdrawal_fee
+# монет по bids (CalculatePrice(bids, q - fee) в Go), цена - средневзвешенная (VWAP).
+#   ask_vol_usdt = buy_price * q                  потратили на покупку
+#   bid_vol_usdt = sell_price * (q - withdrawal_fee)  получили за монеты после вывода
+#   profit = bid_vol_usdt - ask_vol_usdt, spread = (sell - buy) / buy * 100
+# Комиссия - как в Go и превью: maker_fee * ask_vol_usdt + withdrawal_fee.
+
+
+def calculate_price(book: Sequence[Order], coins: float) -> float:
+    """Средневзвешенная цена coins монет по стакану, -1 если глубины не хватает (как CalculatePrice в Go)"""
+    total = 0.0
+    book_volume = 0.0
+    remaining = coins
+    for order in book:
+        book_volume += order.amount
+        if remaining <= order.amount:
+            total += remaining * order.price
+            break
+        remaining -= order.amount
+        total += order.amount * order.price
+    if book_volume < coins:
+        return -1
+    return total / coins
+
+
+class BookSide:
+    """Одна сторона стакана в массивах с накопленными суммами (ведущий 0)"""
+
+    __slots__ = ('prices', 'amounts', 'cum_amount', 'cum_quote')
+
+    def __init__(self, prices: np.ndarray, amounts: np.ndarray):
+        self.prices = prices
+        self.amounts = amounts
+        self.cum_amount = np.concatenate(([0.0], np.cumsum(amounts)))
+        self.cum_quote = np.concatenate(([0.0], np.cumsum(prices * amounts)))
+
+    @classmethod
+    def from_orders(cls, orders: Sequence[Order]) -> "BookSide":
+        prices = np.fromiter((order.price for order in orders), dtype=np.float64, count=len(orders))
+        amounts = np.fromiter((order.amount for order in orders), dtype=np.float64, count=len(orders))
+        return cls(prices, amounts)
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    @property
+    def total_amount(self) -> float:
+        return float(self.cum_amount[-1])
+
+    @property
+    def total_quote(self) -> float:
+        return float(self.cum_quote[-1])
+
+    def _level(self, cum: np.ndarray, target: np.ndarray) -> np.ndarray:
+        """Индекс уровня, на котором набирается target (по накопленной сумме cum)"""
+        return np.minimum(np.searchsorted(cum[1:], target, side='left'), max(len(self) - 1, 0))
+
+    def cost(self, coins: np.ndarray) -> tuple:
+        """(стоимость coins монет, число затронутых уровней). Без глубины - nan"""
+        coins = np.asarray(coins, dtype=np.float64)
+        if not len(self):
+            return np.full(coins.shape, np.nan), np.zeros(coins.shape, dtype=np.int64)
+        level = self._level(self.cum_amount, coins)
+        cost = self.cum_quote[level] + (coins - self.cum_amount[level]) * self.prices[level]
+        cost = np.where(coins <= self.cum_amount[-1], cost, np.nan)
+        return cost, level + 1
+
+    def vwap(self, coins: np.ndarray) -> np.ndarray:
+        """Средняя цена исполнения coins монет (nan без глубины или при coins = 0)"""
+        coins = np.asarray(coins, dtype=np.float64)
+        cost, _ = self.cost(coins)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return cost / coins
+
+    def coins_for_quote(self, quote: np.ndarray) -> np.ndarray:
+        """Сколько монет покупается на quote USDT (nan без глубины)"""
+        quote = np.asarray(quote, dtype=np.float64)
+        if not len(self):
+            return np.full(quote.shape, np.nan)
+        level = self._level(self.cum_quote, quote)
+        coins = self.cum_amount[level] + (quote - self.cum_quote[level]) / self.prices[level]
+        return np.where(quote <= self.cum_quote[-1], coins, np.nan)
+
+
+@dataclass(frozen=True)
+class VolumeGrid:
+    """Показатели пары для набора объёмов, по массиву на поле. valid - хватило глубины"""
+    coins: np.ndarray
+    buy_price: np.ndarray
+    sell_price: np.ndarray
+    ask_vol_usdt: np.ndarray
+    bid_vol_usdt: np.ndarray
+    profit: np.ndarray
+    spread: np.ndarray
+    total_fee: np.ndarray
+    ask_depth: np.ndarray
+    bid_depth: np.ndarray
+    valid: np.ndarray
+
+
+class PairBook:
+    """Стаканы пары в массивах: расчёт цен и профита сразу для сетки объёмов"""
+
+    __slots__ = ('asks', 'bids', 'maker_fee', 'withdrawal_fee')
+
+    def __init__(self, asks: BookSide, bids: BookSide, maker_fee: float, withdrawal_fee: float):
+        self.asks = asks
+        self.bids = bids
+        self.maker_fee = maker_fee
+        self.withdrawal_fee = withdrawal_fee
+
+    @classmethod
+    def from_pair(cls, pair: Union[ServerData, CompactServerData]) -> "PairBook":
+        book = pair.order_book
+        if isinstance(book, CompactOrderBook):
+            # стакан уже в массивах - стороны берутся представлениями
+            asks = BookSide(book.ask_prices, book.ask_amounts)
+            bids = BookSide(book.bid_prices, book.bid_amounts)
+        else:
+            asks = BookSide.from_orders(book.asks)
+            bids = BookSide.from_orders(book.bids)
+        return cls(asks, bids, pair.maker_fee, pair.withdrawal_fee)
+
+    def max_coins(self) -> float:
+        """Наибольший объём покупки в монетах, который можно купить и после вывода продать"""
+        return min(self.asks.total_amount, self.bids.total_amount + self.withdrawal_fee)
+
+    def evaluate_coins(self, coins: np.ndarray) -> VolumeGrid:
+        """Показатели для объёмов в монетах"""
+        coins = np.asarray(coins, dtype=np.float64)
+        # продаётся то, что дошло после комиссии вывода
+        sold = coins - self.withdrawal_fee
+        ask_cost, ask_depth = self.asks.cost(coins)
+        bid_cost, bid_depth = self.bids.cost(sold)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            buy_price = ask_cost / coins
+            sell_price = bid_cost / sold
+            spread = (sell_price - buy_price) / buy_price * 100
+        valid = ~np.isnan(ask_cost) & ~np.isnan(bid_cost) & (sold > 0)
+        return VolumeGrid(
+            coins=coins,
+            buy_price=buy_price,
+            sell_price=sell_price,
+            ask_vol_usdt=ask_cost,
+            bid_vol_usdt=bid_cost,
+            profit=bid_cost - ask_cost,
+            spread=spread,
+            total_fee=self.maker_fee * ask_cost + self.withdrawal_fee,
+            ask_depth=ask_depth,
+            bid_depth=bid_depth,
+            valid=valid,
+        )
+
+    def evaluate_volumes(self, volumes_usdt: np.ndarray) -> VolumeGrid:
+        """Показатели для объёмов покупки в USDT (как volume_min/volume_max фильтров)"""
+        return self.evaluate_coins(self.asks.coins_for_quote(volumes_usdt))
+
+
+def volume_grid(pair: ServerData, volumes_usdt: Sequence[float]) -> VolumeGrid:
+    """Сетка объёмов в USDT для пары - короткий путь для превью и аналитики"""
+    return PairBook.from_pair(pair).evaluate_volumes(np.asarray(volumes_usdt, dtype=np.float64))
+
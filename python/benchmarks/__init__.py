@@ -0,0 +1 @@
+from .main import compare, measure, run_benchmarks
@@ -0,0 +1,354 @@
+import itertools
+import json
+import random
+from contextlib import contextmanager
+from types import SimpleNamespace
+from dataclasses import asdict, replace
+from typing import Any, Callable, Dict, List, Tuple
+
+from database.cache import UserSettings, user_cache
+from models.consts import (
+    EXCHANGE_BYBIT_BIT, EXCHANGE_KUCOIN_BIT, EXCHANGE_MEXC_BIT,
+    PROFIT_MIN_BIT, SPREAD_MAX_BIT, WITHDRAW_TIME_BIT,
+)
+
+BENCH_TG_ID = 1000001
+
+# Типичный пользователь: часть бирж и параметров выключена, фильтры заданы
+SETTINGS = UserSettings(
+    tg_id=BENCH_TG_ID,
+    active=True,
+    spread_min=0.5,
+    spread_max=15.0,
+    profit_min=3.0,
+    profit_max=0.0,
+    volume_min=100.0,
+    volume_max=100.0,
+    total_fee_max=2.5,
+    daily_turnover_min=0.0,
+    check_contract=True,
+    notification_frequency=900,
+    blacklisted_deposit_exchanges=EXCHANGE_KUCOIN_BIT | EXCHANGE_BYBIT_BIT,
+    blacklisted_withdraw_exchanges=EXCHANGE_MEXC_BIT,
+    blacklisted_coins=("BTC", "ETH", "USDT"),
+    blacklisted_nets=("TRC20",),
+    blacklisted_params=SPREAD_MAX_BIT | PROFIT_MIN_BIT | WITHDRAW_TIME_BIT,
+)
+
+# Ввод для process_custom_frequency: все ветки форматирования длительности
+FREQUENCY_INPUTS = ("45s", "1m", "3m20s", "1h", "2h15m", "5h1m1s")
+
+# Рассылка пары: большинство не трогает параметры сообщения, остальные делят пару десятков масок
+# и несколько типичных диапазонов объёма (от них зависит блок наилучшего объёма)
+FANOUT_USERS = 10_000
+FANOUT_MASKS = 24
+FANOUT_RANGES = ((100.0, 100.0), (0.0, 0.0), (50.0, 500.0), (100.0, 1000.0), (500.0, 0.0))
+
+
+def fanout_users(count: int = FANOUT_USERS, masks: int = FANOUT_MASKS, seed: int = 1) -> List[UserSettings]:
+    rng = random.Random(seed)
+    popular = [0] + [rng.getrandbits(10) for _ in range(masks - 1)]
+    weights = [0.6] + [0.4 / (masks - 1)] * (masks - 1)
+    return [
+        replace(
+            SETTINGS,
+            tg_id=BENCH_TG_ID + i,
+            blacklisted_params=rng.choices(popular, weights)[0],
+            volume_min=volume_min,
+            volume_max=volume_max,
+        )
+        for i, (volume_min, volume_max) in enumerate(
+            (rng.choice(FANOUT_RANGES) for _ in range(count)), start=1)
+    ]
+
+
+# Движок фильтров: разброс значений, при котором пару проходит заметная часть пользователей
+FILTER_USERS = 100_000
+
+
+def filter_users(count: int = FILTER_USERS, seed: int = 1) -> List[UserSettings]:
+    rng = random.Random(seed)
+    return [
+        replace(
+            SETTINGS,
+            tg_id=BENCH_TG_ID + i,
+            spread_min=rng.choice((0.0, 0.0, 0.3, 1.0)),
+            spread_max=rng.choice((0.0, 0.0, 2.0, 20.0)),
+            profit_min=rng.choice((0.0, 0.0, 1.0, 5.0)),
+            volume_min=rng.choice((0.0, 100.0, 300.0)),
+            volume_max=rng.choice((0.0, 500.0, 5000.0)),
+            total_fee_max=rng.choice((0.0, 10.0, 500.0)),
+            check_contract=rng.random() < 0.5,
+            blacklisted_withdraw_exchanges=rng.getrandbits(17) & rng.getrandbits(17),
+            blacklisted_deposit_exchanges=rng.getrandbits(17) & rng.getrandbits(17),
+            blacklisted_coins=tuple(rng.sample(("BTC", "ETH", "SOL", "XRP"), rng.randint(0, 2))),
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+async def _noop(*args, **kwargs):
+    return None
+
+
+def _message(text: str = "") -> Any:
+    return SimpleNamespace(
+        text=text,
+        from_user=SimpleNamespace(id=BENCH_TG_ID),
+        answer=_noop,
+        edit_text=_noop,
+    )
+
+
+def _callback(data: str) -> Any:
+    return SimpleNamespace(
+        data=data,
+        from_user=SimpleNamespace(id=BENCH_TG_ID),
+        message=_message(),
+        answer=_noop,
+    )
+
+
+class _Session:
+    """Сессия-заглушка: обработчик открывает транзакцию, но запись подменена"""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def begin(self):
+        return self
+
+
+async def _set_filters(session, tg_id, **values):
+    return SETTINGS
+
+
+@contextmanager
+def _patched(module, **attrs):
+    saved = {name: getattr(module, name) for name in attrs}
+    for name, value in attrs.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(module, name, value)
+
+
+def prepare():
+    """Кладёт пользователя в кэш настроек - обработчики читают его без БД.
+    Кэш реальных пар заполняется, превью строится по ним, а не по примеру."""
+    from pairs.live import live_pairs
+
+    user_cache.put(SETTINGS)
+    for pair in live_pairs_sample():
+        live_pairs.put(pair)
+
+
+# Глубокий стакан для расчёта сетки объёмов: BOOK_LEVELS уровней, GRID_POINTS объёмов
+BOOK_LEVELS = 200
+GRID_POINTS = 256
+
+
+# Кэш реальных пар для превью: маршруты с разбросом значений, часть проходит фильтры SETTINGS
+LIVE_PAIRS = 1000
+LIVE_SYMBOLS = ("BTC", "ETH", "SOL", "XRP", "DOGE", "TON", "ADA", "LTC", "TRX", "DOT")
+LIVE_EXCHANGES = ("Mexc", "Kucoin", "Bybit", "Gate", "OKX", "Bitget", "Htx")
+
+
+def live_pairs_sample(count: int = LIVE_PAIRS, seed: int = 1) -> list:
+    from models.compact import CompactServerData
+    from models.models import mock_server_data
+
+    rng = random.Random(seed)
+    base = CompactServerData.from_server_data(mock_server_data())
+    pairs = []
+    for i in range(count):
+        up = replace(base.data.up, spread=rng.uniform(0, 10), profit=rng.uniform(-5, 50))
+        low = replace(base.data.low, spread=rng.uniform(0, 10), profit=rng.uniform(-5, 20),
+                      ask_vol_usdt=rng.uniform(50, 500))
+        pairs.append(replace(
+            base,
+            symbol=f"{rng.choice(LIVE_SYMBOLS)}{i % 100}",
+            withdrawal_exchange=rng.choice(LIVE_EXCHANGES),
+            deposit_exchange=rng.choice(LIVE_EXCHANGES),
+            data=replace(base.data, up=up, low=low),
+            maker_fee=rng.uniform(0.0005, 0.003),
+            same_contracts=rng.random() < 0.7,
+        ))
+    return pairs
+
+
+# Пачка сообщений канала: глубина стаканов от 5 до BOOK_LEVELS уровней
+UPDATE_BATCH = 100
+
+
+def update_message(pair) -> bytes:
+    return json.dumps({"type": "update_data", "update": asdict(pair)}).encode()
+
+
+def update_messages(count: int = UPDATE_BATCH, seed: int = 1) -> List[bytes]:
+    rng = random.Random(seed)
+    return [update_message(deep_pair(rng.randint(5, BOOK_LEVELS), seed + i)) for i in range(count)]
+
+
+def deep_pair(levels: int = BOOK_LEVELS, seed: int = 1):
+    from models.models import Order, OrderBook, mock_server_data
+
+    rng = random.Random(seed)
+    pair = mock_server_data()
+    asks, bids = [], []
+    ask, bid = 100.0, 100.5
+    for _ in range(levels):
+        ask += rng.uniform(0.01, 0.2)
+        bid -= rng.uniform(0.01, 0.2)
+        asks.append(Order(ask, rng.uniform(0.1, 5)))
+        bids.append(Order(bid, rng.uniform(0.1, 5)))
+    pair.order_book = OrderBook(asks=asks, bids=bids)
+    return pair
+
+
+def build_cases() -> Dict[str, Tuple[Callable, bool]]:
+    """Имя -> (функция одной операции, асинхронная ли она)"""
+    from handlers import callbacks, commands, state
+    from aiogram.methods import EditMessageText, SendMessage
+    from analytics.filters import FilterEngine
+    from aiogram.fsm.storage.base import StorageKey
+    from aiogram.fsm.storage.redis import RedisStorage
+    from redis.asyncio import Redis
+    from clients.telegram import EditDeduplicator, TelegramRequestScheduler
+    from states.storage import TieredStorage
+    from analytics.best_volume import best_volume, best_volume_list
+    from analytics.orderbook import PairBook, calculate_price
+    from keyboards.main import category_params_keyboard, get_exchanges_keyboard
+    from models.models import mock_server_data
+    from models.compact import CompactServerData
+    from pairs.main import decode_update, decode_update_json, server_data_from_dict
+    from pairs.live import LivePairCache
+    from pairs.wire import PairDecoder
+    from texts.main import exchanges_text
+    from texts.pair import group_by_params, render_pair, render_pair_groups
+
+    withdraw = SETTINGS.blacklisted_withdraw_exchanges
+    deposit = SETTINGS.blacklisted_deposit_exchanges
+    filters_message = _message("/filters")
+    filters_back = _callback("filters_back")
+    show_msg = _callback("show_msg")
+    edit_exchanges = _callback("edit_exchanges")
+    fsm = SimpleNamespace(clear=_noop)
+    frequency_messages = [_message(text) for text in FREQUENCY_INPUTS]
+    pair = mock_server_data()
+    users = fanout_users()
+    engine = FilterEngine.from_settings(filter_users())
+    changed = replace(filter_users(1)[0], spread_min=0.5)
+    deep = deep_pair()
+    book = PairBook.from_pair(deep)
+    grid_coins = [book.max_coins() * (i + 1) / GRID_POINTS for i in range(GRID_POINTS)]
+    volume_ranges = [(float(lo), float(lo * 10)) for lo in range(0, 6400, 100)]
+    deep_payload = asdict(deep)
+    deep_compact = CompactServerData.from_server_data(deep)
+    deep_message = update_message(deep)
+    batch = update_messages()
+    decoder = PairDecoder()
+    live = LivePairCache(max_pairs=LIVE_PAIRS)
+    live_stream = itertools.cycle(live_pairs_sample(seed=2))
+    for pair in live_pairs_sample():
+        live.put(pair)
+
+    # лимиты не достигаются: замеряется только накладной расход планировщика на запрос
+    scheduler = TelegramRequestScheduler(rate=1e9, chat_rate=1e9, chat_burst=1e9)
+    sends = itertools.cycle([SendMessage(chat_id=i, text="x") for i in range(1000)])
+    # повторная отрисовка страницы бирж тем же текстом и клавиатурой
+    dedup = EditDeduplicator()
+    same_edit = EditMessageText(
+        chat_id=BENCH_TG_ID, message_id=1, parse_mode="HTML", text=exchanges_text(withdraw, deposit),
+        reply_markup=get_exchanges_keyboard(withdraw, deposit, 0),
+    )
+
+    # состояние пользователя уже в кэше: Redis не вызывается (соединение не открывается)
+    fsm_storage = TieredStorage(RedisStorage(Redis()))
+    fsm_key = StorageKey(bot_id=1, chat_id=BENCH_TG_ID, user_id=BENCH_TG_ID)
+    fsm_storage._put(fsm_key, None, {})
+
+    def live_put_find():
+        # поток обновлений и превью вперемешку: новая пара, затем поиск для того же пользователя
+        live.put(next(live_stream))
+        return live.find(SETTINGS)
+
+    def grid_loop():
+        # как в Go: CalculatePrice по циклу для каждого объёма и каждой стороны
+        for coins in grid_coins:
+            calculate_price(deep.order_book.asks, coins)
+            calculate_price(deep.order_book.bids, coins)
+
+    async def custom_frequency():
+        with _patched(state, AsyncSessionLocal=_Session, set_filters=_set_filters):
+            for message in frequency_messages:
+                await state.process_custom_frequency(message, fsm)
+
+    return {
+        'keyboard.exchanges_page0': (lambda: get_exchanges_keyboard(withdraw, deposit, 0), False),
+        'keyboard.exchanges_page1': (lambda: get_exchanges_keyboard(withdraw, deposit, 1), False),
+        'keyboard.category_max_volume': (
+            lambda: category_params_keyboard("max_volume_params", SETTINGS.blacklisted_params, 0), False),
+        'keyboard.category_additional': (
+            lambda: category_params_keyboard("additional_params", SETTINGS.blacklisted_params, 0), False),
+        'handler.filters_cmd': (lambda: commands.filters_cmd(filters_message), True),
+        'handler.filters_back': (lambda: callbacks.cb_filters_back(filters_back), True),
+        'handler.edit_exchanges': (lambda: callbacks.cb_edit_exchanges(edit_exchanges), True),
+        'handler.show_msg': (lambda: callbacks.cb_show_msg(show_msg), True),
+        # одна операция - FREQUENCY_INPUTS целиком, по вводу на каждую ветку
+        'handler.custom_frequency': (custom_frequency, True),
+        'pair.render': (
+            lambda: render_pair(pair, SETTINGS.blacklisted_params, SETTINGS.volume_min, SETTINGS.volume_max), False),
+        # одна операция - рассылка одной пары FANOUT_USERS пользователям
+        'pair.fanout_10k_per_user': (
+            lambda: [render_pair(pair, u.blacklisted_params, u.volume_min, u.volume_max) for u in users], False),
+        'pair.fanout_10k_grouped': (lambda: render_pair_groups(pair, group_by_params(users)), False),
+        # одна операция - tg_id всех FILTER_USERS пользователей, которым подходит пара
+        'analytics.filter_match_100k': (lambda: engine.match(pair), False),
+        'analytics.filter_upsert': (lambda: engine.upsert(changed), False),
+        # одна операция - GRID_POINTS объёмов по стакану из BOOK_LEVELS уровней
+        'analytics.volume_grid_loop': (grid_loop, False),
+        'analytics.volume_grid_vectorized': (
+            lambda: PairBook.from_pair(deep).evaluate_coins(grid_coins), False),
+        # разбор JSON-словаря пары со стаканами по BOOK_LEVELS уровней и её стакан в массивах
+        'models.decode_dataclasses': (lambda: server_data_from_dict(deep_payload), False),
+        'models.decode_compact': (lambda: CompactServerData.from_dict(deep_payload), False),
+        'analytics.pair_book_compact': (lambda: PairBook.from_pair(deep_compact), False),
+        # сообщение канала обновлений (bytes, как от redis) -> пара
+        'pairs.decode_json': (lambda: decode_update_json(deep_message), False),
+        'pairs.decode_wire': (lambda: decode_update(deep_message), False),
+        # одна операция - UPDATE_BATCH сообщений со стаканами разной глубины
+        'pairs.decode_json_batch': (lambda: [decode_update_json(m) for m in batch], False),
+        'pairs.decode_wire_batch': (lambda: [decode_update(m) for m in batch], False),
+        'pairs.decode_batch': (lambda: decoder.decode_batch(batch), False),
+        # кэш LIVE_PAIRS маршрутов: добавление пары и поиск свежей под фильтры пользователя
+        'pairs.live_put_find': (live_put_find, False),
+        # sendMessage через планировщик исходящих запросов (запрос к API - заглушка)
+        'telegram.scheduler_overhead': (lambda: scheduler(_noop, None, next(sends)), True),
+        'telegram.edit_dedup_skip': (lambda: dedup(_noop, None, same_edit), True),
+        'fsm.get_state_cached': (lambda: fsm_storage.get_state(fsm_key), True),
+        # наилучший объём по стакану из BOOK_LEVELS уровней: один диапазон и 64 диапазона групп
+        'analytics.best_volume': (lambda: best_volume(PairBook.from_pair(deep), 100.0, 5000.0), False),
+        'analytics.best_volume_64_ranges': (
+            lambda: best_volume_list(PairBook.from_pair(deep), volume_ranges), False),
+    }
+
+
+def build_memory_cases() -> Dict[str, Callable]:
+    """Имя -> фабрика одного объекта; замеряется память на объект"""
+    from models.compact import CompactServerData
+    from pairs.main import decode_update, server_data_from_dict
+
+    # пара как после разбора сообщения канала: каждый уровень - отдельный объект
+    payload = asdict(deep_pair())
+    message = update_message(deep_pair())
+    return {
+        'memory.pair_dataclasses': lambda: server_data_from_dict(payload),
+        'memory.pair_compact': lambda: CompactServerData.from_dict(payload),
+        'memory.pair_wire': lambda: decode_update(message),
+    }
@@ -0,0 +1,191 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Optional
+
+# Бенчмарки не ходят в Telegram, но config.main требует токен
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:benchmark")
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "baseline.json")
+
+
+async def _run_async(fn: Callable, loops: int) -> float:
+    started = time.perf_counter()
+    for _ in range(loops):
+        await fn()
+    return time.perf_counter() - started
+
+
+def _run_sync(fn: Callable, loops: int) -> float:
+    started = time.perf_counter()
+    for _ in range(loops):
+        fn()
+    return time.perf_counter() - started
+
+
+def measure(fn: Callable, is_async: bool, loop: asyncio.AbstractEventLoop,
+            min_time: float = 0.1, repeat: int = 5) -> Dict[str, float]:
+    """Время одной операции: подбираем loops так, чтобы серия шла >= min_time, берём лучшую из repeat серий"""
+    run = (lambda n: loop.run_until_complete(_run_async(fn, n))) if is_async else (lambda n: _run_sync(fn, n))
+    run(1)  # прогрев: импорты, ленивые кэши aiogram/pydantic
+
+    loops = 1
+    while True:
+        elapsed = run(loops)
+        if elapsed >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    timings = [elapsed] + [run(loops) for _ in range(repeat - 1)]
+    return {
+        'per_op_us': round(min(timings) / loops * 1e6, 3),
+        'loops': loops,
+        'repeat': repeat,
+    }
+
+
+def measure_memory(factory: Callable, count: int = 1000) -> Dict[str, float]:
+    """Память на объект: tracemalloc вокруг создания count объектов, которые живут до замера"""
+    factory()  # прогрев: кэши, интернированные строки
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        objects = [factory() for _ in range(count)]
+        used = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del objects
+    return {'bytes_per_op': round(used / count, 1), 'count': count}
+
+
+def run_benchmarks(name_filter: str = "", min_time: float = 0.1, repeat: int = 5) -> Dict:
+    from benchmarks.cases import build_cases, build_memory_cases, prepare
+
+    prepare()
+    cases = build_cases()
+    loop = asyncio.new_event_loop()
+    results = {}
+    try:
+        for name, (fn, is_async) in cases.items():
+            if name_filter and name_filter not in name:
+                continue
+            results[name] = measure(fn, is_async, loop, min_time=min_time, repeat=repeat)
+            print(f"{name:<36} {results[name]['per_op_us']:>12.2f} us")
+    finally:
+        loop.close()
+    memory = {}
+    for name, factory in build_memory_cases().items():
+        if name_filter and name_filter not in name:
+            continue
+        memory[name] = measure_memory(factory)
+        print(f"{name:<36} {memory[name]['bytes_per_op']:>12.0f} B")
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'machine': platform.machine(),
+            'created_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        'results': results,
+        'memory': memory,
+    }
+
+
+def _regressed(current: float, base: float, tolerance: float, min_delta: float) -> bool:
+    """Регрессия - замедление и больше tolerance, и больше min_delta в абсолютных единицах.
+
+    Для операций короче микросекунды 20% - это десятки наносекунд, на уровне шума
+    таймера и частоты процессора; порог по абсолютной разнице отсекает такие срабатывания.
+    """
+    return current > base * (1 + tolerance) and current - base > min_delta
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float,
+            min_delta_us: float = 0.5, min_delta_bytes: float = 32) -> bool:
+    """Печатает изменения относительно baseline. False - есть регрессия больше tolerance и шума"""
+    ok = True
+    print(f"\n{'benchmark':<36} {'baseline, us':>12} {'current, us':>12} {'change':>8}")
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:<36} {'-':>12} {result['per_op_us']:>12.2f} {'new':>8}")
+            continue
+        change = result['per_op_us'] / base['per_op_us'] - 1
+        mark = ""
+        if _regressed(result['per_op_us'], base['per_op_us'], tolerance, min_delta_us):
+            mark = "  REGRESSION"
+            ok = False
+        print(f"{name:<36} {base['per_op_us']:>12.2f} {result['per_op_us']:>12.2f} {change:>+8.1%}{mark}")
+    baseline_memory = baseline.get('memory', {})
+    for name, result in current.get('memory', {}).items():
+        base = baseline_memory.get(name)
+        if base is None:
+            print(f"{name:<36} {'-':>12} {result['bytes_per_op']:>10.0f} B {'new':>8}")
+            continue
+        change = result['bytes_per_op'] / base['bytes_per_op'] - 1
+        mark = ""
+        if _regressed(result['bytes_per_op'], base['bytes_per_op'], tolerance, min_delta_bytes):
+            mark = "  REGRESSION"
+            ok = False
+        print(f"{name:<36} {base['bytes_per_op']:>10.0f} B {result['bytes_per_op']:>10.0f} B {change:>+8.1%}{mark}")
+    missing = sorted(set(baseline['results']) - set(current['results']))
+    if missing:
+        print(f"Not measured: {', '.join(missing)}")
+    return ok
+
+
+def _save(result: Dict, path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    print(f"Saved to {path}")
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Микробенчмарки рендеринга меню и клавиатур")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="замерить и (опционально) сохранить baseline")
+    run_parser.add_argument("--save", default="", help="путь для JSON с результатами")
+
+    compare_parser = commands.add_parser("compare", help="замерить и сравнить с baseline")
+    compare_parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    compare_parser.add_argument("--tolerance", type=float, default=0.2, help="допустимое замедление, 0.2 = 20%%")
+    compare_parser.add_argument("--min-delta-us", type=float, default=0.5,
+                                help="меньшее замедление в микросекундах считается шумом")
+    compare_parser.add_argument("--min-delta-bytes", type=float, default=32,
+                                help="меньший рост памяти на объект в байтах считается шумом")
+
+    for sub in (run_parser, compare_parser):
+        sub.add_argument("--filter", default="", help="только бенчмарки, имя которых содержит строку")
+        sub.add_argument("--min-time", type=float, default=0.1, help="минимальная длительность серии, с")
+        sub.add_argument("--repeat", type=int, default=5)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    result = run_benchmarks(args.filter, min_time=args.min_time, repeat=args.repeat)
+
+    if args.command == "run":
+        if args.save:
+            _save(result, args.save)
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if not compare(result, baseline, args.tolerance, args.min_delta_us, args.min_delta_bytes):
+        print(f"\nRegression over {args.tolerance:.0%} against {args.baseline}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+from typing import Dict, Generic, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class FilterSyncCoalescer(Generic[T]):
+    """Склейка обновлений фильтров перед отправкой в gRPC.
+
+    Обновления копятся по ключу (tg_id, filter), повторное обновление того же ключа
+    заменяет предыдущее и переносит ключ в конец - порядок отправки по последнему
+    изменению. drain() отдаёт по одному (самому свежему) обновлению на ключ. Окно, за
+    которое копятся обновления, задаёт владелец: FilterSyncOutboxWorker склеивает
+    события outbox, накопившиеся за SYNC_DEBOUNCE_MS и пачку строк.
+    """
+
+    def __init__(self):
+        self._pending: Dict[Tuple[int, str], T] = {}
+
+        self.submitted = 0  # всего принято обновлений
+        self.merged = 0     # обновлений, заменённых более свежим значением
+
+    def submit(self, tg_id: int, filter_name: str, update: T):
+        """Ставит обновление в очередь; более раннее значение того же фильтра отбрасывается"""
+        self.submitted += 1
+        key = (tg_id, filter_name)
+        if key in self._pending:
+            self.merged += 1
+            # сохраняем порядок: перемещаем фильтр в конец
+            del self._pending[key]
+        self._pending[key] = update
+
+    def drain(self) -> List[T]:
+        """Забирает накопленные обновления, по одному на (tg_id, filter)"""
+        updates = list(self._pending.values())
+        self._pending.clear()
+        return updates
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'submitted': self.submitted,
+            'merged': self.merged,
+            'pending': len(self._pending),
+        }
@@ -1,6 +1,11 @@
+import asyncio
+import itertools
+import time
 import grpc
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Sequence, Tuple
+
+from monitoring.metrics import observe_grpc
 
 logger = logging.getLogger(__name__)
 
@@ -9,52 +14,189 @@ try:
 except Exception:
     from models.genproto import filter_sync_pb2_grpc, filter_sync_pb2
 
+
+def _channel_options(keepalive_ms: int) -> List[tuple]:
+    """Параметры канала: keepalive, чтобы соединение не закрывалось между редкими вызовами"""
+    return [
+        ("grpc.keepalive_time_ms", keepalive_ms),
+        ("grpc.keepalive_timeout_ms", 10000),
+        ("grpc.keepalive_permit_without_calls", 1),
+        ("grpc.http2.max_pings_without_data", 0),
+        # отдельный subchannel на каждый канал пула, иначе gRPC объединит их в одно соединение
+        ("grpc.use_local_subchannel_pool", 1),
+    ]
+
+
 class FilterSyncClient:
-    def __init__(self, target: str, insecure: bool = True, timeout: Optional[float] = 5.0):
+    """Долгоживущий asyncio-клиент FilterSyncService с пулом каналов.
+
+    Создаётся один раз при старте приложения (main.main), прогревается через start()
+    и закрывается через close() при остановке.
+    """
+
+    def __init__(
+        self,
+        target: str,
+        insecure: bool = True,
+        timeout: Optional[float] = 5.0,
+        pool_size: int = 1,
+        keepalive_ms: int = 30000,
+        batch_retry_interval: float = 300.0,
+    ):
         self._target = target
         self._timeout = timeout
-        if insecure:
-            self._channel = grpc.insecure_channel(target)
+        options = _channel_options(keepalive_ms)
+        self._channels = []
+        for _ in range(max(1, pool_size)):
+            if insecure:
+                channel = grpc.aio.insecure_channel(target, options=options)
+            else:
+                channel = grpc.aio.secure_channel(target, grpc.ssl_channel_credentials(), options=options)
+            self._channels.append(channel)
+        self._stubs = [filter_sync_pb2_grpc.FilterSyncServiceStub(channel) for channel in self._channels]
+        self._next_stub = itertools.cycle(self._stubs)
+        # Пока time.monotonic() меньше - сервер без UpdateUserFiltersBatch, шлём по одному.
+        # После интервала batch пробуется снова: Go сервис могли обновить без перезапуска бота
+        self._batch_retry_interval = batch_retry_interval
+        self._batch_unsupported_until = 0.0
+
+    @property
+    def target(self) -> str:
+        return self._target
+
+    @property
+    def pool_size(self) -> int:
+        return len(self._channels)
+
+    async def start(self, timeout: Optional[float] = None) -> bool:
+        """Прогрев: устанавливает соединения всех каналов пула заранее.
+
+        Returns:
+            bool: True если все каналы готовы. Недоступный сервер не считается ошибкой
+            старта - каналы переподключатся сами при первом вызове.
+        """
+        timeout = self._timeout if timeout is None else timeout
+        results = await asyncio.gather(
+            *(asyncio.wait_for(channel.channel_ready(), timeout) for channel in self._channels),
+            return_exceptions=True,
+        )
+        ready = sum(1 for r in results if not isinstance(r, BaseException))
+        if ready == len(self._channels):
+            logger.info(f"gRPC pool ready: target={self._target}, channels={ready}")
         else:
-            self._channel = grpc.secure_channel(target, grpc.ssl_channel_credentials())
-        self._stub = filter_sync_pb2_grpc.FilterSyncServiceStub(self._channel)
+            logger.warning(f"gRPC pool warm-up incomplete: target={self._target}, ready={ready}/{len(self._channels)}")
+        return ready == len(self._channels)
 
-    def update_user_filters(self, tg_id: int, filter: str, data: str = "") -> Dict[str, Any]:
+    def _stub(self):
+        return next(self._next_stub)
+
+    async def update_user_filters(self, tg_id: int, filter: str, data: str = "") -> Dict[str, Any]:
         """Вызов UpdateUserFilters RPC.
-        
+
         Returns:
             dict: Всегда возвращает словарь с ключами 'success' и 'message'
         """
         req = filter_sync_pb2.UpdateUserFiltersRequest(tg_id=tg_id, filter=filter, data=data)
+        started = time.perf_counter()
         try:
-            resp = self._stub.UpdateUserFilters(req, timeout=self._timeout)
+            resp = await self._stub().UpdateUserFilters(req, timeout=self._timeout)
+            observe_grpc("UpdateUserFilters", "ok" if resp.success else "rejected", started)
             return {
                 'success': resp.success,
                 'message': resp.message
             }
         except grpc.RpcError as e:
+            observe_grpc("UpdateUserFilters", "error", started)
             logger.error(f"gRPC RPC error: code={e.code()}, details={e.details()}")
             return {
                 'success': False,
                 'message': f'gRPC error: {e.details()}'
             }
         except Exception as e:
+            observe_grpc("UpdateUserFilters", "error", started)
             logger.error(f"Unexpected gRPC client error: {e}")
             return {
                 'success': False,
                 'message': f'Client error: {str(e)}'
             }
 
-    def close(self):
+    async def update_user_filters_batch(self, items: Sequence[Tuple[int, str, str]]) -> Dict[str, Any]:
+        """Вызов UpdateUserFiltersBatch RPC: несколько обновлений за один round trip.
+
+        Args:
+            items: Список (tg_id, filter, data)
+
+        Returns:
+            dict: Ключи 'success', 'message' и 'results' - по словарю
+            {'success', 'message'} на каждый элемент, в порядке items
+        """
+        if not items:
+            return {'success': True, 'message': 'empty batch', 'results': []}
+        if time.monotonic() < self._batch_unsupported_until:
+            return await self._update_one_by_one(items)
+
+        req = filter_sync_pb2.UpdateUserFiltersBatchRequest(items=[
+            filter_sync_pb2.UpdateUserFiltersRequest(tg_id=tg_id, filter=filter, data=data)
+            for tg_id, filter, data in items
+        ])
+        started = time.perf_counter()
         try:
-            self._channel.close()
+            resp = await self._stub().UpdateUserFiltersBatch(req, timeout=self._timeout)
+            observe_grpc("UpdateUserFiltersBatch", "ok" if resp.success else "rejected", started)
+            return {
+                'success': resp.success,
+                'message': resp.message,
+                'results': [{'success': r.success, 'message': r.message} for r in resp.results]
+            }
+        except grpc.RpcError as e:
+            observe_grpc("UpdateUserFiltersBatch", "unimplemented" if e.code() == grpc.StatusCode.UNIMPLEMENTED else "error", started)
+            if e.code() == grpc.StatusCode.UNIMPLEMENTED:
+                # Старая версия Go сервиса (или реплика за балансировщиком) - шлём по одному
+                logger.warning(
+                    f"UpdateUserFiltersBatch is not implemented by server, falling back to single updates "
+                    f"for {self._batch_retry_interval:g}s"
+                )
+                self._batch_unsupported_until = time.monotonic() + self._batch_retry_interval
+                return await self._update_one_by_one(items)
+            logger.error(f"gRPC RPC error: code={e.code()}, details={e.details()}")
+            return self._failed_batch(items, f'gRPC error: {e.details()}')
         except Exception as e:
-            logger.debug(f"Error closing channel: {e}")
+            observe_grpc("UpdateUserFiltersBatch", "error", started)
+            logger.error(f"Unexpected gRPC client error: {e}")
+            return self._failed_batch(items, f'Client error: {str(e)}')
+
+    async def _update_one_by_one(self, items: Sequence[Tuple[int, str, str]]) -> Dict[str, Any]:
+        results = []
+        for tg_id, filter, data in items:
+            results.append(await self.update_user_filters(tg_id, filter, data))
+        failed = [r['message'] for r in results if not r['success']]
+        return {
+            'success': not failed,
+            'message': '; '.join(failed) if failed else 'ok',
+            'results': results
+        }
+
+    @staticmethod
+    def _failed_batch(items: Sequence[Tuple[int, str, str]], message: str) -> Dict[str, Any]:
+        return {
+            'success': False,
+            'message': message,
+            'results': [{'success': False, 'message': message} for _ in items]
+        }
+
+    async def close(self, grace: Optional[float] = None):
+        for channel in self._channels:
+            try:
+                await channel.close(grace)
+            except Exception as e:
+                logger.debug(f"Error closing channel: {e}")
 
 class FilterSyncClientCtx(FilterSyncClient):
-    def __enter__(self):
+    async def __aenter__(self):
+        await self.start()
         return self
 
-    def __exit__(self, exc_type, exc, tb):
-        self.close()
-        return False
\ No newline at end of file
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+        return False
+
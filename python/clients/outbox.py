@@ -0,0 +1,251 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from clients.coalescer import FilterSyncCoalescer
+from clients.grpc_client import FilterSyncClient
+from database.models import FilterSyncOutbox
+from database.outbox import set_wakeup_event
+from monitoring.metrics import increment_filter_sync_events
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory lock Postgres: пачки отправляет только его держатель
+_DRAIN_LOCK_ID = 0x66737963
+
+
+class FilterSyncOutboxWorker:
+    """Фоновая доставка событий из filter_sync_outbox в Go сервис.
+
+    Воркер просыпается после коммита с новыми событиями (или раз в poll_interval) и
+    ждёт window секунд, чтобы накопить быстрые переключения. Очередь разбирает один
+    процесс за раз - держатель advisory lock Postgres (шарды и реплики бота его
+    пропускают и разбирают очередь, когда он свободен), поэтому события одного
+    (tg_id, filter) из разных пачек доходят по порядку. Из всех событий одного
+    (tg_id, filter) отправляется только самое свежее, вся пачка уходит одним
+    UpdateUserFiltersBatch вне транзакции: строки читаются и обновляются короткими
+    транзакциями до и после вызова. Каждое событие задаёт фильтр целиком, поэтому
+    повторная доставка безопасна. Строки удаляются только после подтверждения,
+    неудачные переотправляются с экспоненциальной задержкой - по умолчанию бесконечно,
+    пока Go сервис не ответит. max_attempts > 0 явно разрешает удалять событие после
+    стольких попыток (с записью в лог). Сигнал для алерта - возраст самого старого
+    недоставленного события (oldest_pending_age).
+    """
+
+    def __init__(
+        self,
+        client: FilterSyncClient,
+        engine: AsyncEngine,
+        batch_size: int = 100,
+        window: float = 0.3,
+        poll_interval: float = 5.0,
+        backoff_base: float = 1.0,
+        backoff_max: float = 300.0,
+        max_attempts: int = 0,
+    ):
+        self._client = client
+        self._engine = engine
+        self._batch_size = batch_size
+        self._window = window
+        self._poll_interval = poll_interval
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._max_attempts = max_attempts
+
+        # возраст самого старого события в очереди по часам Postgres и когда он замерен
+        self._oldest_age: Optional[float] = None
+        self._oldest_measured = 0.0
+
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+
+        self.delivered = 0  # событий, подтверждённых Go сервисом
+        self.merged = 0     # событий, заменённых более свежим значением того же фильтра
+        self.failed = 0     # неудачных попыток доставки (событие останется в очереди)
+        self.dropped = 0    # событий, удалённых после max_attempts неудачных попыток
+        self.batches = 0    # отправленных пакетов
+
+    def start(self):
+        set_wakeup_event(self._wakeup)
+        # При старте могли остаться недоставленные события
+        self._wakeup.set()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Останавливает воркер, перед этим пытаясь доставить всё, что уже готово к отправке"""
+        self._stopping = True
+        set_wakeup_event(None)
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'delivered': self.delivered,
+            'merged': self.merged,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'batches': self.batches,
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            if not self._stopping and self._window > 0:
+                # окно склейки: даём пользователю допереключать
+                await asyncio.sleep(self._window)
+            self._wakeup.clear()
+
+            try:
+                while await self.drain_once() >= self._batch_size:
+                    pass
+            except Exception as e:
+                logger.error(f"Filter sync outbox drain error: {e}")
+            try:
+                await self._measure_backlog()
+            except Exception as e:
+                logger.error(f"Filter sync outbox backlog check error: {e}")
+
+            if self._stopping:
+                return
+
+    def oldest_pending_age(self) -> float:
+        """Сколько секунд ждёт доставки самое старое событие очереди (0 - очередь пуста)"""
+        if self._oldest_age is None:
+            return 0.0
+        return self._oldest_age + time.monotonic() - self._oldest_measured
+
+    async def _measure_backlog(self):
+        async with self._engine.connect() as conn:
+            age = await conn.scalar(
+                select(func.now() - FilterSyncOutbox.created_at)
+                .order_by(FilterSyncOutbox.id)
+                .limit(1)
+            )
+        self._oldest_age = age.total_seconds() if age is not None else None
+        self._oldest_measured = time.monotonic()
+
+    async def drain_once(self) -> int:
+        """Доставляет одну пачку событий.
+
+        Returns:
+            int: Количество выбранных строк, 0 - если очередь пуста, ничего не доставлено
+            или очередь сейчас разбирает другой процесс
+        """
+        async with self._engine.connect() as conn:
+            # session-level lock живёт на соединении, а не в транзакции - вызов Go
+            # сервиса идёт без открытой транзакции, но под блокировкой
+            locked = await conn.scalar(select(func.pg_try_advisory_lock(_DRAIN_LOCK_ID)))
+            await conn.commit()
+            if not locked:
+                return 0
+            try:
+                async with AsyncSession(bind=conn, expire_on_commit=False) as session:
+                    return await self._drain(session)
+            finally:
+                await conn.execute(select(func.pg_advisory_unlock(_DRAIN_LOCK_ID)))
+                await conn.commit()
+
+    async def _drain(self, session: AsyncSession) -> int:
+        async with session.begin():
+            rows = (await session.execute(
+                select(FilterSyncOutbox)
+                .where(FilterSyncOutbox.next_attempt_at <= func.now())
+                .order_by(FilterSyncOutbox.id)
+                .limit(self._batch_size)
+            )).scalars().all()
+        if not rows:
+            return 0
+
+        # Последнее значение по каждому (tg_id, filter), порядок - по последнему изменению
+        coalescer: FilterSyncCoalescer[FilterSyncOutbox] = FilterSyncCoalescer()
+        for row in rows:
+            coalescer.submit(row.tg_id, row.filter, row)
+        events = coalescer.drain()
+        if coalescer.merged:
+            self.merged += coalescer.merged
+            increment_filter_sync_events("merged", coalescer.merged)
+        result = await self._client.update_user_filters_batch(
+            [(row.tg_id, row.filter, row.data) for row in events]
+        )
+        self.batches += 1
+        results = result.get('results') or []
+
+        delivered: List[FilterSyncOutbox] = []
+        failed: List[Tuple[FilterSyncOutbox, str]] = []
+        dropped: List[Tuple[FilterSyncOutbox, str]] = []
+        for i, row in enumerate(events):
+            item = results[i] if i < len(results) else {'success': False, 'message': result.get('message', '')}
+            if item.get('success'):
+                delivered.append(row)
+                continue
+            error = item.get('message') or result.get('message', '')
+            if self._max_attempts and row.attempts + 1 >= self._max_attempts:
+                dropped.append((row, error))
+            else:
+                failed.append((row, error))
+
+        async with session.begin():
+            # Доставленное (или брошенное) событие удаляется вместе со всеми более
+            # старыми событиями того же фильтра
+            removed = delivered + [row for row, _ in dropped]
+            if removed:
+                await session.execute(
+                    delete(FilterSyncOutbox).where(or_(*(
+                        and_(
+                            FilterSyncOutbox.tg_id == row.tg_id,
+                            FilterSyncOutbox.filter == row.filter,
+                            FilterSyncOutbox.id <= row.id,
+                        )
+                        for row in removed
+                    )))
+                    .execution_options(synchronize_session=False)
+                )
+
+            for row, error in failed:
+                delay = min(self._backoff_base * (2 ** row.attempts), self._backoff_max)
+                await session.execute(
+                    update(FilterSyncOutbox)
+                    .where(
+                        FilterSyncOutbox.tg_id == row.tg_id,
+                        FilterSyncOutbox.filter == row.filter,
+                        FilterSyncOutbox.id <= row.id,
+                    )
+                    .values(
+                        attempts=row.attempts + 1,
+                        next_attempt_at=func.now() + timedelta(seconds=delay),
+                        last_error=error,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+
+        if delivered:
+            self.delivered += len(delivered)
+            increment_filter_sync_events("delivered", len(delivered))
+        self.failed += len(failed) + len(dropped)
+        increment_filter_sync_events("failed", len(failed) + len(dropped))
+        for row, error in dropped:
+            logger.error(
+                f"Filter sync event dropped after {row.attempts + 1} attempts: "
+                f"tg_id={row.tg_id}, filter={row.filter}, data={row.data!r}, error={error}"
+            )
+        if dropped:
+            self.dropped += len(dropped)
+            increment_filter_sync_events("dropped", len(dropped))
+
+        if failed or dropped:
+            error = (failed or dropped)[0][1]
+            logger.warning(f"Filter sync outbox: delivered={len(delivered)}, failed={len(failed)}, dropped={len(dropped)}, error={error}")
+        else:
+            logger.info(f"Filter sync outbox: delivered={len(delivered)}")
+        return len(rows) if delivered else 0
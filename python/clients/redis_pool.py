@@ -0,0 +1,31 @@
+import logging
+from typing import Optional
+
+import redis.asyncio as aioredis
+
+from config.main import REDIS_POOL_SIZE, REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+# Один клиент (пул соединений) Redis на процесс: FSM storage, подписка на пары.
+# Создаётся при первом обращении, соединения открываются по мере надобности; когда все
+# REDIS_POOL_SIZE заняты (одно держит подписка), запрос ждёт свободное.
+_client: Optional[aioredis.Redis] = None
+
+
+def get_redis() -> aioredis.Redis:
+    global _client
+    if _client is None:
+        _client = aioredis.Redis(connection_pool=aioredis.BlockingConnectionPool.from_url(
+            REDIS_URL, max_connections=REDIS_POOL_SIZE, timeout=5,
+        ))
+    return _client
+
+
+async def close_redis():
+    global _client
+    if _client is None:
+        return
+    await _client.aclose(close_connection_pool=True)
+    _client = None
+    logger.info("Redis pool closed")
@@ -0,0 +1,473 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import logging
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramRetryAfter
+from aiogram.methods import (
+    AnswerCallbackQuery, DeleteMessage, EditMessageCaption, EditMessageMedia, EditMessageReplyMarkup,
+    EditMessageText, SendMessage, TelegramMethod,
+)
+from aiogram.methods.base import Response, TelegramType
+from aiogram.types import CallbackQuery, Message
+from pydantic import BaseModel
+
+from config.main import (
+    EDIT_CACHE_SIZE, SHARD_WORKERS, TELEGRAM_CHAT_BURST, TELEGRAM_CHAT_RATE, TELEGRAM_RATE,
+    TELEGRAM_RETRY_MAX, UPDATES_PINNED,
+)
+from monitoring.metrics import observe_telegram_request, observe_telegram_wait
+
+logger = logging.getLogger(__name__)
+
+# Классы приоритета: меньше - раньше
+PRIORITY_CALLBACK = 0  # answerCallbackQuery - пользователь ждёт снятия "часиков"
+PRIORITY_REPLY = 1     # ответы и правки сообщений в ответ на действие пользователя
+PRIORITY_BULK = 2      # массовые рассылки
+
+PRIORITY_NAMES = {PRIORITY_CALLBACK: "callback", PRIORITY_REPLY: "reply", PRIORITY_BULK: "bulk"}
+
+# Служебные методы идут мимо очереди: getUpdates висит long polling, остальные редкие
+_UNLIMITED = frozenset((
+    "getUpdates", "getMe", "setWebhook", "deleteWebhook", "getWebhookInfo", "close", "logOut",
+))
+
+_priority: ContextVar[Optional[int]] = ContextVar("telegram_priority", default=None)
+
+
+@contextmanager
+def send_priority(priority: int):
+    """Приоритет запросов внутри блока, например with send_priority(PRIORITY_BULK): ..."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """Ведро токенов: rate в секунду, не больше burst подряд; pause() - запрет до момента"""
+    __slots__ = ('rate', 'burst', 'tokens', 'updated', 'paused_until')
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Через сколько секунд будет доступен токен (0 - сейчас)"""
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.paused_until - now)
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, until: float):
+        self.paused_until = max(self.paused_until, until)
+        self.tokens = min(self.tokens, 0.0)
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst and self.paused_until <= now
+
+
+class _Request:
+    __slots__ = ('priority', 'seq', 'chat_id', 'future')
+
+    def __init__(self, priority: int, seq: int, chat_id, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.chat_id = chat_id
+        self.future = future
+
+    def __lt__(self, other: "_Request") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class TelegramRequestScheduler(BaseRequestMiddleware):
+    """Планировщик исходящих запросов Bot API - middleware сессии Bot.
+
+    Каждый запрос получает токен из общего ведра (rate запросов в секунду) и из ведра
+    своего чата (chat_rate, до chat_burst подряд). Пока токенов нет, запросы ждут в
+    очереди по приоритету (PRIORITY_*), внутри приоритета - по порядку поступления;
+    запрос в "занятый" чат не задерживает запросы в другие чаты.
+
+    На 429 сервер присылает retry_after: чат (или всё ведро для запросов без чата)
+    ставится на паузу, а запрос повторяется до retry_max раз, вызывающий код ошибку
+    не видит. Служебные методы (getUpdates, setWebhook, ...) идут мимо очереди.
+    """
+
+    def __init__(self, rate: float = 30.0, chat_rate: float = 1.0, chat_burst: float = 3.0,
+                 retry_max: int = 3, max_chats: int = 10000):
+        self._rate = rate
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._retry_max = retry_max
+        self._max_chats = max_chats
+
+        self._global = TokenBucket(rate, rate, time.monotonic())
+        self._chats: Dict[int, TokenBucket] = {}
+        self._queue: List[_Request] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._pump: Optional[asyncio.Task] = None
+
+        self.sent = 0
+        self.retries = 0      # повторов после 429
+        self.queued = 0       # запросов, ждавших в очереди
+        self.rejected = 0     # 429 после retry_max повторов
+
+    @staticmethod
+    def priority_for(method: TelegramMethod) -> int:
+        priority = _priority.get()
+        if priority is not None:
+            return priority
+        return PRIORITY_CALLBACK if isinstance(method, AnswerCallbackQuery) else PRIORITY_REPLY
+
+    def queue_depths(self) -> Dict[int, int]:
+        depths = dict.fromkeys(PRIORITY_NAMES, 0)
+        for request in self._queue:
+            depths[request.priority] = depths.get(request.priority, 0) + 1
+        return depths
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'sent': self.sent,
+            'queued': self.queued,
+            'retries': self.retries,
+            'rejected': self.rejected,
+            'waiting': len(self._queue),
+            'chats': len(self._chats),
+        }
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if method.__api_method__ in _UNLIMITED or self._rate <= 0:
+            return await make_request(bot, method)
+
+        priority = self.priority_for(method)
+        chat_id = getattr(method, "chat_id", None)
+        for attempt in range(self._retry_max + 1):
+            started = time.monotonic()
+            await self._acquire(priority, chat_id)
+            observe_telegram_wait(PRIORITY_NAMES.get(priority, str(priority)), time.monotonic() - started)
+            try:
+                response = await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                observe_telegram_request(method.__api_method__, "retry_after")
+                self._pause(chat_id, e.retry_after)
+                if attempt == self._retry_max:
+                    self.rejected += 1
+                    raise
+                self.retries += 1
+                logger.warning(f"Flood control on {method.__api_method__} chat={chat_id}: retry in {e.retry_after}s")
+                continue
+            except Exception:
+                observe_telegram_request(method.__api_method__, "error")
+                raise
+            self.sent += 1
+            observe_telegram_request(method.__api_method__, "ok")
+            return response
+
+    def _bucket(self, chat_id, now: float) -> Optional[TokenBucket]:
+        if chat_id is None:
+            return None
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self._max_chats:
+                # полные ведра ничего не помнят - их можно забыть
+                self._chats = {key: b for key, b in self._chats.items() if not b.idle(now)}
+            bucket = self._chats[chat_id] = TokenBucket(self._chat_rate, self._chat_burst, now)
+        return bucket
+
+    def _delay(self, chat_id, now: float) -> float:
+        chat = self._bucket(chat_id, now)
+        return max(self._global.delay(now), chat.delay(now) if chat is not None else 0.0)
+
+    def _take(self, chat_id, now: float):
+        self._global.take(now)
+        chat = self._bucket(chat_id, now)
+        if chat is not None:
+            chat.take(now)
+
+    def _pause(self, chat_id, retry_after: float):
+        now = time.monotonic()
+        chat = self._bucket(chat_id, now)
+        # 429 без чата (answerCallbackQuery и т.п.) - лимит всего бота
+        (chat if chat is not None else self._global).pause(now + retry_after)
+
+    async def _acquire(self, priority: int, chat_id):
+        now = time.monotonic()
+        # быстрый путь: очередь пуста и токены есть
+        if not self._queue and self._delay(chat_id, now) == 0:
+            self._take(chat_id, now)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, _Request(priority, next(self._seq), chat_id, future))
+        self.queued += 1
+        if self._pump is None or self._pump.done():
+            self._wakeup = asyncio.Event()
+            self._pump = asyncio.create_task(self._run())
+        else:
+            self._wakeup.set()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                # вызывающий отменён до выдачи токена - место в очереди освобождается
+                self._queue = [request for request in self._queue if request.future is not future]
+                heapq.heapify(self._queue)
+            raise
+
+    def _grant(self, now: float) -> float:
+        """Выдаёт токены ожидающим по приоритету; возвращает, сколько ждать до следующей выдачи"""
+        deferred: List[_Request] = []
+        wait = float("inf")
+        while self._queue:
+            global_delay = self._global.delay(now)
+            if global_delay > 0:
+                wait = min(wait, global_delay)
+                break
+            request = heapq.heappop(self._queue)
+            if request.future.done():
+                continue
+            chat = self._bucket(request.chat_id, now)
+            chat_delay = chat.delay(now) if chat is not None else 0.0
+            if chat_delay > 0:
+                # чат занят - пропускаем к следующим, порядок внутри чата сохраняется
+                deferred.append(request)
+                wait = min(wait, chat_delay)
+                continue
+            self._take(request.chat_id, now)
+            request.future.set_result(None)
+        for request in deferred:
+            heapq.heappush(self._queue, request)
+        return wait
+
+    async def _run(self):
+        while self._queue:
+            self._wakeup.clear()
+            wait = self._grant(time.monotonic())
+            if not self._queue:
+                break
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait if wait != float("inf") else None)
+            except asyncio.TimeoutError:
+                pass
+
+
+# Поля, задающие вид текста сообщения (общие у sendMessage и editMessageText)
+_CONTENT_FIELDS = ('text', 'parse_mode', 'entities', 'link_preview_options', 'disable_web_page_preview')
+# После этих методов содержимое сообщения неизвестно
+_FORGET = (DeleteMessage, EditMessageCaption, EditMessageMedia)
+
+MessageKey = Tuple[int, int]
+
+
+class _CallbackAnswer:
+    """Состояние ответа на callback обрабатываемого обновления"""
+    __slots__ = ('query_id', 'answered', 'skipped')
+
+    def __init__(self, query_id: str):
+        self.query_id = query_id
+        self.answered = False  # answerCallbackQuery уже ушёл
+        self.skipped = False   # правка пропущена как неизменённая
+
+
+_callback_answer: ContextVar[Optional[_CallbackAnswer]] = ContextVar("telegram_callback_answer", default=None)
+
+
+class CallbackAnswerMiddleware(BaseMiddleware):
+    """Outer middleware callback_query: отвечает на callback, если обработчик этого не сделал,
+    а его правка была пропущена EditDeduplicator - иначе у пользователя остаются "часики"
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[CallbackQuery, Dict[str, Any]], Awaitable[Any]],
+        event: CallbackQuery,
+        data: Dict[str, Any],
+    ) -> Any:
+        state = _CallbackAnswer(event.id)
+        token = _callback_answer.set(state)
+        try:
+            return await handler(event, data)
+        finally:
+            _callback_answer.reset(token)
+            if state.skipped and not state.answered:
+                try:
+                    await event.answer()
+                except TelegramAPIError as e:
+                    # callback старше ~15 секунд ответить уже нельзя
+                    logger.warning(f"Callback {event.id} answer after skipped edit failed: {e.message}")
+
+
+def _field(value) -> str:
+    if isinstance(value, BaseModel):
+        return value.model_dump_json(exclude_none=True)
+    if isinstance(value, list):
+        return "[" + ",".join(_field(item) for item in value) + "]"
+    return repr(value)
+
+
+def _digest(*values) -> bytes:
+    digest = hashlib.blake2b(digest_size=16)
+    for value in values:
+        digest.update(_field(value).encode())
+        digest.update(b"\0")
+    return digest.digest()
+
+
+def _message_key(method: TelegramMethod) -> Optional[MessageKey]:
+    chat_id, message_id = getattr(method, "chat_id", None), getattr(method, "message_id", None)
+    return (chat_id, message_id) if chat_id is not None and message_id is not None else None
+
+
+class EditDeduplicator(BaseRequestMiddleware):
+    """Пропускает правки сообщений, которые ничего не меняют.
+
+    Для каждого (chat_id, message_id) помнится хэш последнего отправленного текста и
+    клавиатуры (sendMessage, editMessageText, editMessageReplyMarkup). Совпадающая правка
+    не уходит в Bot API, вызывающий получает True, как после успешной правки. Ответ
+    "message is not modified" (сообщения нет в памяти, например после перезапуска) тоже
+    считается успехом. Хранится не больше max_messages последних сообщений.
+
+    Память верна, только если сообщения чата правит один процесс (см. UPDATES_PINNED);
+    max_messages = 0 выключает пропуск, остаётся обработка "message is not modified".
+
+    Пропуск правки в обработчике callback отмечается для CallbackAnswerMiddleware, которая
+    отвечает на callback, если обработчик не ответил сам.
+    """
+
+    def __init__(self, max_messages: int = 10000):
+        self._max_messages = max_messages
+        self._messages: "OrderedDict[MessageKey, Tuple[Optional[bytes], bytes]]" = OrderedDict()
+        # хэши клавиатур по объекту: клавиатуры keyboards.main общие и не изменяются
+        self._markups: Dict[int, Tuple[weakref.ref, bytes]] = {}
+
+        self.saved = 0         # правок, не отправленных в API
+        self.not_modified = 0  # правок, отклонённых API как неизменённые
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'size': len(self._messages),
+            'saved': self.saved,
+            'not_modified': self.not_modified,
+        }
+
+    def _markup_digest(self, markup) -> bytes:
+        if markup is None:
+            return _digest(None)
+        key = id(markup)
+        cached = self._markups.get(key)
+        if cached is not None and cached[0]() is markup:
+            return cached[1]
+        digest = _digest(markup)
+        self._markups[key] = (weakref.ref(markup, lambda ref: self._drop_markup(key, ref)), digest)
+        return digest
+
+    def _drop_markup(self, key: int, ref: weakref.ref):
+        cached = self._markups.get(key)
+        if cached is not None and cached[0] is ref:
+            del self._markups[key]
+
+    def _remember(self, key: MessageKey, content: Optional[bytes], markup: bytes):
+        self._messages[key] = (content, markup)
+        self._messages.move_to_end(key)
+        if len(self._messages) > self._max_messages:
+            self._messages.popitem(last=False)
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if isinstance(method, SendMessage):
+            result = await make_request(bot, method)
+            if isinstance(result, Message):
+                self._remember(
+                    (result.chat.id, result.message_id),
+                    _digest(*(getattr(method, name) for name in _CONTENT_FIELDS)), self._markup_digest(method.reply_markup),
+                )
+            return result
+
+        if isinstance(method, AnswerCallbackQuery):
+            state = _callback_answer.get()
+            if state is not None and state.query_id == method.callback_query_id:
+                state.answered = True
+            return await make_request(bot, method)
+
+        key = _message_key(method)
+        if key is None or not isinstance(method, (EditMessageText, EditMessageReplyMarkup)):
+            if key is not None and isinstance(method, _FORGET):
+                self._messages.pop(key, None)
+            return await make_request(bot, method)
+
+        stored = self._messages.get(key)
+        markup = self._markup_digest(method.reply_markup)
+        if isinstance(method, EditMessageText):
+            content = _digest(*(getattr(method, name) for name in _CONTENT_FIELDS))
+            unchanged = stored == (content, markup)
+        else:
+            # правка только клавиатуры: текст остаётся прежним, даже если он неизвестен
+            content = stored[0] if stored is not None else None
+            unchanged = stored is not None and stored[1] == markup
+        if unchanged:
+            self.saved += 1
+            self._messages.move_to_end(key)
+            observe_telegram_request(method.__api_method__, "skipped")
+            state = _callback_answer.get()
+            if state is not None:
+                state.skipped = True
+            return True
+
+        try:
+            result = await make_request(bot, method)
+        except TelegramBadRequest as e:
+            if "message is not modified" not in e.message:
+                self._messages.pop(key, None)
+                raise
+            self.not_modified += 1
+            result = True
+        self._remember(key, content, markup)
+        return result
+
+
+def create_scheduler() -> TelegramRequestScheduler:
+    """Планировщик по настройкам: общий лимит делится между процессами-воркерами"""
+    processes = max(1, SHARD_WORKERS)
+    return TelegramRequestScheduler(
+        rate=TELEGRAM_RATE / processes,
+        chat_rate=TELEGRAM_CHAT_RATE,
+        chat_burst=TELEGRAM_CHAT_BURST,
+        retry_max=TELEGRAM_RETRY_MAX,
+    )
+
+
+request_scheduler = create_scheduler()
+# реплики webhook без привязки правят сообщения одного чата из разных процессов
+edit_dedup = EditDeduplicator(EDIT_CACHE_SIZE if UPDATES_PINNED else 0)
@@ -6,14 +6,83 @@ logger = logging.getLogger(__name__)
 
 # ENV
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+# свой Bot API сервер (локальный telegram-bot-api или стенд нагрузочного теста), пусто - api.telegram.org
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_USER = os.getenv("DB_USER", "postgres")
 DB_PASS = os.getenv("DB_PASSWORD", "password")
 DB_NAME = os.getenv("DB_NAME", "tg_bot")
 REDIS_ADDR = os.getenv("REDIS_ADDR", "localhost:6379")
 REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", "")
+REDIS_URL = f"redis://:{REDIS_PASSWORD}@{REDIS_ADDR}" if REDIS_PASSWORD else f"redis://{REDIS_ADDR}"
+# соединений в общем пуле Redis процесса (FSM storage, подписка на пары)
+REDIS_POOL_SIZE = int(os.getenv("REDIS_POOL_SIZE", "20"))
 GRPC_PORT = os.getenv("GRPC_PORT", "50051")
 GRPC_ADDR = os.getenv("GRPC_ADDR", "localhost")
+GRPC_TIMEOUT = float(os.getenv("GRPC_TIMEOUT", "5"))
+GRPC_POOL_SIZE = int(os.getenv("GRPC_POOL_SIZE", "2"))
+GRPC_KEEPALIVE_MS = int(os.getenv("GRPC_KEEPALIVE_MS", "30000"))
+# окно склейки быстрых переключений (мс), 0 - отправлять сразу
+SYNC_DEBOUNCE_MS = int(os.getenv("SYNC_DEBOUNCE_MS", "300"))
+# outbox синхронизации фильтров
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "300"))
+# 0 - повторять доставку, пока Go сервис не ответит; N - удалить событие (с записью в лог)
+# после N неудачных попыток, Go сервис тогда останется со старым фильтром
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "0"))
+# кэш настроек пользователей
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+# размер LRU кэша клавиатур и текстов меню на каждый вид (биржи, параметры категорий, фильтры)
+KEYBOARD_CACHE_SIZE = int(os.getenv("KEYBOARD_CACHE_SIZE", "2048"))
+# приём обновлений: polling или webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+# публичный адрес для setWebhook, пусто - webhook регистрируется вручную
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "16"))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+# 1 - обновления одного пользователя всегда приходят в один процесс (одна реплика webhook
+# или балансировщик с привязкой по tg_id); иначе состояние чата в памяти не хранится
+WEBHOOK_STICKY = os.getenv("WEBHOOK_STICKY", "0") == "1"
+# шардинг по процессам: 0 - один процесс, N - фронт + N воркеров (tg_id % N)
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "0"))
+SHARD_QUEUE_SIZE = int(os.getenv("SHARD_QUEUE_SIZE", "1000"))
+SHARD_CONCURRENCY = int(os.getenv("SHARD_CONCURRENCY", "16"))
+# метрики Prometheus: локальный HTTP /metrics, 0 - выключены
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9091"))
+# профилирование медленных обновлений: доля профилируемых (0 - выключено) и порог
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_THRESHOLD_MS = int(os.getenv("PROFILE_THRESHOLD_MS", "1000"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "100"))
+# история пар из канала обновлений (python -m history record)
+HISTORY_DIR = os.getenv("HISTORY_DIR", "pair_history")
+HISTORY_SEGMENT_SECONDS = int(os.getenv("HISTORY_SEGMENT_SECONDS", "3600"))
+HISTORY_RETENTION_DAYS = float(os.getenv("HISTORY_RETENTION_DAYS", "30"))
+HISTORY_FLUSH_INTERVAL = float(os.getenv("HISTORY_FLUSH_INTERVAL", "1"))
+# кэш последних реальных пар для превью сообщения (по записи на маршрут)
+LIVE_PAIRS_SIZE = int(os.getenv("LIVE_PAIRS_SIZE", "1000"))
+LIVE_PAIRS_MAX_AGE = float(os.getenv("LIVE_PAIRS_MAX_AGE", "600"))
+# исходящие запросы к Bot API: запросов в секунду на бота (0 - без планировщика), на чат и
+# сколько подряд в один чат, повторов после 429 (retry_after)
+TELEGRAM_RATE = float(os.getenv("TELEGRAM_RATE", "30"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_CHAT_BURST = float(os.getenv("TELEGRAM_CHAT_BURST", "3"))
+TELEGRAM_RETRY_MAX = int(os.getenv("TELEGRAM_RETRY_MAX", "3"))
+# сколько последних сообщений помнить для пропуска правок без изменений
+EDIT_CACHE_SIZE = int(os.getenv("EDIT_CACHE_SIZE", "10000"))
+# кэш FSM состояний в памяти процесса перед Redis: записей и сколько секунд доверять записи
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+FSM_CACHE_TTL = float(os.getenv("FSM_CACHE_TTL", "300"))
+# обновления чата всегда обрабатывает этот процесс: polling (один получатель getUpdates,
+# при шардинге чат закреплён за воркером) или webhook с привязкой
+UPDATES_PINNED = BOT_MODE != "webhook" or WEBHOOK_STICKY
 
 if not BOT_TOKEN:
     raise ValueError("TELEGRAM_BOT_TOKEN is not set")
@@ -1,2 +1,3 @@
 from .main import engine, AsyncSessionLocal
-from .models import Base, User
\ No newline at end of file
+from .models import Base, User, FilterSyncOutbox
+from .cache import UserSettings, user_cache, get_user_settings
\ No newline at end of file
@@ -0,0 +1,199 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from config.main import UPDATES_PINNED, USER_CACHE_SIZE, USER_CACHE_TTL
+from database.main import AsyncSessionLocal
+from database.models import User
+
+
+@dataclass(frozen=True, slots=True)
+class UserSettings:
+    """Неизменяемый снимок настроек пользователя для чтения без БД.
+
+    Повторяет поля и методы проверки User, поэтому подходит везде, где
+    настройки только читаются (тексты меню, клавиатуры).
+    """
+    tg_id: int
+    active: bool
+    spread_min: float
+    spread_max: float
+    profit_min: float
+    profit_max: float
+    volume_min: float
+    volume_max: float
+    total_fee_max: float
+    daily_turnover_min: float
+    check_contract: bool
+    notification_frequency: int
+    blacklisted_deposit_exchanges: int
+    blacklisted_withdraw_exchanges: int
+    blacklisted_coins: Tuple[str, ...]
+    blacklisted_nets: Tuple[str, ...]
+    blacklisted_params: int
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserSettings":
+        return cls(
+            tg_id=user.tg_id,
+            active=bool(user.active),
+            spread_min=user.spread_min or 0.0,
+            spread_max=user.spread_max or 0.0,
+            profit_min=user.profit_min or 0.0,
+            profit_max=user.profit_max or 0.0,
+            volume_min=user.volume_min or 0.0,
+            volume_max=user.volume_max or 0.0,
+            total_fee_max=user.total_fee_max or 0.0,
+            daily_turnover_min=user.daily_turnover_min or 0.0,
+            check_contract=True if user.check_contract is None else bool(user.check_contract),
+            notification_frequency=900 if user.notification_frequency is None else user.notification_frequency,
+            blacklisted_deposit_exchanges=user.blacklisted_deposit_exchanges or 0,
+            blacklisted_withdraw_exchanges=user.blacklisted_withdraw_exchanges or 0,
+            blacklisted_coins=tuple(user.blacklisted_coins or ()),
+            blacklisted_nets=tuple(user.blacklisted_nets or ()),
+            blacklisted_params=user.blacklisted_params or 0,
+        )
+
+    def is_param_enabled(self, bit: int) -> bool:
+        """Проверяет, активен ли параметр (бит не установлен в черном списке)"""
+        return (self.blacklisted_params & bit) == 0
+
+    def is_deposit_exchange_enabled(self, exchange_bit: int) -> bool:
+        """Проверяет, разрешена ли биржа для депозита (бит не установлен в черном списке)"""
+        return (self.blacklisted_deposit_exchanges & exchange_bit) == 0
+
+    def is_withdraw_exchange_enabled(self, exchange_bit: int) -> bool:
+        """Проверяет, разрешена ли биржа для вывода (бит не установлен в черном списке)"""
+        return (self.blacklisted_withdraw_exchanges & exchange_bit) == 0
+
+
+class UserSettingsCache:
+    """LRU кэш снимков настроек с ограничением размера и временем жизни записи.
+
+    Обновляется коммитами этого процесса. ttl = 0 - запись не переживает чтение, каждый
+    get_user_settings идёт в БД.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._data: "OrderedDict[int, Tuple[float, UserSettings]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, tg_id: int) -> Optional[UserSettings]:
+        entry = self._data.get(tg_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, settings = entry
+        if expires_at <= time.monotonic():
+            del self._data[tg_id]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(tg_id)
+        self.hits += 1
+        return settings
+
+    def put(self, settings: UserSettings):
+        self._data[settings.tg_id] = (time.monotonic() + self._ttl, settings)
+        self._data.move_to_end(settings.tg_id)
+        while len(self._data) > self._maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, tg_id: int):
+        self._data.pop(tg_id, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+# Реплики webhook без привязки меняют настройки пользователя в разных процессах, а кэш
+# узнаёт только о своих коммитах - там меню читают настройки из БД
+user_cache = UserSettingsCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL if UPDATES_PINNED else 0)
+
+
+async def get_user_settings(tg_id: int) -> Optional[UserSettings]:
+    """Настройки пользователя: из кэша, при промахе - из БД с сохранением в кэш"""
+    settings = user_cache.get(tg_id)
+    if settings is not None:
+        return settings
+    async with AsyncSessionLocal() as session:
+        user = await session.get(User, tg_id)
+        if not user:
+            return None
+        settings = UserSettings.from_user(user)
+    user_cache.put(settings)
+    return settings
+
+
+# Любая ORM запись User обновляет кэш после успешного коммита
+_CHANGED_USERS = "user_cache_changed"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session: Session, flush_context):
+    changed = session.info.setdefault(_CHANGED_USERS, {})
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, User):
+            changed[obj.tg_id] = obj
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changed[obj.tg_id] = None
+
+
+def stage_user_settings(session: AsyncSession, settings: UserSettings):
+    """Обновит кэш снимком после коммита - для записей в обход ORM (database.repository)"""
+    session.info.setdefault(_CHANGED_USERS, {})[settings.tg_id] = settings
+
+
+SettingsListener = Callable[[int, Optional[UserSettings]], None]
+_settings_listeners: List[SettingsListener] = []
+
+
+def add_settings_listener(listener: SettingsListener):
+    """listener(tg_id, снимок или None при удалении) вызывается после каждого коммита с изменением User"""
+    _settings_listeners.append(listener)
+
+
+def remove_settings_listener(listener: SettingsListener):
+    _settings_listeners.remove(listener)
+
+
+@event.listens_for(Session, "after_commit")
+def _refresh_user_cache(session: Session):
+    for tg_id, user in session.info.pop(_CHANGED_USERS, {}).items():
+        if user is not None and not isinstance(user, UserSettings):
+            user = UserSettings.from_user(user)
+        if user is None:
+            user_cache.invalidate(tg_id)
+        else:
+            user_cache.put(user)
+        for listener in _settings_listeners:
+            listener(tg_id, user)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_changed_users(session: Session):
+    session.info.pop(_CHANGED_USERS, None)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Boolean, Float, BigInteger, SmallInteger
+from sqlalchemy import Column, Integer, Boolean, Float, BigInteger, SmallInteger, String, Text, DateTime, Index, func
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -63,3 +63,26 @@ class User(Base):
     def toggle_withdraw_exchange(self, exchange_bit: int):
         """Переключает состояние биржи для вывода"""
         self.blacklisted_withdraw_exchanges ^= exchange_bit
+
+
+class FilterSyncOutbox(Base):
+    """Очередь событий синхронизации фильтров с Go сервисом.
+
+    Строка пишется в той же транзакции, что и изменение User, и удаляется
+    фоновым воркером после успешной доставки через gRPC.
+    """
+    __tablename__ = 'filter_sync_outbox'
+    __table_args__ = (
+        Index('ix_filter_sync_outbox_next_attempt_at', 'next_attempt_at'),
+        Index('ix_filter_sync_outbox_key', 'tg_id', 'filter'),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    tg_id = Column(BigInteger, nullable=False)
+    filter = Column(String(64), nullable=False)
+    data = Column(Text, nullable=False, default="", server_default="")
+
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    last_error = Column(Text, nullable=True)
@@ -0,0 +1,53 @@
+import asyncio
+import json
+from typing import Any, Dict, Optional, Union
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database.models import FilterSyncOutbox
+
+# Флаг в session.info: в транзакции есть новые события outbox
+_OUTBOX_PENDING = "filter_sync_outbox_pending"
+
+# Событие для пробуждения воркера после коммита (только внутри текущего процесса)
+_wakeup: Optional[asyncio.Event] = None
+
+
+def add_sync_event(session: AsyncSession, tg_id: int, filter_name: str, data: Union[str, Any] = ""):
+    """Добавляет событие синхронизации в текущую транзакцию сессии.
+
+    Событие будет доставлено в Go сервис фоновым воркером только после коммита,
+    вместе с изменением пользователя.
+    """
+    payload = data if isinstance(data, str) else json.dumps(data)
+    session.add(FilterSyncOutbox(tg_id=tg_id, filter=filter_name, data=payload))
+    mark_sync_pending(session)
+
+
+def mark_sync_pending(session: AsyncSession):
+    """Отмечает, что в транзакции есть события outbox, вставленные в обход ORM"""
+    session.info[_OUTBOX_PENDING] = True
+
+
+def add_sync_events(session: AsyncSession, tg_id: int, updates: Dict[str, Any]):
+    """Добавляет несколько событий синхронизации одного пользователя (порядок сохраняется)"""
+    for filter_name, data in updates.items():
+        add_sync_event(session, tg_id, filter_name, data)
+
+
+def set_wakeup_event(wakeup: Optional[asyncio.Event]):
+    global _wakeup
+    _wakeup = wakeup
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_outbox_worker(session: Session):
+    if session.info.pop(_OUTBOX_PENDING, False) and _wakeup is not None:
+        _wakeup.set()
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_outbox_flag(session: Session):
+    session.info.pop(_OUTBOX_PENDING, None)
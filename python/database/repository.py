@@ -0,0 +1,198 @@
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Text, bindparam, text
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.cache import UserSettings, stage_user_settings
+from database.models import FilterSyncOutbox, User
+from database.outbox import mark_sync_pending
+
+# Колонка users -> имя фильтра в Go сервисе
+SYNC_FILTERS = {
+    'spread_min': 'SpreadMin',
+    'spread_max': 'SpreadMax',
+    'profit_min': 'ProfitMin',
+    'profit_max': 'ProfitMax',
+    'volume_min': 'VolumeMin',
+    'volume_max': 'VolumeMax',
+    'total_fee_max': 'TotalFeeMax',
+    'daily_turnover_min': 'DailyTurnoverMin',
+    'check_contract': 'CheckContract',
+    'notification_frequency': 'NotificationFrequency',
+    'blacklisted_deposit_exchanges': 'BlacklistedDepositExchanges',
+    'blacklisted_withdraw_exchanges': 'BlacklistedWithdrawExchanges',
+    'blacklisted_coins': 'BlacklistedCoins',
+    'blacklisted_nets': 'BlacklistedNets',
+    'blacklisted_params': 'BlacklistedParams',
+}
+
+_BLACKLIST_COLUMNS = ('blacklisted_coins', 'blacklisted_nets')
+
+_USERS = User.__tablename__
+_OUTBOX = FilterSyncOutbox.__tablename__
+
+
+@lru_cache(maxsize=None)
+def _update_sql(assignments: str, columns: Tuple[str, ...], prev_column: Optional[str] = None):
+    """Один запрос: UPDATE users ... RETURNING и вставка событий outbox с новыми значениями columns.
+
+    Данные события берутся из RETURNING (JSON текст колонки), поэтому в Go уходит
+    ровно то, что записано в строку. С prev_column дополнительно возвращается старое
+    значение колонки (prev_value), а событие пишется только если оно изменилось.
+    """
+    sync_values = ", ".join(f"('{SYNC_FILTERS[c]}', to_jsonb(u.{c})::text)" for c in columns)
+    if prev_column is None:
+        return text(f"""
+            WITH u AS (
+                UPDATE {_USERS} SET {assignments}
+                WHERE tg_id = :tg_id
+                RETURNING *
+            ), o AS (
+                INSERT INTO {_OUTBOX} (tg_id, filter, data)
+                SELECT u.tg_id, s.filter, s.data
+                FROM u CROSS JOIN LATERAL (VALUES {sync_values}) AS s(filter, data)
+            )
+            SELECT * FROM u
+        """)
+    return text(f"""
+        WITH prev AS (
+            SELECT tg_id, coalesce({prev_column}, '[]'::jsonb) AS value
+            FROM {_USERS} WHERE tg_id = :tg_id
+            FOR UPDATE
+        ), u AS (
+            UPDATE {_USERS} SET {assignments}
+            FROM prev WHERE {_USERS}.tg_id = prev.tg_id
+            RETURNING {_USERS}.*, prev.value AS prev_value
+        ), o AS (
+            INSERT INTO {_OUTBOX} (tg_id, filter, data)
+            SELECT u.tg_id, s.filter, s.data
+            FROM u CROSS JOIN LATERAL (VALUES {sync_values}) AS s(filter, data)
+            WHERE u.{prev_column} IS DISTINCT FROM u.prev_value
+        )
+        SELECT * FROM u
+    """)
+
+
+async def _execute(session: AsyncSession, statement, params: Dict[str, Any]):
+    row = (await session.execute(statement, params)).first()
+    if row is None:
+        return None, None
+    settings = UserSettings.from_user(row)
+    stage_user_settings(session, settings)
+    mark_sync_pending(session)
+    return settings, row
+
+
+async def _update(session: AsyncSession, assignments: str, columns: Tuple[str, ...], **params) -> Optional[UserSettings]:
+    settings, _ = await _execute(session, _update_sql(assignments, columns), params)
+    return settings
+
+
+async def toggle_param(session: AsyncSession, tg_id: int, bit: int) -> Optional[UserSettings]:
+    """Переключает бит параметра. Возвращает новые настройки или None, если пользователя нет"""
+    return await _update(
+        session,
+        "blacklisted_params = coalesce(blacklisted_params, 0) # :bit",
+        ('blacklisted_params',),
+        tg_id=tg_id, bit=bit,
+    )
+
+
+async def toggle_params_group(session: AsyncSession, tg_id: int, mask: int) -> Optional[UserSettings]:
+    """Если все параметры mask включены - выключает их все, иначе включает все"""
+    return await _update(
+        session,
+        "blacklisted_params = CASE WHEN coalesce(blacklisted_params, 0) & :mask = 0 "
+        "THEN coalesce(blacklisted_params, 0) | :mask "
+        "ELSE coalesce(blacklisted_params, 0) & ~CAST(:mask AS integer) END",
+        ('blacklisted_params',),
+        tg_id=tg_id, mask=mask,
+    )
+
+
+async def toggle_deposit_exchange(session: AsyncSession, tg_id: int, exchange_bit: int) -> Optional[UserSettings]:
+    """Переключает биржу для депозита"""
+    return await _update(
+        session,
+        "blacklisted_deposit_exchanges = coalesce(blacklisted_deposit_exchanges, 0) # :bit",
+        ('blacklisted_deposit_exchanges',),
+        tg_id=tg_id, bit=exchange_bit,
+    )
+
+
+async def toggle_withdraw_exchange(session: AsyncSession, tg_id: int, exchange_bit: int) -> Optional[UserSettings]:
+    """Переключает биржу для вывода"""
+    return await _update(
+        session,
+        "blacklisted_withdraw_exchanges = coalesce(blacklisted_withdraw_exchanges, 0) # :bit",
+        ('blacklisted_withdraw_exchanges',),
+        tg_id=tg_id, bit=exchange_bit,
+    )
+
+
+async def toggle_check_contract(session: AsyncSession, tg_id: int) -> Optional[UserSettings]:
+    """Переключает фильтр по контрактам"""
+    return await _update(
+        session,
+        "check_contract = NOT coalesce(check_contract, true)",
+        ('check_contract',),
+        tg_id=tg_id,
+    )
+
+
+async def set_filters(session: AsyncSession, tg_id: int, **values: Any) -> Optional[UserSettings]:
+    """Записывает скалярные фильтры, например set_filters(session, tg_id, spread_min=1, spread_max=5)"""
+    columns = tuple(values)
+    for column in columns:
+        if column not in SYNC_FILTERS or column in _BLACKLIST_COLUMNS:
+            raise ValueError(f"Unknown scalar filter column: {column}")
+    assignments = ", ".join(f"{c} = :{c}" for c in columns)
+    return await _update(session, assignments, columns, tg_id=tg_id, **values)
+
+
+async def _change_blacklist(
+    session: AsyncSession, tg_id: int, column: str, items: Sequence[str], assignment: str, items_type
+) -> Optional[Tuple[UserSettings, List[str]]]:
+    if column not in _BLACKLIST_COLUMNS:
+        raise ValueError(f"Unknown blacklist column: {column}")
+    statement = _update_sql(assignment.format(column=column), (column,), column).bindparams(
+        bindparam('items', type_=items_type)
+    )
+    settings, row = await _execute(session, statement, {'tg_id': tg_id, 'items': list(dict.fromkeys(items))})
+    if settings is None:
+        return None
+    return settings, list(row.prev_value)
+
+
+async def add_to_blacklist(
+    session: AsyncSession, tg_id: int, column: str, items: Sequence[str]
+) -> Optional[Tuple[UserSettings, List[str]]]:
+    """Добавляет элементы в JSONB список (blacklisted_coins/blacklisted_nets) без дублей.
+
+    Returns:
+        (новые настройки, список до изменения) или None, если пользователя нет
+    """
+    return await _change_blacklist(
+        session, tg_id, column, items,
+        "{column} = prev.value || coalesce(("
+        "SELECT jsonb_agg(e) FROM jsonb_array_elements(CAST(:items AS jsonb)) AS e "
+        "WHERE NOT prev.value @> jsonb_build_array(e)), '[]'::jsonb)",
+        JSONB,
+    )
+
+
+async def remove_from_blacklist(
+    session: AsyncSession, tg_id: int, column: str, items: Sequence[str]
+) -> Optional[Tuple[UserSettings, List[str]]]:
+    """Удаляет элементы из JSONB списка (blacklisted_coins/blacklisted_nets).
+
+    Returns:
+        (новые настройки, список до изменения) или None, если пользователя нет
+    """
+    return await _change_blacklist(
+        session, tg_id, column, items,
+        "{column} = prev.value - CAST(:items AS text[])",
+        ARRAY(Text),
+    )
@@ -6,82 +6,18 @@ from aiogram.filters import CommandObject
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from database.main import AsyncSessionLocal
-from config.main import GRPC_PORT, GRPC_ADDR
-import asyncio
-import json
 import logging
-from typing import Any, Union
 
 from database.models import User
+from database.outbox import add_sync_event
+from database.cache import get_user_settings
 from keyboards.main import filters_keyboard, settings_keyboard, msg_keyboard
+from texts.main import filters_text
 
 logger = logging.getLogger(__name__)
 router = Router()
 
 
-async def send_grpc_update(tg_id: int, filter_name: str, data: Union[str, Any]) -> dict:
-    """
-    Асинхронно отправляет обновление фильтров через gRPC
-    
-    Args:
-        tg_id: Telegram ID пользователя
-        filter_name: Название фильтра
-        data: Данные для обновления (автоматически конвертируется в JSON если не строка)
-    
-    Returns:
-        dict: Результат операции
-    """
-    from clients.grpc_client import FilterSyncClient as _Client
-    
-    # Подготавливаем данные
-    if not isinstance(data, str):
-        payload = json.dumps(data)
-    else:
-        payload = data
-    
-    logger.info(f"Sending gRPC update: user_id={tg_id}, filter={filter_name}")
-    
-    def _call() -> dict:
-        """Синхронный вызов в отдельном потоке"""
-        client = None
-        try:
-            target = f"{GRPC_ADDR}:{GRPC_PORT}"
-            logger.debug(f"Connecting to gRPC server at {target}")
-            
-            client = _Client(target=target)
-            
-            # Теперь метод всегда возвращает dict, даже при ошибках
-            result = client.update_user_filters(
-                tg_id=tg_id, 
-                filter=filter_name,
-                data=payload
-            )
-            
-            # Логируем результат
-            if result.get('success'):
-                logger.info(f"gRPC update successful: user_id={tg_id}, filter={filter_name}, msg={result.get('message')}")
-            else:
-                logger.warning(f"gRPC update failed: user_id={tg_id}, filter={filter_name}, error={result.get('message')}")
-            
-            return result
-            
-        except Exception as e:
-            logger.error(f"gRPC client initialization error: user_id={tg_id}, filter={filter_name}, error={str(e)}")
-            return {
-                'success': False,
-                'message': f'gRPC client initialization error: {str(e)}'
-            }
-        finally:
-            if client:
-                try:
-                    client.close()
-                except Exception as e:
-                    logger.debug(f"gRPC client close error: {e}")
-    
-    # Запускаем в отдельном потоке
-    return await asyncio.to_thread(_call)
-
-
 # Интерактивный туториал для новых пользователей
 TUTORIAL_STEPS = [
     (
@@ -177,6 +113,8 @@ async def start_cmd(message: types.Message, state: FSMContext):
                     active=True,
                 )
                 session.add(user)
+                # регистрация user в Golang-сервисе (доставит воркер outbox)
+                add_sync_event(session, message.from_user.id, 'NewUser', '')
 
                 await session.commit()
 
@@ -187,12 +125,12 @@ async def start_cmd(message: types.Message, state: FSMContext):
                 builder.button(text="Далее", callback_data="tutorial_next")
                 await message.answer(TUTORIAL_STEPS[0], reply_markup=builder.as_markup(), parse_mode="Markdown")
             else:
+                # повторная регистрация на случай, если Go сервис потерял пользователя
+                add_sync_event(session, message.from_user.id, 'NewUser', '')
                 await message.answer(
                     "С возвращением!\n"
                     "Используйте /settings для настройки сканера."
                 )
-    # регистрация user в Golang-серисе с помощью gRPC
-    await send_grpc_update(message.from_user.id, 'NewUser', '')
 
 
 @router.message(Command("settings"))
@@ -210,38 +148,13 @@ async def settings_cmd(message: types.Message):
 
 @router.message(Command("filters"))
 async def filters_cmd(message: types.Message):
-    async with AsyncSessionLocal() as session:
-        user = await session.get(User, message.from_user.id)
-        if not user:
-            await message.answer("Пользователь не найден. Используйте /start.")
-            return
-
-        def format_filter(min_val, max_val, suffix=""):
-            if min_val > 0 and max_val > 0:
-                if min_val == max_val:
-                    return f"={min_val:.2f}{suffix}"
-                else:
-                    return f"{min_val:.2f} - {max_val:.2f}{suffix}"
-            elif min_val > 0:
-                return f"> {min_val:.2f}{suffix}"
-            elif max_val > 0:
-                return f"< {max_val:.2f}{suffix}"
-            else:
-                return "отключён"
-
-        lines = [
-            "⚙️ *Текущие фильтры:*\n",
-            "❗ Фильтр неактивен, если его значение равно нулю\n",
-            f"🔀 Спред: *{format_filter(user.spread_min, user.spread_max, ' %')}*",
-            f"💰 Профит: *{format_filter(user.profit_min, user.profit_max, ' $')}*",
-            f"📊 Объем: *{format_filter(user.volume_min, user.volume_max, ' $')}*",
-            f"💸 Макс. комиссия: *{user.total_fee_max:.2f}$*" if user.total_fee_max > 0 else "💸 Макс. комиссия: *отключена*",
-            f"📈 Мин. 24ч. оборот: *{user.daily_turnover_min:.2f}$*" if user.daily_turnover_min > 0 else "📈 Мин. 24ч. оборот: *отключён*",
-            f"📃 Проверять контракты: *{'Да' if user.check_contract else 'Нет'}*"
-        ]
+    user = await get_user_settings(message.from_user.id)
+    if not user:
+        await message.answer("Пользователь не найден. Используйте /start.")
+        return
 
-        text = "\n".join(lines)
-        await message.answer(text, reply_markup=filters_keyboard(), parse_mode="Markdown")
+    text = filters_text(user)
+    await message.answer(text, reply_markup=filters_keyboard(), parse_mode="Markdown")
 
 
 @router.message(Command("msg"))
@@ -5,56 +5,43 @@ import logging
 
 from aiogram import types, Router
 from aiogram.fsm.context import FSMContext
-from aiogram.fsm.storage.redis import RedisStorage
 
 from database.main import AsyncSessionLocal
-from database.models import User
-from handlers.commands import filters_cmd, send_grpc_update, settings_cmd
+from database.repository import add_to_blacklist, remove_from_blacklist, set_filters
+from handlers.commands import filters_cmd, settings_cmd
 from states.main import FilterStates, BlacklistStates
-from config.main import REDIS_ADDR, REDIS_PASSWORD
 
 logger = logging.getLogger(__name__)
 
-
-# Redis setup for storage
-host, port = REDIS_ADDR.split(":")
-redis_url = f"redis://:{REDIS_PASSWORD}@{host}:{port}" if REDIS_PASSWORD else f"redis://{host}:{port}"
-storage = RedisStorage.from_url(redis_url)
-
 async def process_add_coin(message: types.Message, state: FSMContext):
     coins_input = message.text.strip().upper()
     coins_to_add = [c.strip() for c in coins_input.split(",") if c.strip()]
     if not coins_to_add:
         await message.answer("❌ Не указаны монеты.\nВведите названия монет для добавления в ЧС, через запятую.")
         return
-    updated_coins = []
-
     async with AsyncSessionLocal() as session:
         async with session.begin():
-            user = await session.get(User, message.from_user.id)
-            if not user:
-                await message.answer("❌ Пользователь не найден. Используйте /start.")
-                await state.clear()
-                return
-
-            current_coins = set(user.blacklisted_coins or [])
-            already_blacklisted = [c for c in coins_to_add if c in current_coins]
-            new_coins = [c for c in coins_to_add if c not in current_coins]
+            result = await add_to_blacklist(session, message.from_user.id, 'blacklisted_coins', coins_to_add)
+    if not result:
+        await message.answer("❌ Пользователь не найден. Используйте /start.")
+        await state.clear()
+        return
 
-            if not new_coins:
-                await message.answer("❌ Все указанные монеты уже в ЧС: " + "; ".join(already_blacklisted))
-                await filters_cmd(message)
-            else:
-                updated_coins = list(current_coins.union(new_coins))
-                user.blacklisted_coins = updated_coins
-                await session.commit()
+    # Сравниваем со списком до изменения
+    _, previous_coins = result
+    current_coins = set(previous_coins)
+    already_blacklisted = [c for c in coins_to_add if c in current_coins]
+    new_coins = [c for c in coins_to_add if c not in current_coins]
 
-                msg = f"✅ Монеты добавленные в ЧС:\n{'; '.join(new_coins)}"
-                if already_blacklisted:
-                    msg += f"\n\n❌ Уже были в ЧС:\n{'; '.join(already_blacklisted)}"
-                await message.answer(msg)
-                await filters_cmd(message)
-    await send_grpc_update(message.from_user.id, 'BlacklistedCoins', updated_coins)
+    if not new_coins:
+        await message.answer("❌ Все указанные монеты уже в ЧС: " + "; ".join(already_blacklisted))
+        await filters_cmd(message)
+    else:
+        msg = f"✅ Монеты добавленные в ЧС:\n{'; '.join(new_coins)}"
+        if already_blacklisted:
+            msg += f"\n\n❌ Уже были в ЧС:\n{'; '.join(already_blacklisted)}"
+        await message.answer(msg)
+        await filters_cmd(message)
     await state.clear()
 
 async def process_remove_coin(message: types.Message, state: FSMContext):
@@ -64,35 +51,28 @@ async def process_remove_coin(message: types.Message, state: FSMContext):
         await message.answer("❌ Не указаны монеты.\nВведите названия монет для удаления из ЧС, через запятую.")
         return
 
-    blacklisted_coins = []
-
     async with AsyncSessionLocal() as session:
         async with session.begin():
-            user = await session.get(User, message.from_user.id)
-            if not user:
-                await message.answer("❌ Пользователь не найден. Используйте /start.")
-                await state.clear()
-                return
-
-            current_coins = set(user.blacklisted_coins or [])
-            not_in_blacklist = [c for c in coins_to_remove if c not in current_coins]
-            coins_to_remove_actual = [c for c in coins_to_remove if c in current_coins]
-
-            if not coins_to_remove_actual:
-                await message.answer("❌ Ни одной из указанных монет нет в ЧС: " + "; ".join(not_in_blacklist))
-                await filters_cmd(message)
-            else:
-                user.blacklisted_coins = [c for c in current_coins if c not in coins_to_remove_actual]
-                await session.commit()
+            result = await remove_from_blacklist(session, message.from_user.id, 'blacklisted_coins', coins_to_remove)
+    if not result:
+        await message.answer("❌ Пользователь не найден. Используйте /start.")
+        await state.clear()
+        return
 
-                blacklisted_coins = user.blacklisted_coins
+    _, previous_coins = result
+    current_coins = set(previous_coins)
+    not_in_blacklist = [c for c in coins_to_remove if c not in current_coins]
+    coins_to_remove_actual = [c for c in coins_to_remove if c in current_coins]
 
-                msg = f"✅ Монеты удалённые из ЧС:\n{'; '.join(coins_to_remove_actual)}"
-                if not_in_blacklist:
-                    msg += f"\n\n❌ Не были в ЧС:\n{'; '.join(not_in_blacklist)}"
-                await message.answer(msg)
-                await filters_cmd(message)
-    await send_grpc_update(message.from_user.id, 'BlacklistedCoins', blacklisted_coins)
+    if not coins_to_remove_actual:
+        await message.answer("❌ Ни одной из указанных монет нет в ЧС: " + "; ".join(not_in_blacklist))
+        await filters_cmd(message)
+    else:
+        msg = f"✅ Монеты удалённые из ЧС:\n{'; '.join(coins_to_remove_actual)}"
+        if not_in_blacklist:
+            msg += f"\n\n❌ Не были в ЧС:\n{'; '.join(not_in_blacklist)}"
+        await message.answer(msg)
+        await filters_cmd(message)
     await state.clear()
 
 async def process_add_net(message: types.Message, state: FSMContext):
@@ -101,35 +81,30 @@ async def process_add_net(message: types.Message, state: FSMContext):
     if not nets_to_add:
         await message.answer("❌ Не указаны сети.\nВведите названия сетей для добавления в ЧС, через запятую.")
         return
-    
-    updated_nets = []
 
     async with AsyncSessionLocal() as session:
         async with session.begin():
-            user = await session.get(User, message.from_user.id)
-            if not user:
-                await message.answer("❌ Пользователь не найден. Используйте /start.")
-                await state.clear()
-                return
+            result = await add_to_blacklist(session, message.from_user.id, 'blacklisted_nets', nets_to_add)
+    if not result:
+        await message.answer("❌ Пользователь не найден. Используйте /start.")
+        await state.clear()
+        return
 
-            current_nets = set(user.blacklisted_nets or [])
-            already_blacklisted = [n for n in nets_to_add if n in current_nets]
-            new_nets = [n for n in nets_to_add if n not in current_nets]
+    # Сравниваем со списком до изменения
+    _, previous_nets = result
+    current_nets = set(previous_nets)
+    already_blacklisted = [n for n in nets_to_add if n in current_nets]
+    new_nets = [n for n in nets_to_add if n not in current_nets]
 
-            if not new_nets:
-                await message.answer("❌ Все указанные сети уже в ЧС: " + "; ".join(already_blacklisted))
-                await filters_cmd(message)
-            else:
-                updated_nets = list(current_nets.union(new_nets))
-                user.blacklisted_nets = updated_nets
-                await session.commit()
-
-                msg = f"✅ Сети добавленные в ЧС:\n{'; '.join(new_nets)}"
-                if already_blacklisted:
-                    msg += f"\n\n❌ Уже были в ЧС:\n{'; '.join(already_blacklisted)}"
-                await message.answer(msg)
-                await filters_cmd(message)
-    await send_grpc_update(message.from_user.id, 'BlacklistedNets', updated_nets)
+    if not new_nets:
+        await message.answer("❌ Все указанные сети уже в ЧС: " + "; ".join(already_blacklisted))
+        await filters_cmd(message)
+    else:
+        msg = f"✅ Сети добавленные в ЧС:\n{'; '.join(new_nets)}"
+        if already_blacklisted:
+            msg += f"\n\n❌ Уже были в ЧС:\n{'; '.join(already_blacklisted)}"
+        await message.answer(msg)
+        await filters_cmd(message)
     await state.clear()
 
 async def process_remove_net(message: types.Message, state: FSMContext):
@@ -139,35 +114,28 @@ async def process_remove_net(message: types.Message, state: FSMContext):
         await message.answer("❌ Не указаны сети.\nВведите названия сетей для удаления из ЧС, через запятую.")
         return
 
-    blacklisted_nets = []
-
     async with AsyncSessionLocal() as session:
         async with session.begin():
-            user = await session.get(User, message.from_user.id)
-            if not user:
-                await message.answer("❌ Пользователь не найден. Используйте /start.")
-                await state.clear()
-                return
-
-            current_nets = set(user.blacklisted_nets or [])
-            not_in_blacklist = [n for n in nets_to_remove if n not in current_nets]
-            nets_to_remove_actual = [n for n in nets_to_remove if n in current_nets]
-
-            if not nets_to_remove_actual:
-                await message.answer("❌ Ни одной из указанных сетей нет в ЧС: " + "; ".join(not_in_blacklist))
-                await filters_cmd(message)
-            else:
-                user.blacklisted_nets = [n for n in current_nets if n not in nets_to_remove_actual]
-                await session.commit()
+            result = await remove_from_blacklist(session, message.from_user.id, 'blacklisted_nets', nets_to_remove)
+    if not result:
+        await message.answer("❌ Пользователь не найден. Используйте /start.")
+        await state.clear()
+        return
 
-                blacklisted_nets = user.blacklisted_nets
+    _, previous_nets = result
+    current_nets = set(previous_nets)
+    not_in_blacklist = [n for n in nets_to_remove if n not in current_nets]
+    nets_to_remove_actual = [n for n in nets_to_remove if n in current_nets]
 
-                msg = f"✅ Сети удалённые из ЧС:\n{'; '.join(nets_to_remove_actual)}"
-                if not_in_blacklist:
-                    msg += f"\n\n❌ Не были в ЧС:\n{'; '.join(not_in_blacklist)}"
-                await message.answer(msg)
-                await filters_cmd(message)
-    await send_grpc_update(message.from_user.id, 'BlacklistedNets', blacklisted_nets)
+    if not nets_to_remove_actual:
+        await message.answer("❌ Ни одной из указанных сетей нет в ЧС: " + "; ".join(not_in_blacklist))
+        await filters_cmd(message)
+    else:
+        msg = f"✅ Сети удалённые из ЧС:\n{'; '.join(nets_to_remove_actual)}"
+        if not_in_blacklist:
+            msg += f"\n\n❌ Не были в ЧС:\n{'; '.join(not_in_blacklist)}"
+        await message.answer(msg)
+        await filters_cmd(message)
     await state.clear()
 
 async def process_spread(message: types.Message, state: FSMContext):
@@ -188,18 +156,17 @@ async def process_spread(message: types.Message, state: FSMContext):
             return
         async with AsyncSessionLocal() as session:
             async with session.begin():
-                user = await session.get(User, message.from_user.id)
-                user.spread_min = min_spread
-                user.spread_max = max_spread
-                await session.commit()
+                user = await set_filters(session, message.from_user.id, spread_min=min_spread, spread_max=max_spread)
+        if not user:
+            await message.answer("❌ Пользователь не найден. Используйте /start.")
+            await state.clear()
+            return
         if min_spread == 0 and max_spread == 0:
             await message.answer("✅ Фильтр по спреду отключён.")
         else:
             await message.answer(f"✅ Спред обновлен: {min_spread:.2f} - {max_spread:.2f} %")
         await state.clear()
         await filters_cmd(message)
-        await send_grpc_update(message.from_user.id, 'SpreadMin', min_spread)
-        await send_grpc_update(message.from_user.id, 'SpreadMax', max_spread)
     except ValueError:
         await message.answer("❌ Некорректные значения.\nВведите ещё раз или нажмите кнопку отмены, или введите команду /start.")
 
@@ -221,18 +188,17 @@ async def process_volume(message: types.Message, state: FSMContext):
             return
         async with AsyncSessionLocal() as session:
             async with session.begin():
-                user = await session.get(User, message.from_user.id)
-                user.volume_min = min_vol
-                user.volume_max = max_vol
-                await session.commit()
+                user = await set_filters(session, message.from_user.id, volume_min=min_vol, volume_max=max_vol)
+        if not user:
+            await message.answer("❌ Пользователь не найден. Используйте /start.")
+            await state.clear()
+            return
         if min_vol == 0 and max_vol == 0:
             await message.answer("✅ Фильтр по объёму отключён.")
         else:
             await message.answer(f"✅ Объем обновлен: {min_vol:.2f} - {max_vol:.2f} $")
         await state.clear()
         await filters_cmd(message)
-        await send_grpc_update(message.from_user.id, 'VolumeMin', min_vol)
-        await send_grpc_update(message.from_user.id, 'VolumeMax', max_vol)
     except ValueError:
         await message.answer("❌ Некорректные значения. Введите ещё раз или нажмите кнопку отмены, или введите команду /start.")
 
@@ -244,16 +210,17 @@ async def process_fee(message: types.Message, state: FSMContext):
             return
         async with AsyncSessionLocal() as session:
             async with session.begin():
-                user = await session.get(User, message.from_user.id)
-                user.total_fee_max = fee
-                await session.commit()
+                user = await set_filters(session, message.from_user.id, total_fee_max=fee)
+        if not user:
+            await message.answer("❌ Пользователь не найден. Используйте /start.")
+            await state.clear()
+            return
         if fee == 0:
             await message.answer("✅ Фильтр по комиссии отключён.")
         else:
             await message.answer(f"✅ Максимальная комиссия обновлена: {fee:.2f} $")
         await state.clear()
         await filters_cmd(message)
-        await send_grpc_update(message.from_user.id, 'TotalFeeMax', fee)
     except ValueError:
         await message.answer("❌ Некорректное значение.\nВведите ещё раз или нажмите кнопку отмены, или введите команду /start.")
 
@@ -265,16 +232,17 @@ async def process_daily_turnover(message: types.Message, state: FSMContext):
             return
         async with AsyncSessionLocal() as session:
             async with session.begin():
-                user = await session.get(User, message.from_user.id)
-                user.daily_turnover_min = daily_turnover
-                await session.commit()
+                user = await set_filters(session, message.from_user.id, daily_turnover_min=daily_turnover)
+        if not user:
+            await message.answer("❌ Пользователь не найден. Используйте /start.")
+            await state.clear()
+            return
         if daily_turnover == 0:
             await message.answer("✅ Фильтр по 24ч. обороту отключён.")
         else:
             await message.answer(f"✅ Минимальный 24ч. оборот обновлён: {daily_turnover:.2f} $")
         await state.clear()
         await filters_cmd(message)
-        await send_grpc_update(message.from_user.id, 'DailyTurnoverMin', daily_turnover)
     except ValueError:
         await message.answer("❌ Некорректное значение.\nВведите ещё раз или нажмите кнопку отмены, или введите команду /start.")
 
@@ -296,18 +264,17 @@ async def process_profit(message: types.Message, state: FSMContext):
             return
         async with AsyncSessionLocal() as session:
             async with session.begin():
-                user = await session.get(User, message.from_user.id)
-                user.profit_min = min_profit
-                user.profit_max = max_profit
-                await session.commit()
+                user = await set_filters(session, message.from_user.id, profit_min=min_profit, profit_max=max_profit)
+        if not user:
+            await message.answer("❌ Пользователь не найден. Используйте /start.")
+            await state.clear()
+            return
         if min_profit == 0 and max_profit == 0:
             await message.answer("✅ Фильтр по профиту отключён.")
         else:
             await message.answer(f"✅ Профит обновлен: {min_profit:.2f} - {max_profit:.2f} $")
         await state.clear()
         await filters_cmd(message)
-        await send_grpc_update(message.from_user.id, 'ProfitMin', min_profit)
-        await send_grpc_update(message.from_user.id, 'ProfitMax', max_profit)
     except ValueError:
         await message.answer("❌ Некорректные значения.\nВведите ещё раз или нажмите кнопку отмены, или введите команду /start.")
 
@@ -340,13 +307,11 @@ async def process_custom_frequency(message: types.Message, state: FSMContext):
             return
         
         async with AsyncSessionLocal() as session:
-            user = await session.get(User, message.from_user.id)
-            if not user:
-                await message.answer("❌ Пользователь не найден")
-                return
-            
-            user.notification_frequency = total_seconds
-            await session.commit()
+            async with session.begin():
+                user = await set_filters(session, message.from_user.id, notification_frequency=total_seconds)
+        if not user:
+            await message.answer("❌ Пользователь не найден")
+            return
         
         # Форматируем время для отображения
         if total_seconds < 60:
@@ -386,7 +351,6 @@ async def process_custom_frequency(message: types.Message, state: FSMContext):
         )
         await state.clear()
         await settings_cmd(message)
-        await send_grpc_update(message.from_user.id, 'NotificationFrequency', total_seconds)        
     except (ValueError, AttributeError):
         await message.answer(
             "❌ Неверный формат. Используйте например: `1h30m`\n"
@@ -0,0 +1,2 @@
+from .main import HistoryRecorder
+from .segments import HistoryWriter, Segment, SegmentWriter, open_segments, iter_pairs
@@ -0,0 +1,5 @@
+import sys
+
+from history.main import main
+
+sys.exit(main())
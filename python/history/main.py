@@ -0,0 +1,142 @@
+import argparse
+import asyncio
+import logging
+import signal
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import numpy as np
+
+from config.main import (
+    HISTORY_DIR, HISTORY_FLUSH_INTERVAL, HISTORY_RETENTION_DAYS, HISTORY_SEGMENT_SECONDS,
+)
+from history.segments import HistoryWriter, open_segments
+from models.compact import CompactServerData
+from pairs.main import PairSubscriber
+
+logger = logging.getLogger(__name__)
+
+# удаление старых сегментов - не чаще раза в этот интервал
+CLEANUP_INTERVAL = 600
+
+
+class HistoryRecorder:
+    """Пишет пары из канала обновлений в сегменты истории, сбрасывая буферы по таймеру"""
+
+    def __init__(self, writer: HistoryWriter, subscriber: PairSubscriber,
+                 flush_interval: float = HISTORY_FLUSH_INTERVAL):
+        self._writer = writer
+        self._subscriber = subscriber
+        self._flush_interval = flush_interval
+        self._task: Optional[asyncio.Task] = None
+        subscriber.add_handler(self.record)
+
+    def record(self, pair: CompactServerData, received_at: float):
+        self._writer.append(pair, received_at)
+
+    async def start(self):
+        self._writer.cleanup()
+        await self._subscriber.start()
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        await self._subscriber.stop()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._writer.close()
+
+    async def _flush_loop(self):
+        last_cleanup = time.monotonic()
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                self._writer.flush()
+                if time.monotonic() - last_cleanup >= CLEANUP_INTERVAL:
+                    last_cleanup = time.monotonic()
+                    self._writer.cleanup()
+            except OSError:
+                logger.exception("History flush failed")
+
+
+async def record(root: str):
+    writer = HistoryWriter(root, HISTORY_SEGMENT_SECONDS, HISTORY_RETENTION_DAYS * 86400)
+    recorder = HistoryRecorder(writer, PairSubscriber())
+    await recorder.start()
+    logger.info(f"Recording pair history to {root}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    await recorder.stop()
+    logger.info(f"History recorder stopped, {writer.appended} pairs recorded")
+
+
+def _parse_day(value: str) -> float:
+    return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+
+
+def summary(root: str, start: Optional[float], end: Optional[float], top: int = 10):
+    """Сводка за период по колонкам сегментов - без материализации пар"""
+    total = 0
+    symbols: Counter = Counter()
+    routes: Counter = Counter()
+    spread_max = []
+    for segment in open_segments(root, start, end):
+        rows = segment.between(start, end)
+        count = rows.stop - rows.start
+        if not count:
+            continue
+        total += count
+        print(f"{segment.path}: {count} pairs")
+        names = segment.dictionaries.get('symbols', [])
+        codes, counts = np.unique(segment.column('symbol')[rows], return_counts=True)
+        symbols.update({names[code]: int(n) for code, n in zip(codes, counts)})
+        exchanges = segment.dictionaries.get('exchanges', [])
+        pairs = np.stack([segment.column('withdrawal_exchange')[rows], segment.column('deposit_exchange')[rows]], axis=1)
+        route_codes, route_counts = np.unique(pairs, axis=0, return_counts=True)
+        routes.update({f"{exchanges[w]} → {exchanges[d]}": int(n) for (w, d), n in zip(route_codes, route_counts)})
+        spread_max.append(float(segment.column('low_spread')[rows].max()))
+
+    print(f"\nPairs: {total}")
+    if not total:
+        return
+    print(f"Max spread: {max(spread_max):.2f}%")
+    print(f"Top symbols: {', '.join(f'{s} ({n})' for s, n in symbols.most_common(top))}")
+    print(f"Top routes: {', '.join(f'{r} ({n})' for r, n in routes.most_common(top))}")
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="История арбитражных пар из канала обновлений")
+    parser.add_argument("--dir", default=HISTORY_DIR, help="каталог сегментов")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("record", help="подписаться на канал и писать пары до SIGINT/SIGTERM")
+
+    summary_parser = commands.add_parser("summary", help="сводка за день по сегментам")
+    summary_parser.add_argument("--day", default="", help="день UTC, YYYY-MM-DD (по умолчанию сегодня)")
+    summary_parser.add_argument("--top", type=int, default=10)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "record":
+        asyncio.run(record(args.dir))
+        return 0
+
+    start = _parse_day(args.day) if args.day else _parse_day(datetime.now(timezone.utc).strftime("%Y-%m-%d"))
+    summary(args.dir, start, start + timedelta(days=1).total_seconds(), args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
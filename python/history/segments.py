@@ -0,0 +1,444 @@
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from models.compact import (
+    CompactLowerLimit, CompactOrderBook, CompactServerData, CompactUpperLimit, CompactVolumeData,
+)
+from models.models import LowerLimit, Order, OrderBook, ServerData, UpperLimit, VolumeData
+
+logger = logging.getLogger(__name__)
+
+# Формат сегмента: каталог <начало UTC>/ с файлом на колонку (<имя>.bin, сырые
+# значения фиксированной ширины, только дозапись), dictionaries.json для строк и
+# meta.json. Каждый .bin отображается в память как есть - чтение без разбора.
+#
+# Строковые поля хранятся кодами словаря сегмента. Стаканы лежат в колонках
+# уровней (ask_*/bid_*), строка пары хранит конец своих уровней (asks_end/bids_end).
+
+FORMAT_VERSION = 1
+SEGMENT_TIME_FORMAT = "%Y%m%dT%H%M%SZ"
+
+# Строковое поле -> словарь
+STRING_FIELDS: Dict[str, str] = {
+    'symbol': 'symbols',
+    'withdrawal_exchange': 'exchanges',
+    'deposit_exchange': 'exchanges',
+    'withdrawal_network': 'networks',
+    'withdrawal_exchange_url': 'urls',
+    'deposit_exchange_url': 'urls',
+    'withdrawal_time': 'durations',
+    'time_life': 'durations',
+}
+
+_LIMIT_FIELDS = {
+    'ask_vol_usdt': np.float64,
+    'bid_vol_usdt': np.float64,
+    'buy_price': np.float64,
+    'sell_price': np.float64,
+    'profit': np.float64,
+    'spread': np.float64,
+    'ask_depth': np.int32,
+    'bid_depth': np.int32,
+}
+
+# Колонки строк: одно значение на пару
+ROW_COLUMNS: Dict[str, np.dtype] = {
+    'ts': np.dtype(np.float64),
+    **{name: np.dtype(np.uint32) for name in STRING_FIELDS},
+    'withdrawal_fee': np.dtype(np.float64),
+    'maker_fee': np.dtype(np.float64),
+    'volume24h': np.dtype(np.float64),
+    'same_contracts': np.dtype(np.bool_),
+    **{f"up_{name}": np.dtype(dtype) for name, dtype in _LIMIT_FIELDS.items()},
+    **{f"low_{name}": np.dtype(dtype) for name, dtype in _LIMIT_FIELDS.items()},
+    'asks_end': np.dtype(np.int64),
+    'bids_end': np.dtype(np.int64),
+}
+
+# Колонки уровней стаканов
+LEVEL_COLUMNS: Dict[str, np.dtype] = {
+    name: np.dtype(np.float64) for name in ('ask_price', 'ask_amount', 'bid_price', 'bid_amount')
+}
+
+
+def segment_name(start: float) -> str:
+    return datetime.fromtimestamp(start, timezone.utc).strftime(SEGMENT_TIME_FORMAT)
+
+
+def _parse_segment_name(name: str) -> Optional[float]:
+    try:
+        return datetime.strptime(name, SEGMENT_TIME_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return None
+
+
+def _column_path(path: str, name: str) -> str:
+    return os.path.join(path, f"{name}.bin")
+
+
+def _file_rows(path: str, dtype: np.dtype) -> int:
+    try:
+        return os.path.getsize(path) // dtype.itemsize
+    except FileNotFoundError:
+        return 0
+
+
+def _write_json(path: str, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class SegmentWriter:
+    """Дозапись пар в один сегмент. Пары копятся в буферах до flush()"""
+
+    def __init__(self, path: str, start: float, length: float):
+        self.path = path
+        self.start = start
+        self.end = start + length
+        os.makedirs(path, exist_ok=True)
+
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            _write_json(meta_path, {
+                'version': FORMAT_VERSION,
+                'start': start,
+                'length': length,
+                'row_columns': {name: dtype.str for name, dtype in ROW_COLUMNS.items()},
+                'level_columns': {name: dtype.str for name, dtype in LEVEL_COLUMNS.items()},
+            })
+
+        self._dictionaries: Dict[str, List[str]] = {name: [] for name in set(STRING_FIELDS.values())}
+        dictionaries_path = os.path.join(path, "dictionaries.json")
+        if os.path.exists(dictionaries_path):
+            with open(dictionaries_path, encoding="utf-8") as f:
+                self._dictionaries.update(json.load(f))
+        self._codes = {
+            name: {value: code for code, value in enumerate(values)}
+            for name, values in self._dictionaries.items()
+        }
+        self._dictionaries_dirty = False
+
+        self.rows, self._asks_total, self._bids_total = self._recover()
+        self._buffers: Dict[str, list] = {name: [] for name in (*ROW_COLUMNS, *LEVEL_COLUMNS)}
+        self._files = {name: open(_column_path(path, name), "ab") for name in (*ROW_COLUMNS, *LEVEL_COLUMNS)}
+
+    def _recover(self) -> tuple:
+        """После падения колонки могут быть дописаны не полностью - обрезаем до общей длины"""
+        rows = min(_file_rows(_column_path(self.path, name), dtype) for name, dtype in ROW_COLUMNS.items())
+        asks = bids = 0
+        if rows:
+            asks = int(np.fromfile(_column_path(self.path, 'asks_end'), dtype=np.int64, count=rows)[-1])
+            bids = int(np.fromfile(_column_path(self.path, 'bids_end'), dtype=np.int64, count=rows)[-1])
+        sizes = {name: rows for name in ROW_COLUMNS}
+        sizes.update(ask_price=asks, ask_amount=asks, bid_price=bids, bid_amount=bids)
+        for name, count in sizes.items():
+            path = _column_path(self.path, name)
+            dtype = ROW_COLUMNS.get(name) or LEVEL_COLUMNS[name]
+            if os.path.exists(path) and os.path.getsize(path) != count * dtype.itemsize:
+                with open(path, "r+b") as f:
+                    f.truncate(count * dtype.itemsize)
+        if rows:
+            logger.info(f"Reopened history segment {self.path}: {rows} pairs")
+        return rows, asks, bids
+
+    def _code(self, field: str, value: str) -> int:
+        name = STRING_FIELDS[field]
+        codes = self._codes[name]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self._dictionaries[name])
+            self._dictionaries[name].append(value)
+            self._dictionaries_dirty = True
+        return code
+
+    @property
+    def buffered(self) -> int:
+        return len(self._buffers['ts'])
+
+    def append(self, pair: ServerData, ts: float):
+        b = self._buffers
+        b['ts'].append(ts)
+        for field in STRING_FIELDS:
+            b[field].append(self._code(field, getattr(pair, field)))
+        b['withdrawal_fee'].append(pair.withdrawal_fee)
+        b['maker_fee'].append(pair.maker_fee)
+        b['volume24h'].append(pair.volume24h)
+        b['same_contracts'].append(pair.same_contracts)
+        for prefix, limit in (('up', pair.data.up), ('low', pair.data.low)):
+            for name in _LIMIT_FIELDS:
+                b[f"{prefix}_{name}"].append(getattr(limit, name))
+
+        book = pair.order_book
+        if isinstance(book, CompactOrderBook):
+            b['ask_price'].extend(book.ask_prices.tolist())
+            b['ask_amount'].extend(book.ask_amounts.tolist())
+            b['bid_price'].extend(book.bid_prices.tolist())
+            b['bid_amount'].extend(book.bid_amounts.tolist())
+            self._asks_total += book.n_asks
+            self._bids_total += book.n_bids
+        else:
+            for order in book.asks:
+                b['ask_price'].append(order.price)
+                b['ask_amount'].append(order.amount)
+            for order in book.bids:
+                b['bid_price'].append(order.price)
+                b['bid_amount'].append(order.amount)
+            self._asks_total += len(book.asks)
+            self._bids_total += len(book.bids)
+        b['asks_end'].append(self._asks_total)
+        b['bids_end'].append(self._bids_total)
+
+    def flush(self):
+        rows = self.buffered
+        if not rows:
+            return
+        # словарь пишется раньше колонок: любая записанная строка ссылается на сохранённые коды
+        if self._dictionaries_dirty:
+            _write_json(os.path.join(self.path, "dictionaries.json"), self._dictionaries)
+            self._dictionaries_dirty = False
+        # уровни раньше строк: после падения лишние уровни обрезаются по asks_end/bids_end
+        for columns in (LEVEL_COLUMNS, ROW_COLUMNS):
+            for name, dtype in columns.items():
+                buffer = self._buffers[name]
+                if buffer:
+                    self._files[name].write(np.asarray(buffer, dtype=dtype).tobytes())
+                    buffer.clear()
+                self._files[name].flush()
+        self.rows += rows
+
+    def close(self):
+        self.flush()
+        for f in self._files.values():
+            f.close()
+
+
+class HistoryWriter:
+    """Сегменты фиксированной длины по времени получения пары и удаление старых"""
+
+    def __init__(self, root: str, segment_seconds: int = 3600, retention_seconds: float = 30 * 86400,
+                 flush_rows: int = 1024):
+        self.root = root
+        self._segment_seconds = segment_seconds
+        self._retention_seconds = retention_seconds
+        self._flush_rows = flush_rows
+        self._segment: Optional[SegmentWriter] = None
+        os.makedirs(root, exist_ok=True)
+
+        self.appended = 0
+
+    def append(self, pair: ServerData, ts: Optional[float] = None):
+        ts = time.time() if ts is None else ts
+        segment = self._segment
+        if segment is None or not segment.start <= ts < segment.end:
+            segment = self._rotate(ts)
+        segment.append(pair, ts)
+        self.appended += 1
+        if segment.buffered >= self._flush_rows:
+            segment.flush()
+
+    def _rotate(self, ts: float) -> SegmentWriter:
+        if self._segment is not None:
+            self._segment.close()
+        start = ts - ts % self._segment_seconds
+        self._segment = SegmentWriter(os.path.join(self.root, segment_name(start)), start, self._segment_seconds)
+        return self._segment
+
+    def flush(self):
+        if self._segment is not None:
+            self._segment.flush()
+
+    def close(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+    def cleanup(self, now: Optional[float] = None) -> int:
+        """Удаляет сегменты, закончившиеся раньше срока хранения. Возвращает их число"""
+        cutoff = (time.time() if now is None else now) - self._retention_seconds
+        removed = 0
+        for start, path in _segment_dirs(self.root):
+            if self._segment is not None and path == self._segment.path:
+                continue
+            if start + self._segment_length(path) <= cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        if removed:
+            logger.info(f"Removed {removed} history segments older than {self._retention_seconds / 86400:.1f} days")
+        return removed
+
+    def _segment_length(self, path: str) -> float:
+        try:
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                return json.load(f)['length']
+        except (OSError, ValueError, KeyError):
+            return self._segment_seconds
+
+
+def _segment_dirs(root: str) -> List[tuple]:
+    result = []
+    if not os.path.isdir(root):
+        return result
+    for name in os.listdir(root):
+        start = _parse_segment_name(name)
+        if start is not None and os.path.isdir(os.path.join(root, name)):
+            result.append((start, os.path.join(root, name)))
+    return sorted(result)
+
+
+class Segment:
+    """Сегмент только для чтения: колонки - np.memmap без копирования"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.start: float = meta['start']
+        self.end: float = meta['start'] + meta['length']
+        try:
+            with open(os.path.join(path, "dictionaries.json"), encoding="utf-8") as f:
+                self.dictionaries: Dict[str, List[str]] = json.load(f)
+        except FileNotFoundError:
+            self.dictionaries = {}
+        self._row_dtypes = {name: np.dtype(dtype) for name, dtype in meta['row_columns'].items()}
+        self._level_dtypes = {name: np.dtype(dtype) for name, dtype in meta['level_columns'].items()}
+        # видимы только строки, записанные во все колонки (писатель может дописывать)
+        self.rows = min(_file_rows(_column_path(path, name), dtype) for name, dtype in self._row_dtypes.items())
+        self._columns: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def column(self, name: str) -> np.ndarray:
+        """Колонка строк (или уровней стаканов) как отображение файла в память"""
+        array = self._columns.get(name)
+        if array is None:
+            dtype = self._row_dtypes.get(name) or self._level_dtypes[name]
+            if name in self._row_dtypes:
+                count = self.rows
+            else:
+                ends = self.column('asks_end' if name.startswith('ask_') else 'bids_end')
+                count = int(ends[-1]) if len(ends) else 0
+            if count == 0:
+                array = np.empty(0, dtype=dtype)
+            else:
+                array = np.memmap(_column_path(self.path, name), dtype=dtype, mode='r', shape=(count,))
+            self._columns[name] = array
+        return array
+
+    def strings(self, field: str) -> np.ndarray:
+        """Значения строкового поля (раскодированные, это уже копия)"""
+        values = np.asarray(self.dictionaries.get(STRING_FIELDS[field], []), dtype=object)
+        return values[self.column(field)]
+
+    def code(self, field: str, value: str) -> Optional[int]:
+        """Код строки в словаре сегмента - для фильтрации колонки без раскодирования"""
+        try:
+            return self.dictionaries.get(STRING_FIELDS[field], []).index(value)
+        except ValueError:
+            return None
+
+    def between(self, start: Optional[float] = None, end: Optional[float] = None) -> slice:
+        """Строки с start <= ts < end (пары пишутся по возрастанию времени)"""
+        ts = self.column('ts')
+        lo = 0 if start is None else int(np.searchsorted(ts, start, side='left'))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, end, side='left'))
+        return slice(lo, hi)
+
+    def _book_rows(self, row: int) -> tuple:
+        asks_end, bids_end = self.column('asks_end'), self.column('bids_end')
+        asks = slice(int(asks_end[row - 1]) if row else 0, int(asks_end[row]))
+        bids = slice(int(bids_end[row - 1]) if row else 0, int(bids_end[row]))
+        return asks, bids
+
+    def order_book(self, row: int) -> OrderBook:
+        asks, bids = self._book_rows(row)
+        return OrderBook(
+            asks=[Order(float(p), float(a)) for p, a in zip(self.column('ask_price')[asks], self.column('ask_amount')[asks])],
+            bids=[Order(float(p), float(a)) for p, a in zip(self.column('bid_price')[bids], self.column('bid_amount')[bids])],
+        )
+
+    def compact_order_book(self, row: int) -> CompactOrderBook:
+        """Стакан строки срезами колонок уровней - без объекта на уровень"""
+        asks, bids = self._book_rows(row)
+        return CompactOrderBook.from_arrays(
+            self.column('ask_price')[asks], self.column('ask_amount')[asks],
+            self.column('bid_price')[bids], self.column('bid_amount')[bids],
+        )
+
+    def _fields(self, row: int) -> dict:
+        """Скалярные поля строки (без объёмов и стакана)"""
+        def string(field):
+            return self.dictionaries[STRING_FIELDS[field]][int(self.column(field)[row])]
+
+        return dict(
+            **{field: string(field) for field in STRING_FIELDS},
+            withdrawal_fee=float(self.column('withdrawal_fee')[row]),
+            maker_fee=float(self.column('maker_fee')[row]),
+            volume24h=float(self.column('volume24h')[row]),
+            same_contracts=bool(self.column('same_contracts')[row]),
+        )
+
+    def _limit(self, cls, prefix: str, row: int):
+        return cls(**{
+            name: (int if dtype is np.int32 else float)(self.column(f"{prefix}_{name}")[row])
+            for name, dtype in _LIMIT_FIELDS.items()
+        })
+
+    def pair(self, row: int) -> ServerData:
+        """Восстанавливает ServerData строки (для воспроизведения трафика)"""
+        return ServerData(
+            **self._fields(row),
+            data=VolumeData(up=self._limit(UpperLimit, 'up', row), low=self._limit(LowerLimit, 'low', row)),
+            order_book=self.order_book(row),
+        )
+
+    def compact_pair(self, row: int) -> CompactServerData:
+        """То же в компактном виде; строки берутся из словаря сегмента, одни объекты на сегмент"""
+        return CompactServerData(
+            **self._fields(row),
+            data=CompactVolumeData(
+                up=self._limit(CompactUpperLimit, 'up', row),
+                low=self._limit(CompactLowerLimit, 'low', row),
+            ),
+            order_book=self.compact_order_book(row),
+        )
+
+
+def open_segments(root: str, start: Optional[float] = None, end: Optional[float] = None) -> List[Segment]:
+    """Сегменты, пересекающие [start, end), по возрастанию времени"""
+    segments = []
+    for segment_start, path in _segment_dirs(root):
+        if end is not None and segment_start >= end:
+            continue
+        try:
+            segment = Segment(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Skipping unreadable history segment {path}: {e}")
+            continue
+        if start is not None and segment.end <= start:
+            continue
+        segments.append(segment)
+    return segments
+
+
+def iter_pairs(root: str, start: Optional[float] = None, end: Optional[float] = None,
+               compact: bool = False) -> Iterator[tuple]:
+    """(ts, пара) за период - для воспроизведения, материализует объекты.
+
+    compact=True отдаёт CompactServerData: стакан массивом, без Order на уровень.
+    """
+    for segment in open_segments(root, start, end):
+        rows = segment.between(start, end)
+        ts = segment.column('ts')
+        build = segment.compact_pair if compact else segment.pair
+        for row in range(rows.start, rows.stop):
+            yield float(ts[row]), build(row)
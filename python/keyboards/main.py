@@ -1,8 +1,17 @@
+from functools import lru_cache
+from typing import Dict
+
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
+from config.main import KEYBOARD_CACHE_SIZE
 from models.consts import *
-from database.models import User
+from monitoring.metrics import lru_cache_stats
+
+# Клавиатуры кэшируются и отдаются всем пользователям одним и тем же объектом:
+# вызывающий код не должен их изменять. Статические строятся один раз,
+# зависящие от настроек - по ключу из битовых масок (LRU на KEYBOARD_CACHE_SIZE).
 
+@lru_cache(maxsize=None)
 def settings_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="🔎 Фильтры", callback_data="filters_back")],
@@ -10,6 +19,7 @@ def settings_keyboard():
         [InlineKeyboardButton(text="🔄 Частота уведомлений", callback_data="menu_notifys"),],
     ])
 
+@lru_cache(maxsize=None)
 def notifys_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="🔔 При каждом обновлении", callback_data="freq_instant")],
@@ -19,6 +29,7 @@ def notifys_keyboard():
         [InlineKeyboardButton(text="🏠 Главное меню", callback_data="menu_settings")],
     ])
 
+@lru_cache(maxsize=None)
 def msg_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="👀 Предпросмотр", callback_data="show_msg")],
@@ -26,11 +37,13 @@ def msg_keyboard():
         [InlineKeyboardButton(text="🏠 Главное меню", callback_data="menu_settings")],
     ])
 
+@lru_cache(maxsize=None)
 def show_msg_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="⬅️ Назад", callback_data="msg_back")],
     ])
 
+@lru_cache(maxsize=None)
 def filters_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="🏦 Биржи", callback_data="edit_exchanges")],
@@ -41,6 +54,7 @@ def filters_keyboard():
         [InlineKeyboardButton(text="🏠 Главное меню", callback_data="menu_settings")],
     ])
 
+@lru_cache(maxsize=None)
 def blacklist_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="🪙 ЧС Монет", callback_data="edit_blacklist_coins")],
@@ -48,6 +62,7 @@ def blacklist_keyboard():
         [InlineKeyboardButton(text="⬅️ Обратно в меню", callback_data="filters_back")]
     ])
 
+@lru_cache(maxsize=None)
 def coins_blacklist_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="➕ Добавить монеты", callback_data="add_coin")],
@@ -55,6 +70,7 @@ def coins_blacklist_keyboard():
         [InlineKeyboardButton(text="⬅️ Назад", callback_data="edit_blacklists")]
     ])
 
+@lru_cache(maxsize=None)
 def nets_blacklist_keyboard():
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="➕ Добавить сети", callback_data="add_net")],
@@ -62,6 +78,7 @@ def nets_blacklist_keyboard():
         [InlineKeyboardButton(text="⬅️ Назад", callback_data="edit_blacklists")]
     ])
 
+@lru_cache(maxsize=None)
 def cancel_keyboard(type):
     match type:
         case "edit": 
@@ -86,6 +103,11 @@ def get_category_data(category_key: str) -> Tuple[str, List[Tuple[int, str]]]:
             (PROFIT_MIN_BIT, "Профит"),
             (COMMISSION_MIN_BIT, "Комиссия"),
         ]),
+        "best_volume_params": ("Наилучший объём", [
+            (BEST_SPREAD_BIT, "Спред"),
+            (BEST_PROFIT_BIT, "Профит"),
+            (BEST_COMMISSION_BIT, "Комиссия"),
+        ]),
         "additional_params": ("Дополнительные параметры", [
             (CHECK_CONTRACT_BIT, "Проверка контрактов"),
             (DAILY_TURNOVER_BIT, "24ч оборот"),
@@ -100,6 +122,7 @@ def get_category_params(category_key: str) -> List[Tuple[int, str]]:
     category_data = get_category_data(category_key)
     return category_data[1] if category_data else []
 
+@lru_cache(maxsize=None)
 def main_params_keyboard() -> InlineKeyboardMarkup:
     """Генерирует главное меню выбора категории параметров"""
     buttons = [
@@ -124,8 +147,25 @@ def main_params_keyboard() -> InlineKeyboardMarkup:
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
-def category_params_keyboard(user: User, params_list: List[Tuple[int, str]], page: int = 0, category_key: str = "", all_enabled: bool = False) -> InlineKeyboardMarkup:
+@lru_cache(maxsize=None)
+def category_mask(category_key: str) -> int:
+    """Битовая маска всех параметров категории"""
+    mask = 0
+    for bit, _ in get_category_params(category_key):
+        mask |= bit
+    return mask
+
+def category_params_keyboard(category_key: str, blacklisted_params: int, page: int = 0) -> InlineKeyboardMarkup:
+    """Клавиатура параметров категории. Зависит только от битов этой категории, остальные отбрасываются"""
+    return _category_params_keyboard(category_key, blacklisted_params & category_mask(category_key), page)
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def _category_params_keyboard(category_key: str, params_mask: int, page: int) -> InlineKeyboardMarkup:
     """Генерирует клавиатуру с параметрами для конкретной категории с пагинацией"""
+    params_list = get_category_params(category_key)
+    # Все параметры категории включены, если ни один бит не установлен
+    all_enabled = params_mask == 0
+
     # Настройки пагинации
     ITEMS_PER_PAGE = 6  # 3 строки по 2 параметра
     
@@ -149,7 +189,7 @@ def category_params_keyboard(user: User, params_list: List[Tuple[int, str]], pag
     # Кнопки параметров - по 2 в строке
     param_buttons = []
     for i, (bit, name) in enumerate(current_params):
-        is_enabled = user.is_param_enabled(bit)
+        is_enabled = (params_mask & bit) == 0
         status = "✅" if is_enabled else "❌"
         
         # Создаем кнопку параметра
@@ -207,7 +247,24 @@ def category_params_keyboard(user: User, params_list: List[Tuple[int, str]], pag
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
-def get_exchanges_keyboard(user: User, page: int = 0) -> InlineKeyboardMarkup:
+def _exchanges_page_mask(page: int) -> int:
+    mask = 0
+    for bit, _ in EXCHANGES_LIST[page * EXCHANGES_ITEMS_PER_PAGE:(page + 1) * EXCHANGES_ITEMS_PER_PAGE]:
+        mask |= bit
+    return mask
+
+_EXCHANGES_PAGE_MASKS = tuple(
+    _exchanges_page_mask(page)
+    for page in range((len(EXCHANGES_LIST) + EXCHANGES_ITEMS_PER_PAGE - 1) // EXCHANGES_ITEMS_PER_PAGE)
+)
+
+def get_exchanges_keyboard(withdraw_mask: int, deposit_mask: int, page: int = 0) -> InlineKeyboardMarkup:
+    """Клавиатура бирж страницы page. Из масок черного списка берутся только биржи этой страницы"""
+    page_mask = _EXCHANGES_PAGE_MASKS[page] if 0 <= page < len(_EXCHANGES_PAGE_MASKS) else 0
+    return _exchanges_keyboard(withdraw_mask & page_mask, deposit_mask & page_mask, page)
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def _exchanges_keyboard(withdraw_mask: int, deposit_mask: int, page: int) -> InlineKeyboardMarkup:
     """Генерирует клавиатуру с биржами для указанной страницы"""
     start_idx = page * EXCHANGES_ITEMS_PER_PAGE
     end_idx = start_idx + EXCHANGES_ITEMS_PER_PAGE
@@ -224,8 +281,8 @@ def get_exchanges_keyboard(user: User, page: int = 0) -> InlineKeyboardMarkup:
     
     # Кнопки бирж
     for bit, name in current_exchanges:
-        withdraw_status = "✅" if user.is_withdraw_exchange_enabled(bit) else "❌"
-        deposit_status = "✅" if user.is_deposit_exchange_enabled(bit) else "❌"
+        withdraw_status = "✅" if (withdraw_mask & bit) == 0 else "❌"
+        deposit_status = "✅" if (deposit_mask & bit) == 0 else "❌"
         
         buttons.append([
             InlineKeyboardButton(text=name, callback_data=f"exchange_info_{bit}"),
@@ -265,9 +322,21 @@ def get_exchanges_keyboard(user: User, page: int = 0) -> InlineKeyboardMarkup:
     
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
-def edit_contract_keyboard(user: User) -> InlineKeyboardMarkup:
-    status = "✅" if user.check_contract else "❌"
+@lru_cache(maxsize=None)
+def edit_contract_keyboard(check_contract: bool) -> InlineKeyboardMarkup:
+    status = "✅" if check_contract else "❌"
     return InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text=f"{status} Проверять контракты", callback_data="toggle_contract")],
         [InlineKeyboardButton(text="⬅️ Обратно в меню", callback_data="filters_back")]
     ])
+
+_CACHED_KEYBOARDS = {
+    'exchanges': _exchanges_keyboard,
+    'category_params': _category_params_keyboard,
+    'edit_contract': edit_contract_keyboard,
+    'cancel': cancel_keyboard,
+}
+
+def keyboard_cache_stats() -> Dict[str, Dict[str, float]]:
+    """Статистика кэшей клавиатур, зависящих от настроек пользователя"""
+    return lru_cache_stats(_CACHED_KEYBOARDS)
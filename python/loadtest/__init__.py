@@ -0,0 +1,2 @@
+from .fake_grpc import FakeFilterSyncService, start_fake_grpc
+from .fake_telegram import FakeTelegramServer
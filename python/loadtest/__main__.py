@@ -0,0 +1,5 @@
+import sys
+
+from loadtest.main import main
+
+sys.exit(main())
@@ -0,0 +1,65 @@
+import asyncio
+import logging
+from collections import Counter
+
+import grpc
+
+try:
+    from ..models.genproto import filter_sync_pb2_grpc, filter_sync_pb2
+except Exception:
+    from models.genproto import filter_sync_pb2_grpc, filter_sync_pb2
+
+logger = logging.getLogger(__name__)
+
+
+class FakeFilterSyncService(filter_sync_pb2_grpc.FilterSyncServiceServicer):
+    """Заглушка Go FilterSyncService: подтверждает обновления и считает их.
+
+    latency - искусственная задержка ответа (с), error_rate - доля элементов,
+    на которые возвращается success=False (проверка повторов outbox).
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0):
+        self._latency = latency
+        self._error_rate = error_rate
+        self._handled = 0
+
+        self.calls: Counter = Counter()
+        self.filters: Counter = Counter()
+        self.failed = 0
+
+    def _apply(self, item) -> filter_sync_pb2.UpdateUserFiltersResponse:
+        self._handled += 1
+        self.filters[item.filter] += 1
+        # детерминированно: каждый N-й элемент получает ошибку
+        if self._error_rate > 0 and self._handled % max(1, round(1 / self._error_rate)) == 0:
+            self.failed += 1
+            return filter_sync_pb2.UpdateUserFiltersResponse(success=False, message="load test failure")
+        return filter_sync_pb2.UpdateUserFiltersResponse(success=True, message="ok")
+
+    async def UpdateUserFilters(self, request, context):
+        self.calls['UpdateUserFilters'] += 1
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        return self._apply(request)
+
+    async def UpdateUserFiltersBatch(self, request, context):
+        self.calls['UpdateUserFiltersBatch'] += 1
+        if self._latency:
+            await asyncio.sleep(self._latency)
+        results = [self._apply(item) for item in request.items]
+        return filter_sync_pb2.UpdateUserFiltersBatchResponse(
+            success=all(r.success for r in results),
+            message="ok",
+            results=results,
+        )
+
+
+async def start_fake_grpc(service: FakeFilterSyncService, host: str, port: int) -> tuple:
+    """Запускает grpc.aio сервер с заглушкой. Возвращает (server, фактический порт)"""
+    server = grpc.aio.server()
+    filter_sync_pb2_grpc.add_FilterSyncServiceServicer_to_server(service, server)
+    port = server.add_insecure_port(f"{host}:{port}")
+    await server.start()
+    logger.info(f"Fake FilterSyncService listening on {host}:{port}")
+    return server, port
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import logging
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+
+class _Waiter:
+    def __init__(self, replies: int):
+        self.remaining = replies
+        self.texts: List[str] = []
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class FakeTelegramServer:
+    """Локальная замена Bot API для нагрузочного теста.
+
+    Бот подключается к нему через TELEGRAM_API_URL и забирает обновления через
+    getUpdates. Виртуальные пользователи кладут обновления через push_message /
+    push_callback и ждут ответа бота (sendMessage / editMessageText или
+    answerCallbackQuery с текстом) через expect_reply.
+    """
+
+    def __init__(self, token: str, bot_id: int = 1):
+        self._token = token
+        self._bot = {'id': bot_id, 'is_bot': True, 'first_name': 'LoadTest', 'username': 'loadtest_bot'}
+        self._updates: Deque[Dict[str, Any]] = deque()
+        self._new_updates = asyncio.Condition()
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self._callback_chats: Dict[str, int] = {}
+        self._last_callback: Dict[int, str] = {}
+        self._waiters: Dict[int, _Waiter] = {}
+        self._runner: Optional[web.AppRunner] = None
+
+        self.calls: Counter = Counter()
+        self.unknown_methods: Counter = Counter()
+        self.unexpected_replies = 0  # ответы, которых никто не ждал (запоздавшие)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        return app
+
+    async def start(self, host: str, port: int) -> int:
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        logger.info(f"Fake Telegram Bot API listening on http://{host}:{port}")
+        return port
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def pending_updates(self) -> int:
+        return len(self._updates)
+
+    # --- сторона виртуальных пользователей ---
+
+    async def push_message(self, user_id: int, text: str):
+        message = self._message(user_id, text, from_bot=False)
+        if text.startswith("/"):
+            command = text.split()[0]
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+        await self._push({'message': message})
+
+    async def push_callback(self, user_id: int, data: str):
+        callback_id = f"{user_id}:{self._next_update_id}"
+        # без answer() id остался бы навсегда: храним только последний callback пользователя
+        self._callback_chats.pop(self._last_callback.get(user_id), None)
+        self._last_callback[user_id] = callback_id
+        self._callback_chats[callback_id] = user_id
+        await self._push({'callback_query': {
+            'id': callback_id,
+            'from': self._user(user_id),
+            'chat_instance': str(user_id),
+            'message': self._message(user_id, "menu", from_bot=True),
+            'data': data,
+        }})
+
+    def expect_reply(self, user_id: int, replies: int = 1) -> asyncio.Future:
+        """Регистрирует ожидание replies ответов пользователю. Вызывать до push_*"""
+        waiter = _Waiter(replies)
+        self._waiters[user_id] = waiter
+        return waiter.future
+
+    def cancel_reply(self, user_id: int):
+        self._waiters.pop(user_id, None)
+
+    # --- сторона бота ---
+
+    async def _push(self, event: Dict[str, Any]):
+        async with self._new_updates:
+            event['update_id'] = self._next_update_id
+            self._next_update_id += 1
+            self._updates.append(event)
+            self._new_updates.notify_all()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        if request.match_info["token"] != self._token:
+            return self._error(401, "Unauthorized")
+        params = await self._params(request)
+        self.calls[method] += 1
+
+        handler = getattr(self, f"_api_{method}", None)
+        if handler is None:
+            self.unknown_methods[method] += 1
+            return self._error(404, f"Not Found: method {method}")
+        return web.json_response({'ok': True, 'result': await handler(params)})
+
+    async def _params(self, request: web.Request) -> Dict[str, Any]:
+        if request.content_type == "application/json":
+            return await request.json()
+        params: Dict[str, Any] = {}
+        for key, value in (await request.post()).items():
+            # сложные поля (reply_markup, allowed_updates) aiogram передаёт JSON строкой
+            if isinstance(value, str) and value[:1] in ("{", "["):
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    pass
+            params[key] = value
+        return params
+
+    def _error(self, code: int, description: str) -> web.Response:
+        return web.json_response({'ok': False, 'error_code': code, 'description': description}, status=code)
+
+    def _reply(self, chat_id: int, text: str):
+        waiter = self._waiters.get(chat_id)
+        if waiter is None or waiter.future.done():
+            self.unexpected_replies += 1
+            return
+        waiter.texts.append(text)
+        waiter.remaining -= 1
+        if waiter.remaining <= 0:
+            del self._waiters[chat_id]
+            waiter.future.set_result(waiter.texts)
+
+    async def _api_getMe(self, params):
+        return self._bot
+
+    async def _api_deleteWebhook(self, params):
+        return True
+
+    async def _api_setWebhook(self, params):
+        return True
+
+    async def _api_getUpdates(self, params):
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        async with self._new_updates:
+            while self._updates and self._updates[0]['update_id'] < offset:
+                self._updates.popleft()
+            if not self._updates and timeout > 0:
+                try:
+                    await asyncio.wait_for(self._new_updates.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            return [self._updates[i] for i in range(min(limit, len(self._updates)))]
+
+    async def _api_sendMessage(self, params):
+        chat_id = int(params["chat_id"])
+        self._reply(chat_id, params.get("text", ""))
+        return self._message(chat_id, params.get("text", ""), from_bot=True)
+
+    async def _api_editMessageText(self, params):
+        chat_id = int(params["chat_id"])
+        self._reply(chat_id, params.get("text", ""))
+        message = self._message(chat_id, params.get("text", ""), from_bot=True)
+        message['message_id'] = int(params.get("message_id") or message['message_id'])
+        return message
+
+    async def _api_deleteMessage(self, params):
+        return True
+
+    async def _api_answerCallbackQuery(self, params):
+        chat_id = self._callback_chats.pop(params["callback_query_id"], None)
+        # пустой answer() только гасит "часики", ответом пользователю считается текст
+        if chat_id is not None and params.get("text"):
+            self._reply(chat_id, params["text"])
+        return True
+
+    def _user(self, user_id: int) -> Dict[str, Any]:
+        return {'id': user_id, 'is_bot': False, 'first_name': f"user{user_id}", 'language_code': 'ru'}
+
+    def _message(self, chat_id: int, text: str, from_bot: bool) -> Dict[str, Any]:
+        message_id = self._next_message_id
+        self._next_message_id += 1
+        return {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private', 'first_name': f"user{chat_id}"},
+            'from': self._bot if from_bot else self._user(chat_id),
+            'text': text,
+        }
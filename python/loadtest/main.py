@@ -0,0 +1,255 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import signal
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from loadtest.fake_grpc import FakeFilterSyncService, start_fake_grpc
+from loadtest.fake_telegram import FakeTelegramServer
+from models.consts import EXCHANGES_ITEMS_PER_PAGE, EXCHANGES_LIST, SPREAD_MAX_BIT
+
+logger = logging.getLogger(__name__)
+
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@dataclass(frozen=True)
+class Step:
+    name: str       # метка в отчёте
+    kind: str       # "message" или "callback"
+    data: str       # текст сообщения или callback_data
+    replies: int = 1  # сколько ответов бота ждать
+
+
+def scenario(rng: random.Random) -> List[Step]:
+    """Один проход пользователя по меню фильтров: биржи, спред, ЧС монет, частота, параметры"""
+    bit, _ = rng.choice(EXCHANGES_LIST[:EXCHANGES_ITEMS_PER_PAGE])
+    return [
+        Step("filters_cmd", "message", "/filters"),
+        Step("edit_exchanges", "callback", "edit_exchanges"),
+        Step("toggle_withdraw", "callback", f"toggle_withdraw_{bit}_0", replies=2),
+        Step("toggle_deposit", "callback", f"toggle_deposit_{bit}_0", replies=2),
+        Step("edit_spread", "callback", "edit_spread"),
+        Step("process_spread", "message", f"{rng.randint(0, 2)} {rng.randint(3, 20)}", replies=2),
+        Step("edit_blacklist_coins", "callback", "edit_blacklist_coins"),
+        Step("add_coin", "callback", "add_coin"),
+        Step("process_add_coin", "message", "BTC, ETH", replies=2),
+        Step("remove_coin", "callback", "remove_coin"),
+        Step("process_remove_coin", "message", "BTC, ETH", replies=2),
+        Step("menu_notifys", "callback", "menu_notifys"),
+        Step("freq_custom", "callback", "freq_custom"),
+        Step("process_custom_frequency", "message", rng.choice(("30m", "1h30m", "2h15m10s")), replies=2),
+        Step("edit_params", "callback", "edit_params"),
+        Step("max_volume_params", "callback", "max_volume_params_0"),
+        Step("toggle_category_param", "callback", f"toggle_category_param_{SPREAD_MAX_BIT}_0_max_volume_params",
+             replies=2),
+    ]
+
+
+class LoadStats:
+    """Задержки и ошибки по шагам сценария"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.timeouts: Dict[str, int] = defaultdict(int)
+        self.error_replies: Dict[str, int] = defaultdict(int)
+
+    def report(self, elapsed: float) -> Dict:
+        steps = {}
+        for name in sorted(set(self.latencies) | set(self.timeouts) | set(self.error_replies)):
+            values = sorted(self.latencies[name])
+            count = len(values) + self.timeouts[name]
+            errors = self.timeouts[name] + self.error_replies[name]
+            steps[name] = {
+                'count': count,
+                'timeouts': self.timeouts[name],
+                'error_replies': self.error_replies[name],
+                'error_rate': errors / count if count else 0.0,
+                'p50_ms': _percentile(values, 0.50) * 1000,
+                'p99_ms': _percentile(values, 0.99) * 1000,
+                'max_ms': (values[-1] if values else 0.0) * 1000,
+            }
+        total = sum(s['count'] for s in steps.values())
+        errors = sum(s['timeouts'] + s['error_replies'] for s in steps.values())
+        return {
+            'elapsed': elapsed,
+            'steps_total': total,
+            'throughput': total / elapsed if elapsed else 0.0,
+            'error_rate': errors / total if total else 0.0,
+            'steps': steps,
+        }
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class VirtualUser:
+    """Пользователь: /start, затем сценарий по кругу до deadline с паузой think между шагами"""
+
+    def __init__(self, api: FakeTelegramServer, stats: LoadStats, user_id: int,
+                 think: tuple, reply_timeout: float, seed: int):
+        self._api = api
+        self._stats = stats
+        self._user_id = user_id
+        self._think = think
+        self._reply_timeout = reply_timeout
+        self._rng = random.Random(seed)
+
+    async def run(self, deadline: float):
+        loop = asyncio.get_running_loop()
+        await self._step(Step("start_cmd", "message", "/start"))
+        while loop.time() < deadline:
+            for step in scenario(self._rng):
+                if loop.time() >= deadline:
+                    return
+                await asyncio.sleep(self._rng.uniform(*self._think))
+                await self._step(step)
+
+    async def _step(self, step: Step):
+        reply = self._api.expect_reply(self._user_id, step.replies)
+        started = time.perf_counter()
+        if step.kind == "message":
+            await self._api.push_message(self._user_id, step.data)
+        else:
+            await self._api.push_callback(self._user_id, step.data)
+        try:
+            texts = await asyncio.wait_for(reply, self._reply_timeout)
+        except asyncio.TimeoutError:
+            self._api.cancel_reply(self._user_id)
+            self._stats.timeouts[step.name] += 1
+            return
+        self._stats.latencies[step.name].append(time.perf_counter() - started)
+        # сценарий вводит только корректные значения, "❌" в ответе - ошибка обработки
+        if any(str(text).startswith("❌") for text in texts):
+            self._stats.error_replies[step.name] += 1
+
+
+async def wait_for_bot(api: FakeTelegramServer, process: Optional[asyncio.subprocess.Process], timeout: float):
+    """Бот готов, когда начал опрашивать getUpdates"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while api.calls['getUpdates'] == 0:
+        if process is not None and process.returncode is not None:
+            raise RuntimeError(f"Bot process exited with code {process.returncode}")
+        if loop.time() > deadline:
+            raise RuntimeError(f"Bot did not call getUpdates in {timeout}s")
+        await asyncio.sleep(0.2)
+
+
+async def run_load(args) -> Dict:
+    api = FakeTelegramServer(args.token)
+    api_port = await api.start(args.host, args.api_port)
+    grpc_service = FakeFilterSyncService(latency=args.grpc_latency_ms / 1000, error_rate=args.grpc_error_rate)
+    grpc_server, grpc_port = await start_fake_grpc(grpc_service, args.host, args.grpc_port)
+
+    bot_env = {
+        'TELEGRAM_BOT_TOKEN': args.token,
+        'TELEGRAM_API_URL': f"http://{args.host}:{api_port}",
+        'GRPC_ADDR': args.host,
+        'GRPC_PORT': str(grpc_port),
+    }
+    process = None
+    if args.no_bot:
+        print("Start the bot with:\n" + "\n".join(f"  export {k}={v}" for k, v in bot_env.items()))
+    else:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "main.py", cwd=BOT_DIR, env={**os.environ, **bot_env},
+        )
+
+    try:
+        await wait_for_bot(api, process, args.startup_timeout)
+        logger.info(f"Bot is polling, starting {args.users} virtual users")
+
+        stats = LoadStats()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = started + args.ramp + args.duration
+        tasks = []
+        for i in range(args.users):
+            user = VirtualUser(
+                api, stats, args.user_base + i,
+                think=(args.think_min, args.think_max),
+                reply_timeout=args.reply_timeout,
+                seed=args.seed + i,
+            )
+            tasks.append(asyncio.create_task(user.run(deadline)))
+            if args.ramp > 0:
+                await asyncio.sleep(args.ramp / args.users)
+        await asyncio.gather(*tasks)
+        result = stats.report(loop.time() - started)
+    finally:
+        if process is not None and process.returncode is None:
+            process.send_signal(signal.SIGINT)
+            try:
+                await asyncio.wait_for(process.wait(), 30)
+            except asyncio.TimeoutError:
+                process.kill()
+        await grpc_server.stop(None)
+        await api.stop()
+
+    result['users'] = args.users
+    result['telegram_calls'] = dict(api.calls)
+    result['telegram_unknown_methods'] = dict(api.unknown_methods)
+    result['unexpected_replies'] = api.unexpected_replies
+    result['grpc_calls'] = dict(grpc_service.calls)
+    result['grpc_filters'] = dict(grpc_service.filters)
+    return result
+
+
+def print_report(result: Dict):
+    print(f"\nUsers: {result['users']}, elapsed: {result['elapsed']:.1f}s, "
+          f"steps: {result['steps_total']}, throughput: {result['throughput']:.1f} steps/s, "
+          f"error rate: {result['error_rate']:.2%}")
+    print(f"\n{'step':<28} {'count':>7} {'errors':>7} {'timeouts':>8} {'p50, ms':>9} {'p99, ms':>9} {'max, ms':>9}")
+    for name, step in result['steps'].items():
+        print(f"{name:<28} {step['count']:>7} {step['error_replies']:>7} {step['timeouts']:>8} "
+              f"{step['p50_ms']:>9.1f} {step['p99_ms']:>9.1f} {step['max_ms']:>9.1f}")
+    print(f"\nBot API calls: {result['telegram_calls']}")
+    if result['telegram_unknown_methods']:
+        print(f"Unknown Bot API methods: {result['telegram_unknown_methods']}")
+    print(f"Late/unexpected replies: {result['unexpected_replies']}")
+    print(f"gRPC calls: {result['grpc_calls']}, filters: {result['grpc_filters']}")
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота фильтров с локальными Bot API и gRPC")
+    parser.add_argument("--users", type=int, default=1000, help="число виртуальных пользователей")
+    parser.add_argument("--duration", type=float, default=60, help="длительность после разгона, с")
+    parser.add_argument("--ramp", type=float, default=10, help="время разгона до --users, с")
+    parser.add_argument("--think-min", type=float, default=0.2, help="минимальная пауза между шагами, с")
+    parser.add_argument("--think-max", type=float, default=1.0, help="максимальная пауза между шагами, с")
+    parser.add_argument("--reply-timeout", type=float, default=10, help="ожидание ответа бота, с")
+    parser.add_argument("--user-base", type=int, default=900_000_000, help="tg_id первого виртуального пользователя")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--api-port", type=int, default=0, help="порт фейкового Bot API, 0 - любой свободный")
+    parser.add_argument("--grpc-port", type=int, default=0, help="порт заглушки FilterSyncService, 0 - любой свободный")
+    parser.add_argument("--grpc-latency-ms", type=float, default=0)
+    parser.add_argument("--grpc-error-rate", type=float, default=0)
+    parser.add_argument("--token", default="123456:loadtest")
+    parser.add_argument("--no-bot", action="store_true", help="не запускать бота, подключится уже запущенный")
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    parser.add_argument("--json", default="", help="сохранить отчёт в JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    result = asyncio.run(run_load(args))
+    print_report(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,33 +1,260 @@
 import asyncio
+import logging
+import signal
+from typing import Tuple
+
+from aiohttp import web
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.fsm.storage.redis import RedisStorage
+from aiogram.fsm.storage.base import BaseStorage
 
-from config.main import BOT_TOKEN, REDIS_ADDR, REDIS_PASSWORD
+from config.main import (
+    BOT_TOKEN, TELEGRAM_API_URL,
+    GRPC_ADDR, GRPC_PORT, GRPC_TIMEOUT, GRPC_POOL_SIZE, GRPC_KEEPALIVE_MS,
+    SYNC_DEBOUNCE_MS, OUTBOX_BATCH_SIZE, OUTBOX_POLL_INTERVAL, OUTBOX_BACKOFF_MAX, OUTBOX_MAX_ATTEMPTS,
+    BOT_MODE, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_URL, WEBHOOK_SECRET,
+    WEBHOOK_WORKERS, WEBHOOK_QUEUE_SIZE,
+    SHARD_WORKERS, SHARD_QUEUE_SIZE, SHARD_CONCURRENCY, UPDATES_PINNED, FSM_CACHE_TTL,
+    METRICS_HOST, METRICS_PORT,
+    PROFILE_SAMPLE_RATE, PROFILE_THRESHOLD_MS, PROFILE_DIR, PROFILE_KEEP,
+)
 from database.main import engine
 from database.models import Base
+from clients.grpc_client import FilterSyncClient
+from clients.outbox import FilterSyncOutboxWorker
+from clients.redis_pool import close_redis, get_redis
+from clients.telegram import PRIORITY_NAMES, CallbackAnswerMiddleware, edit_dedup, request_scheduler
 from handlers.commands import router
 from handlers.callbacks import callback_router
+from keyboards.main import keyboard_cache_stats
+from pairs.live import live_pairs, start_live_pairs, stop_live_pairs
+from states.storage import FSMWriteBatchMiddleware, TieredStorage
+from texts.main import text_cache_stats
+from webhook.main import WebhookServer
+from sharding.main import ShardRouter, run_polling_front, build_webhook_front
+from monitoring.metrics import InstrumentedStorage, register_gauge
+from monitoring.middleware import MetricsMiddleware
+from monitoring.profiler import ProfilerMiddleware
+from monitoring.server import start_monitoring
+
+logger = logging.getLogger(__name__)
+
+def create_bot() -> Bot:
+    """Bot, при заданном TELEGRAM_API_URL - с запросами на этот Bot API сервер.
+
+    Правки без изменений не отправляются, остальные запросы проходят через планировщик
+    с лимитами Bot API.
+    """
+    if TELEGRAM_API_URL:
+        bot = Bot(token=BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)))
+    else:
+        bot = Bot(token=BOT_TOKEN)
+    bot.session.middleware(edit_dedup)
+    bot.session.middleware(request_scheduler)
+    return bot
+
+def create_storage() -> BaseStorage:
+    """FSM storage процесса: кэш в памяти перед Redis на общем пуле соединений"""
+    # без привязки пользователя к процессу чужие изменения не видны кэшу - читаем
+    # Redis всегда, записи по-прежнему уходят одним pipeline на обновление
+    storage = TieredStorage(RedisStorage(get_redis()), ttl=FSM_CACHE_TTL if UPDATES_PINNED else 0)
+    register_gauge(
+        "bot_fsm_cache_hit_ratio", "Доля чтений FSM состояния из кэша в памяти", [],
+        lambda: {(): storage.stats()['hit_rate']},
+    )
+    register_gauge(
+        "bot_fsm_cache_size", "Пользователей в кэше FSM состояний", [],
+        lambda: {(): storage.stats()['size']},
+    )
+    return InstrumentedStorage(storage)
+
+def build_dispatcher(storage) -> Dispatcher:
+    """Dispatcher со всеми routers - общий для polling, webhook и воркеров шардинга"""
+    dp = Dispatcher(storage=storage)
+    dp.update.outer_middleware(MetricsMiddleware())
+    # записи FSM обработчика уходят в Redis одним pipeline после него
+    dp.update.outer_middleware(FSMWriteBatchMiddleware())
+    if PROFILE_SAMPLE_RATE > 0:
+        # профилирование части обновлений, медленные сохраняются в PROFILE_DIR
+        dp.update.outer_middleware(ProfilerMiddleware(
+            PROFILE_SAMPLE_RATE, PROFILE_THRESHOLD_MS / 1000, PROFILE_DIR, keep=PROFILE_KEEP,
+        ))
+    # ответ на callback, правка которого пропущена как неизменённая
+    dp.callback_query.outer_middleware(CallbackAnswerMiddleware())
+    dp.include_router(router)
+    dp.include_router(callback_router)
+    # реальные пары для превью - в каждом процессе, где работают обработчики
+    dp.startup.register(start_live_pairs)
+    dp.shutdown.register(stop_live_pairs)
+    return dp
+
+def register_cache_gauges():
+    """Метрики кэшей и очереди запросов к Bot API (читаются при scrape)"""
+    register_gauge(
+        "bot_keyboard_cache_hit_ratio", "Доля попаданий в кэш клавиатур", ["keyboard"],
+        lambda: {(name,): stats['hit_rate'] for name, stats in keyboard_cache_stats().items()},
+    )
+    register_gauge(
+        "bot_keyboard_cache_size", "Количество клавиатур в кэше", ["keyboard"],
+        lambda: {(name,): stats['size'] for name, stats in keyboard_cache_stats().items()},
+    )
+    register_gauge(
+        "bot_text_cache_hit_ratio", "Доля попаданий в кэш текстов меню", ["text"],
+        lambda: {(name,): stats['hit_rate'] for name, stats in text_cache_stats().items()},
+    )
+    register_gauge(
+        "bot_text_cache_size", "Количество текстов меню в кэше", ["text"],
+        lambda: {(name,): stats['size'] for name, stats in text_cache_stats().items()},
+    )
+    register_gauge(
+        "bot_live_pairs", "Маршрутов в кэше реальных пар для превью", [],
+        lambda: {(): live_pairs.stats()['size']},
+    )
+    register_gauge(
+        "bot_live_pairs_hit_ratio", "Доля превью, для которых нашлась реальная пара", [],
+        lambda: {(): live_pairs.stats()['hit_rate']},
+    )
+    register_gauge(
+        "bot_telegram_queue_depth", "Запросов к Bot API в очереди планировщика", ["priority"],
+        lambda: {(PRIORITY_NAMES.get(p, str(p)),): depth for p, depth in request_scheduler.queue_depths().items()},
+    )
+
+async def start_filter_sync() -> Tuple[FilterSyncClient, FilterSyncOutboxWorker]:
+    """gRPC клиент и фоновая доставка событий синхронизации из outbox"""
+    grpc_client = FilterSyncClient(
+        target=f"{GRPC_ADDR}:{GRPC_PORT}",
+        timeout=GRPC_TIMEOUT,
+        pool_size=GRPC_POOL_SIZE,
+        keepalive_ms=GRPC_KEEPALIVE_MS,
+    )
+    await grpc_client.start()
+
+    outbox_worker = FilterSyncOutboxWorker(
+        grpc_client,
+        engine,
+        batch_size=OUTBOX_BATCH_SIZE,
+        window=SYNC_DEBOUNCE_MS / 1000,
+        poll_interval=OUTBOX_POLL_INTERVAL,
+        backoff_max=OUTBOX_BACKOFF_MAX,
+        max_attempts=OUTBOX_MAX_ATTEMPTS,
+    )
+    outbox_worker.start()
+    register_gauge(
+        "bot_filter_sync_oldest_pending_seconds", "Возраст самого старого недоставленного события outbox", [],
+        lambda: {(): outbox_worker.oldest_pending_age()},
+    )
+    return grpc_client, outbox_worker
+
+async def stop_filter_sync(grpc_client: FilterSyncClient, outbox_worker: FilterSyncOutboxWorker):
+    await outbox_worker.stop()
+    logger.info(f"Filter sync outbox stats: {outbox_worker.stats()}")
+    await grpc_client.close()
+
+async def wait_for_stop_signal():
+    """Ждёт SIGINT/SIGTERM"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+async def register_webhook(bot: Bot, allowed_updates):
+    if WEBHOOK_URL:
+        await bot.set_webhook(
+            WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET or None,
+            allowed_updates=allowed_updates,
+        )
+        logger.info(f"Webhook registered: {WEBHOOK_URL}")
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """Принимает обновления через webhook до SIGINT/SIGTERM"""
+    server = WebhookServer(
+        dp, bot,
+        path=WEBHOOK_PATH,
+        secret=WEBHOOK_SECRET,
+        workers=WEBHOOK_WORKERS,
+        queue_size=WEBHOOK_QUEUE_SIZE,
+    )
+    await server.start(WEBHOOK_HOST, WEBHOOK_PORT)
+    await register_webhook(bot, dp.resolve_used_update_types())
+    try:
+        await wait_for_stop_signal()
+    finally:
+        await server.stop()
+        logger.info(f"Webhook stats: {server.stats()}")
+        await bot.session.close()
+
+async def run_sharded(bot: Bot):
+    """Фронт: принимает обновления и раскладывает по SHARD_WORKERS процессам по tg_id"""
+    shards = ShardRouter(SHARD_WORKERS, queue_size=SHARD_QUEUE_SIZE, concurrency=SHARD_CONCURRENCY)
+    shards.start()
+    # воркеры отдают свои метрики на METRICS_PORT + 1 + номер воркера
+    start_monitoring(METRICS_HOST, METRICS_PORT)
+    register_gauge(
+        "bot_shard_queue_depth", "Количество обновлений в очереди воркера", ["worker"],
+        lambda: {(str(i),): depth for i, depth in enumerate(shards.queue_depths())},
+    )
+    allowed_updates = build_dispatcher(None).resolve_used_update_types()
+    runner = None
+    front = None
+    try:
+        if BOT_MODE == "webhook":
+            runner = web.AppRunner(build_webhook_front(shards, WEBHOOK_PATH, WEBHOOK_SECRET))
+            await runner.setup()
+            await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+            await register_webhook(bot, allowed_updates)
+            logger.info(f"Sharded webhook front listening on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+        else:
+            await bot.delete_webhook()
+            front = asyncio.create_task(run_polling_front(shards, bot, allowed_updates))
+        await wait_for_stop_signal()
+    finally:
+        if front is not None:
+            front.cancel()
+            await asyncio.gather(front, return_exceptions=True)
+        if runner is not None:
+            await runner.cleanup()
+        await shards.stop()
+        logger.info(f"Shard stats: {shards.stats()}")
+        await bot.session.close()
 
 async def main():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     
     # Bot init
-    bot = Bot(token=BOT_TOKEN)
+    bot = create_bot()
+
+    # Многопроцессный режим: обработчики работают в процессах-воркерах
+    if SHARD_WORKERS > 0:
+        await run_sharded(bot)
+        return
     
+    # Метрики Prometheus на METRICS_HOST:METRICS_PORT/metrics
+    start_monitoring(METRICS_HOST, METRICS_PORT, engine)
+    register_cache_gauges()
+
     # Redis setup
-    host, port = REDIS_ADDR.split(":")
-    redis_url = f"redis://:{REDIS_PASSWORD}@{host}:{port}" if REDIS_PASSWORD else f"redis://{host}:{port}"
-    storage = RedisStorage.from_url(redis_url)
-    
-    # Создаем Dispatcher с storage
-    dp = Dispatcher(storage=storage)
+    storage = create_storage()
+
+    # gRPC клиент синхронизации фильтров и доставка событий из outbox (одни на всё приложение)
+    grpc_client, outbox_worker = await start_filter_sync()
     
-    # Подключаем routers
-    dp.include_router(router)
-    dp.include_router(callback_router)
+    # Создаем Dispatcher с storage и routers
+    dp = build_dispatcher(storage)
     
-    await dp.start_polling(bot)
+    try:
+        if BOT_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            await dp.start_polling(bot)
+    finally:
+        await stop_filter_sync(grpc_client, outbox_worker)
+        await storage.close()
+        await close_redis()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
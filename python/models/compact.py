@@ -0,0 +1,212 @@
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, Sequence
+
+import numpy as np
+
+from models.models import LowerLimit, Order, OrderBook, ServerData, UpperLimit, VolumeData
+
+# Компактное представление пары: неизменяемые структуры со __slots__ и стакан в одном
+# массиве float64 вместо объекта Order на каждый уровень. Пара с глубокими стаканами -
+# несколько объектов вместо сотен, стакан сразу годится для расчётов analytics.orderbook.
+# Повторяющиеся строки (биржи, сети, монеты) интернируются.
+
+
+@dataclass(frozen=True, slots=True)
+class CompactUpperLimit:
+    ask_vol_usdt: float
+    bid_vol_usdt: float
+    buy_price: float
+    sell_price: float
+    profit: float
+    ask_depth: int
+    bid_depth: int
+    spread: float
+
+    @classmethod
+    def from_limit(cls, limit: UpperLimit) -> "CompactUpperLimit":
+        return cls(limit.ask_vol_usdt, limit.bid_vol_usdt, limit.buy_price, limit.sell_price,
+                   limit.profit, limit.ask_depth, limit.bid_depth, limit.spread)
+
+    def to_limit(self) -> UpperLimit:
+        return UpperLimit(self.ask_vol_usdt, self.bid_vol_usdt, self.buy_price, self.sell_price,
+                          self.profit, self.ask_depth, self.bid_depth, self.spread)
+
+
+@dataclass(frozen=True, slots=True)
+class CompactLowerLimit:
+    ask_vol_usdt: float
+    bid_vol_usdt: float
+    buy_price: float
+    sell_price: float
+    profit: float
+    ask_depth: int
+    bid_depth: int
+    spread: float
+
+    @classmethod
+    def from_limit(cls, limit: LowerLimit) -> "CompactLowerLimit":
+        return cls(limit.ask_vol_usdt, limit.bid_vol_usdt, limit.buy_price, limit.sell_price,
+                   limit.profit, limit.ask_depth, limit.bid_depth, limit.spread)
+
+    def to_limit(self) -> LowerLimit:
+        return LowerLimit(self.ask_vol_usdt, self.bid_vol_usdt, self.buy_price, self.sell_price,
+                          self.profit, self.ask_depth, self.bid_depth, self.spread)
+
+
+@dataclass(frozen=True, slots=True)
+class CompactVolumeData:
+    up: CompactUpperLimit
+    low: CompactLowerLimit
+
+    @classmethod
+    def from_volume(cls, volume: VolumeData) -> "CompactVolumeData":
+        return cls(CompactUpperLimit.from_limit(volume.up), CompactLowerLimit.from_limit(volume.low))
+
+    def to_volume(self) -> VolumeData:
+        return VolumeData(up=self.up.to_limit(), low=self.low.to_limit())
+
+
+@dataclass(frozen=True, slots=True, eq=False)
+class CompactOrderBook:
+    """Стакан в массиве (2, n): строка 0 - цены, строка 1 - объёмы; сначала asks, затем bids.
+
+    Массив только для чтения, стороны отдаются представлениями без копирования.
+    """
+    levels: np.ndarray
+    n_asks: int
+
+    @classmethod
+    def from_arrays(cls, ask_prices: Sequence[float], ask_amounts: Sequence[float],
+                    bid_prices: Sequence[float], bid_amounts: Sequence[float]) -> "CompactOrderBook":
+        levels = np.empty((2, len(ask_prices) + len(bid_prices)), dtype=np.float64)
+        n_asks = len(ask_prices)
+        levels[0, :n_asks] = ask_prices
+        levels[1, :n_asks] = ask_amounts
+        levels[0, n_asks:] = bid_prices
+        levels[1, n_asks:] = bid_amounts
+        levels.flags.writeable = False
+        return cls(levels, n_asks)
+
+    @classmethod
+    def from_order_book(cls, book: OrderBook) -> "CompactOrderBook":
+        orders = [*book.asks, *book.bids]
+        levels = np.empty((2, len(orders)), dtype=np.float64)
+        levels[0] = [order.price for order in orders]
+        levels[1] = [order.amount for order in orders]
+        levels.flags.writeable = False
+        return cls(levels, len(book.asks))
+
+    def to_order_book(self) -> OrderBook:
+        prices, amounts = self.levels.tolist()
+        return OrderBook(
+            asks=[Order(p, a) for p, a in zip(prices[:self.n_asks], amounts[:self.n_asks])],
+            bids=[Order(p, a) for p, a in zip(prices[self.n_asks:], amounts[self.n_asks:])],
+        )
+
+    @property
+    def ask_prices(self) -> np.ndarray:
+        return self.levels[0, :self.n_asks]
+
+    @property
+    def ask_amounts(self) -> np.ndarray:
+        return self.levels[1, :self.n_asks]
+
+    @property
+    def bid_prices(self) -> np.ndarray:
+        return self.levels[0, self.n_asks:]
+
+    @property
+    def bid_amounts(self) -> np.ndarray:
+        return self.levels[1, self.n_asks:]
+
+    @property
+    def n_bids(self) -> int:
+        return self.levels.shape[1] - self.n_asks
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, CompactOrderBook):
+            return NotImplemented
+        return self.n_asks == other.n_asks and np.array_equal(self.levels, other.levels)
+
+
+@dataclass(frozen=True, slots=True)
+class CompactServerData:
+    symbol: str
+    deposit_exchange: str
+    deposit_exchange_url: str
+    withdrawal_exchange: str
+    withdrawal_exchange_url: str
+    withdrawal_network: str
+    withdrawal_fee: float
+    withdrawal_time: str
+    maker_fee: float
+    time_life: str
+    data: CompactVolumeData
+    order_book: CompactOrderBook
+    volume24h: float
+    same_contracts: bool
+
+    @classmethod
+    def from_server_data(cls, pair: ServerData) -> "CompactServerData":
+        return cls(
+            symbol=sys.intern(pair.symbol),
+            deposit_exchange=sys.intern(pair.deposit_exchange),
+            deposit_exchange_url=pair.deposit_exchange_url,
+            withdrawal_exchange=sys.intern(pair.withdrawal_exchange),
+            withdrawal_exchange_url=pair.withdrawal_exchange_url,
+            withdrawal_network=sys.intern(pair.withdrawal_network),
+            withdrawal_fee=pair.withdrawal_fee,
+            withdrawal_time=sys.intern(pair.withdrawal_time),
+            maker_fee=pair.maker_fee,
+            time_life=sys.intern(pair.time_life),
+            data=CompactVolumeData.from_volume(pair.data),
+            order_book=CompactOrderBook.from_order_book(pair.order_book),
+            volume24h=pair.volume24h,
+            same_contracts=pair.same_contracts,
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CompactServerData":
+        """Из JSON пары (ключи как у models.models, уровни - {"price", "amount"})"""
+        volume = data['data']
+        book = data.get('order_book') or {}
+        asks, bids = book.get('asks') or (), book.get('bids') or ()
+        order_book = CompactOrderBook.from_arrays(
+            [item['price'] for item in asks], [item['amount'] for item in asks],
+            [item['price'] for item in bids], [item['amount'] for item in bids],
+        )
+        return cls(
+            symbol=sys.intern(data['symbol']),
+            deposit_exchange=sys.intern(data['deposit_exchange']),
+            withdrawal_exchange=sys.intern(data['withdrawal_exchange']),
+            withdrawal_network=sys.intern(data.get('withdrawal_network', "")),
+            withdrawal_time=sys.intern(data.get('withdrawal_time', "")),
+            time_life=sys.intern(data.get('time_life', "")),
+            deposit_exchange_url=data.get('deposit_exchange_url', ""),
+            withdrawal_exchange_url=data.get('withdrawal_exchange_url', ""),
+            withdrawal_fee=data.get('withdrawal_fee', 0.0),
+            maker_fee=data.get('maker_fee', 0.0),
+            data=CompactVolumeData(CompactUpperLimit(**volume['up']), CompactLowerLimit(**volume['low'])),
+            order_book=order_book,
+            volume24h=data.get('volume24h', 0.0),
+            same_contracts=data.get('same_contracts', False),
+        )
+
+    def to_server_data(self) -> ServerData:
+        return ServerData(
+            symbol=self.symbol,
+            deposit_exchange=self.deposit_exchange,
+            deposit_exchange_url=self.deposit_exchange_url,
+            withdrawal_exchange=self.withdrawal_exchange,
+            withdrawal_exchange_url=self.withdrawal_exchange_url,
+            withdrawal_network=self.withdrawal_network,
+            withdrawal_fee=self.withdrawal_fee,
+            withdrawal_time=self.withdrawal_time,
+            maker_fee=self.maker_fee,
+            time_life=self.time_life,
+            data=self.data.to_volume(),
+            order_book=self.order_book.to_order_book(),
+            volume24h=self.volume24h,
+            same_contracts=self.same_contracts,
+        )
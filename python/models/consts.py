@@ -15,6 +15,10 @@ LIFETIME_BIT = 1 << 7       # (бит 7: время жизни)
 CHECK_CONTRACT_BIT = 1 << 8 # (бит 8: нужна ли проверка контрактов)
 DAILY_TURNOVER_BIT = 1 << 9 # (бит 9: 24ч оборот)
 
+BEST_SPREAD_BIT = 1 << 10      # (бит 10: спред наилучшего объёма)
+BEST_PROFIT_BIT = 1 << 11      # (бит 11: профит наилучшего объёма)
+BEST_COMMISSION_BIT = 1 << 12  # (бит 12: комиссия наилучшего объёма)
+
 
 # Список всех параметров для отображения
 PARAMETERS_LIST: List[Tuple[int, str]] = [
@@ -24,6 +28,9 @@ PARAMETERS_LIST: List[Tuple[int, str]] = [
     (PROFIT_MIN_BIT, "Профит"),
     (COMMISSION_MAX_BIT, "Комиссия"),
     (COMMISSION_MIN_BIT, "Комиссия"),
+    (BEST_SPREAD_BIT, "Спред"),
+    (BEST_PROFIT_BIT, "Профит"),
+    (BEST_COMMISSION_BIT, "Комиссия"),
     (CHECK_CONTRACT_BIT, "Проверка контрактов"),
     (DAILY_TURNOVER_BIT, "24ч оборот"),
     (WITHDRAW_TIME_BIT, "Время вывода"),
@@ -0,0 +1,145 @@
+# Generated by the gRPC Python protocol compiler plugin. DO NOT EDIT!
+"""Client and server classes corresponding to protobuf-defined services."""
+import grpc
+import warnings
+
+import filter_sync_pb2 as filter__sync__pb2
+
+GRPC_GENERATED_VERSION = '1.84.0'
+GRPC_VERSION = grpc.__version__
+_version_not_supported = False
+
+try:
+    from grpc._utilities import first_version_is_lower
+    _version_not_supported = first_version_is_lower(GRPC_VERSION, GRPC_GENERATED_VERSION)
+except ImportError:
+    _version_not_supported = True
+
+if _version_not_supported:
+    raise RuntimeError(
+        f'The grpc package installed is at version {GRPC_VERSION},'
+        + ' but the generated code in filter_sync_pb2_grpc.py depends on'
+        + f' grpcio>={GRPC_GENERATED_VERSION}.'
+        + f' Please upgrade your grpc module to grpcio>={GRPC_GENERATED_VERSION}'
+        + f' or downgrade your generated code using grpcio-tools<={GRPC_VERSION}.'
+    )
+
+
+class FilterSyncServiceStub:
+    """сервис синхронизации фильтров
+    """
+
+    def __init__(self, channel):
+        """Constructor.
+
+        Args:
+            channel: A grpc.Channel.
+        """
+        self.UpdateUserFilters = channel.unary_unary(
+                '/filtersync.FilterSyncService/UpdateUserFilters',
+                request_serializer=filter__sync__pb2.UpdateUserFiltersRequest.SerializeToString,
+                response_deserializer=filter__sync__pb2.UpdateUserFiltersResponse.FromString,
+                _registered_method=True)
+        self.UpdateUserFiltersBatch = channel.unary_unary(
+                '/filtersync.FilterSyncService/UpdateUserFiltersBatch',
+                request_serializer=filter__sync__pb2.UpdateUserFiltersBatchRequest.SerializeToString,
+                response_deserializer=filter__sync__pb2.UpdateUserFiltersBatchResponse.FromString,
+                _registered_method=True)
+
+
+class FilterSyncServiceServicer:
+    """сервис синхронизации фильтров
+    """
+
+    def UpdateUserFilters(self, request, context):
+        """Обновляет фильтры для конкретного пользователя
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def UpdateUserFiltersBatch(self, request, context):
+        """Обновляет несколько фильтров за один вызов (по результату на каждый элемент)
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+
+def add_FilterSyncServiceServicer_to_server(servicer, server):
+    rpc_method_handlers = {
+            'UpdateUserFilters': grpc.unary_unary_rpc_method_handler(
+                    servicer.UpdateUserFilters,
+                    request_deserializer=filter__sync__pb2.UpdateUserFiltersRequest.FromString,
+                    response_serializer=filter__sync__pb2.UpdateUserFiltersResponse.SerializeToString,
+            ),
+            'UpdateUserFiltersBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.UpdateUserFiltersBatch,
+                    request_deserializer=filter__sync__pb2.UpdateUserFiltersBatchRequest.FromString,
+                    response_serializer=filter__sync__pb2.UpdateUserFiltersBatchResponse.SerializeToString,
+            ),
+    }
+    generic_handler = grpc.method_handlers_generic_handler(
+            'filtersync.FilterSyncService', rpc_method_handlers)
+    server.add_generic_rpc_handlers((generic_handler,))
+    server.add_registered_method_handlers('filtersync.FilterSyncService', rpc_method_handlers)
+
+
+ # This class is part of an EXPERIMENTAL API.
+class FilterSyncService:
+    """сервис синхронизации фильтров
+    """
+
+    @staticmethod
+    def UpdateUserFilters(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/filtersync.FilterSyncService/UpdateUserFilters',
+            filter__sync__pb2.UpdateUserFiltersRequest.SerializeToString,
+            filter__sync__pb2.UpdateUserFiltersResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def UpdateUserFiltersBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/filtersync.FilterSyncService/UpdateUserFiltersBatch',
+            filter__sync__pb2.UpdateUserFiltersBatchRequest.SerializeToString,
+            filter__sync__pb2.UpdateUserFiltersBatchResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
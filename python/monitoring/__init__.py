@@ -0,0 +1,3 @@
+from .metrics import InstrumentedStorage, instrument_engine, register_gauge
+from .middleware import MetricsMiddleware
+from .server import start_metrics_server, start_monitoring
@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector, REGISTRY
+
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Метрики обработки обновлений
+UpdateDuration = Histogram(
+    "bot_update_duration_seconds",
+    "Время обработки обновления по типу и обработчику",
+    ["event_type", "handler"],
+    buckets=_LATENCY_BUCKETS,
+)
+Updates = Counter(
+    "bot_updates_total",
+    "Количество обработанных обновлений",
+    ["event_type", "handler", "status"],
+)
+
+# Метрики БД
+DbQueries = Counter(
+    "bot_db_queries_total",
+    "Количество SQL запросов",
+    ["operation"],
+)
+DbQueryDuration = Histogram(
+    "bot_db_query_duration_seconds",
+    "Время выполнения SQL запроса",
+    ["operation"],
+    buckets=_LATENCY_BUCKETS,
+)
+
+# Метрики gRPC синхронизации фильтров
+GrpcRequests = Counter(
+    "bot_grpc_requests_total",
+    "Количество gRPC вызовов по результату",
+    ["method", "outcome"],
+)
+GrpcRequestDuration = Histogram(
+    "bot_grpc_request_duration_seconds",
+    "Время gRPC вызова",
+    ["method"],
+    buckets=_LATENCY_BUCKETS,
+)
+FilterSyncEvents = Counter(
+    "bot_filter_sync_events_total",
+    "События outbox синхронизации фильтров по результату",
+    ["outcome"],
+)
+
+# Метрики исходящих запросов к Bot API (clients.telegram)
+TelegramRequests = Counter(
+    "bot_telegram_requests_total",
+    "Запросы к Bot API по методу и результату",
+    ["method", "outcome"],
+)
+TelegramWait = Histogram(
+    "bot_telegram_wait_seconds",
+    "Ожидание запроса в очереди планировщика Bot API",
+    ["priority"],
+    buckets=_LATENCY_BUCKETS,
+)
+
+# Метрики FSM storage
+StorageOperations = Counter(
+    "bot_fsm_storage_operations_total",
+    "Количество обращений к FSM storage",
+    ["operation"],
+)
+StorageDuration = Histogram(
+    "bot_fsm_storage_duration_seconds",
+    "Время обращения к FSM storage",
+    ["operation"],
+    buckets=_LATENCY_BUCKETS,
+)
+# Запросы TieredStorage в Redis: чтение промаха (load) и pipeline записей (flush)
+FsmRedisRoundTrips = Counter(
+    "bot_fsm_redis_round_trips_total",
+    "Round trip FSM storage в Redis по операции и результату",
+    ["operation", "outcome"],
+)
+FsmRedisDuration = Histogram(
+    "bot_fsm_redis_duration_seconds",
+    "Время round trip FSM storage в Redis",
+    ["operation"],
+    buckets=_LATENCY_BUCKETS,
+)
+
+# Метрики event loop
+EventLoopLag = Histogram(
+    "bot_event_loop_lag_seconds",
+    "Задержка срабатывания таймера event loop",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+
+def callback_label(data: Optional[str]) -> str:
+    """Тип callback без изменяемых частей: toggle_withdraw_4_0 -> toggle_withdraw"""
+    if not data:
+        return "empty"
+    parts = []
+    for part in data.split("_"):
+        if part.lstrip("-").isdigit():
+            break
+        parts.append(part)
+    return "_".join(parts) or "numeric"
+
+
+def observe_grpc(method: str, outcome: str, started: float):
+    GrpcRequests.labels(method, outcome).inc()
+    GrpcRequestDuration.labels(method).observe(time.perf_counter() - started)
+
+
+def observe_fsm_redis(operation: str, outcome: str, started: float):
+    FsmRedisRoundTrips.labels(operation, outcome).inc()
+    FsmRedisDuration.labels(operation).observe(time.perf_counter() - started)
+
+
+def observe_telegram_request(method: str, outcome: str):
+    TelegramRequests.labels(method, outcome).inc()
+
+
+def observe_telegram_wait(priority: str, seconds: float):
+    TelegramWait.labels(priority).observe(seconds)
+
+
+def increment_filter_sync_events(outcome: str, count: int = 1):
+    if count:
+        FilterSyncEvents.labels(outcome).inc(count)
+
+
+def instrument_engine(engine):
+    """Считает запросы и их время через события SQLAlchemy (для AsyncEngine - его sync_engine)"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_start"].pop()
+        operation = _sql_operation(statement)
+        DbQueries.labels(operation).inc()
+        DbQueryDuration.labels(operation).observe(time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
+        DbQueries.labels("error").inc()
+
+
+def _sql_operation(statement: str) -> str:
+    head = statement.lstrip().split(None, 1)
+    operation = head[0].lower() if head else ""
+    if operation == "with":
+        # data-modifying CTE (database.repository) - по сути UPDATE
+        return "update" if "update " in statement[:200].lower() else "select"
+    if operation in ("select", "insert", "update", "delete"):
+        return operation
+    return "other"
+
+
+class InstrumentedStorage(BaseStorage):
+    """Обёртка FSM storage, замеряющая каждое обращение обработчика.
+
+    Над TieredStorage это время с попаданиями в кэш; сами запросы в Redis -
+    bot_fsm_redis_* (observe_fsm_redis)
+    """
+
+    def __init__(self, storage: BaseStorage):
+        self._storage = storage
+
+    async def _timed(self, operation: str, call):
+        started = time.perf_counter()
+        try:
+            return await call
+        finally:
+            StorageOperations.labels(operation).inc()
+            StorageDuration.labels(operation).observe(time.perf_counter() - started)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._timed("set_state", self._storage.set_state(key, state))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self._timed("get_state", self._storage.get_state(key))
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        await self._timed("set_data", self._storage.set_data(key, data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return await self._timed("get_data", self._storage.get_data(key))
+
+    async def close(self) -> None:
+        await self._storage.close()
+
+
+async def monitor_event_loop_lag(interval: float = 0.5):
+    """Фоновая задача: насколько позже запланированного просыпается sleep(interval)"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EventLoopLag.observe(max(0.0, loop.time() - started - interval))
+
+
+def lru_cache_stats(caches: Dict[str, Callable]) -> Dict[str, Dict[str, float]]:
+    """Размер, попадания и промахи функций с functools.lru_cache"""
+    stats = {}
+    for name, cached in caches.items():
+        info = cached.cache_info()
+        total = info.hits + info.misses
+        stats[name] = {
+            'size': info.currsize,
+            'hits': info.hits,
+            'misses': info.misses,
+            'hit_rate': info.hits / total if total else 0.0,
+        }
+    return stats
+
+
+class GaugeCollector(Collector):
+    """Gauge, значения которого читаются в момент scrape (очереди, счётчики компонентов)"""
+
+    def __init__(self, name: str, documentation: str, labels: List[str], read: Callable[[], Dict[tuple, float]]):
+        self._name = name
+        self._documentation = documentation
+        self._labels = labels
+        self._read = read
+
+    def collect(self):
+        family = GaugeMetricFamily(self._name, self._documentation, labels=self._labels)
+        try:
+            for label_values, value in self._read().items():
+                family.add_metric(list(label_values), value)
+        except Exception as e:
+            logger.debug(f"Collector {self._name} error: {e}")
+        yield family
+
+
+def register_gauge(name: str, documentation: str, labels: List[str], read: Callable[[], Dict[tuple, float]]):
+    REGISTRY.register(GaugeCollector(name, documentation, labels, read))
@@ -0,0 +1,50 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import Update
+
+from monitoring.metrics import UpdateDuration, Updates, callback_label
+
+# Команды из handlers.commands; остальной текст с "/" присылает пользователь - в метку не идёт
+COMMANDS = frozenset(("/start", "/filters", "/settings", "/msg", "/tutorial"))
+
+
+def handler_label(update: Update, data: Dict[str, Any]) -> str:
+    """Метка обработчика: команда, тип callback или FSM состояние для текстового ввода"""
+    if update.message is not None:
+        text = update.message.text or ""
+        if text.startswith("/"):
+            command = text.split(maxsplit=1)[0].split("@", 1)[0]
+            return command if command in COMMANDS else "other"
+        return data.get("raw_state") or "text"
+    if update.callback_query is not None:
+        return callback_label(update.callback_query.data)
+    return "other"
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Outer middleware Dispatcher: время и результат обработки каждого обновления"""
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            result = await handler(event, data)
+            if result is UNHANDLED:
+                status = "unhandled"
+            return result
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            event_type = event.event_type
+            label = handler_label(event, data)
+            UpdateDuration.labels(event_type, label).observe(time.perf_counter() - started)
+            Updates.labels(event_type, label, status).inc()
@@ -0,0 +1,164 @@
+import argparse
+import cProfile
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from monitoring.middleware import handler_label
+
+logger = logging.getLogger(__name__)
+
+# Пакеты, собственное время которых выносится в сводку дампа
+_PACKAGES = {
+    'sqlalchemy': os.sep + 'sqlalchemy' + os.sep,
+    'asyncpg': os.sep + 'asyncpg' + os.sep,
+    'grpc': os.sep + 'grpc' + os.sep,
+    'redis': os.sep + 'redis' + os.sep,
+    'aiogram': os.sep + 'aiogram' + os.sep,
+    'aiohttp': os.sep + 'aiohttp' + os.sep,
+    'handlers': os.sep + 'handlers' + os.sep,
+}
+
+
+class ProfilerMiddleware(BaseMiddleware):
+    """Outer middleware Dispatcher: выборочно профилирует обновления через cProfile.
+
+    Профилируется доля sample_rate обновлений и не больше одного одновременно
+    (cProfile один на поток). Пока профиль активен, в него попадают и другие
+    корутины event loop, поэтому дамп показывает всё, что мешало обновлению.
+    Обновления дольше threshold секунд сохраняются в directory: <name>.prof и
+    <name>.json с меткой обработчика и временем; хранится не больше keep дампов.
+    """
+
+    def __init__(self, sample_rate: float, threshold: float, directory: str, keep: int = 100):
+        self._sample_rate = sample_rate
+        self._threshold = threshold
+        self._directory = directory
+        self._keep = keep
+        self._active = False
+        os.makedirs(directory, exist_ok=True)
+
+        self.sampled = 0
+        self.dumped = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        if self._active or random.random() >= self._sample_rate:
+            return await handler(event, data)
+
+        self._active = True
+        self.sampled += 1
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            return await handler(event, data)
+        finally:
+            profile.disable()
+            self._active = False
+            elapsed = time.perf_counter() - started
+            if elapsed >= self._threshold:
+                try:
+                    self._dump(profile, event, data, elapsed)
+                except Exception as e:
+                    logger.error(f"Profile dump error: {e}")
+
+    def _dump(self, profile: cProfile.Profile, event: Update, data: Dict[str, Any], elapsed: float):
+        label = handler_label(event, data)
+        name = f"{int(time.time() * 1000)}_{event.update_id}_{re.sub(r'[^A-Za-z0-9_]+', '', label)[:40]}"
+        path = os.path.join(self._directory, name)
+        profile.dump_stats(path + ".prof")
+
+        stats = pstats.Stats(profile)
+        self_time: Dict[str, float] = defaultdict(float)
+        for (filename, _, _), (_, _, tottime, _, _) in stats.stats.items():
+            for package, marker in _PACKAGES.items():
+                if marker in filename:
+                    self_time[package] += tottime
+                    break
+        info = {
+            'update_id': event.update_id,
+            'event_type': event.event_type,
+            'handler': label,
+            'callback_data': event.callback_query.data if event.callback_query else None,
+            'text': (event.message.text or "")[:64] if event.message else None,
+            'elapsed': round(elapsed, 6),
+            'cpu_total': round(stats.total_tt, 6),
+            'cpu_by_package': {k: round(v, 6) for k, v in sorted(self_time.items(), key=lambda kv: -kv[1])},
+            'created_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        with open(path + ".json", "w", encoding="utf-8") as f:
+            json.dump(info, f, ensure_ascii=False, indent=2)
+        self.dumped += 1
+        logger.warning(f"Slow update {event.update_id} ({label}): {elapsed:.3f}s, profile saved to {path}.prof")
+        self._rotate()
+
+    def _rotate(self):
+        dumps = sorted(f[:-5] for f in os.listdir(self._directory) if f.endswith(".prof"))
+        for name in dumps[:max(0, len(dumps) - self._keep)]:
+            for ext in (".prof", ".json"):
+                try:
+                    os.remove(os.path.join(self._directory, name + ext))
+                except FileNotFoundError:
+                    pass
+
+
+def report(directory: str, top: int = 20, handler: str = "", path_filter: str = "handlers/"):
+    """Сводка по дампам: медленные обработчики и top-N горячих функций"""
+    files: List[str] = []
+    by_handler: Dict[str, List[float]] = defaultdict(list)
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(directory, name), encoding="utf-8") as f:
+            info = json.load(f)
+        if handler and info.get('handler') != handler:
+            continue
+        prof = os.path.join(directory, name[:-5] + ".prof")
+        if os.path.exists(prof):
+            files.append(prof)
+            by_handler[info.get('handler', '?')].append(info.get('elapsed', 0.0))
+
+    if not files:
+        print(f"No profiles in {directory}")
+        return
+
+    print(f"{'handler':<40} {'dumps':>6} {'avg, s':>8} {'max, s':>8}")
+    for label, values in sorted(by_handler.items(), key=lambda kv: -sum(kv[1])):
+        print(f"{label:<40} {len(values):>6} {sum(values) / len(values):>8.3f} {max(values):>8.3f}")
+    print()
+
+    stats = pstats.Stats(*files)
+    stats.sort_stats("cumulative")
+    if path_filter:
+        print(f"Top {top} functions in {path_filter} by cumulative time:")
+        stats.print_stats(re.escape(path_filter), top)
+    print(f"Top {top} functions overall by own time:")
+    stats.sort_stats("tottime").print_stats(top)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сводка по профилям медленных обновлений")
+    parser.add_argument("directory", nargs="?", default=os.getenv("PROFILE_DIR", "profiles"))
+    parser.add_argument("--top", type=int, default=20, help="сколько функций показать")
+    parser.add_argument("--handler", default="", help="только дампы этого обработчика, например toggle_withdraw")
+    parser.add_argument("--filter", default="handlers/", help="путь для top-N (пусто - без фильтра)")
+    args = parser.parse_args()
+    report(args.directory, top=args.top, handler=args.handler, path_filter=args.filter)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import asyncio
+import logging
+from typing import Optional
+
+from prometheus_client import start_http_server
+
+from monitoring.metrics import instrument_engine, monitor_event_loop_lag
+
+logger = logging.getLogger(__name__)
+
+_lag_task: Optional[asyncio.Task] = None
+
+
+def start_metrics_server(host: str, port: int):
+    """Поднимает HTTP /metrics в отдельном потоке"""
+    start_http_server(port, addr=host)
+    logger.info(f"Starting metrics server on {host}:{port}")
+
+
+def start_monitoring(host: str, port: int, engine=None):
+    """Сервер метрик, замер задержки event loop и инструментирование БД. port=0 - метрики выключены"""
+    global _lag_task
+    if port <= 0:
+        return
+    start_metrics_server(host, port)
+    if engine is not None:
+        instrument_engine(engine)
+    _lag_task = asyncio.create_task(monitor_event_loop_lag())
@@ -0,0 +1,2 @@
+from .main import PairSubscriber, decode_update, decode_update_json, server_data_from_dict, UPDATE_CHANNEL
+from .wire import PairDecoder, UPDATE_TYPE
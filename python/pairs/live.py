@@ -0,0 +1,203 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from analytics.filters import check_filter
+from config.main import LIVE_PAIRS_MAX_AGE, LIVE_PAIRS_SIZE
+from database.cache import UserSettings
+from models.compact import CompactServerData
+from pairs.main import PairSubscriber
+
+logger = logging.getLogger(__name__)
+
+# Маршрут пары: монета, биржа вывода, биржа депозита, сеть - одна (последняя) запись на маршрут
+RouteKey = Tuple[str, str, str, str]
+
+
+class _Entry:
+    __slots__ = ('pair', 'received_at', 'seq')
+
+    def __init__(self, pair: CompactServerData, received_at: float, seq: int):
+        self.pair = pair
+        self.received_at = received_at
+        self.seq = seq
+
+
+class _Match:
+    """Что уже просмотрено для пользователя: следующий поиск смотрит только более новые записи"""
+    __slots__ = ('settings', 'seen_seq', 'key', 'seq')
+
+    def __init__(self, settings: UserSettings, seen_seq: int, key: Optional[RouteKey], seq: int):
+        self.settings = settings
+        self.seen_seq = seen_seq
+        self.key = key
+        self.seq = seq
+
+
+class LivePairCache:
+    """Последние реальные пары из канала обновлений в памяти процесса.
+
+    Записи упорядочены по времени получения (обновление маршрута переносит его в конец),
+    размер ограничен max_pairs, записи старше max_age не отдаются и вычищаются при
+    добавлении. Индексы по монете и по паре бирж.
+
+    find() ищет самую свежую пару под фильтры пользователя. Для каждого пользователя
+    запоминается найденный маршрут и номер последней просмотренной записи, поэтому
+    повторный поиск проверяет только пришедшие после него пары - O(1) амортизированно.
+    """
+
+    def __init__(self, max_pairs: int = LIVE_PAIRS_SIZE, max_age: float = LIVE_PAIRS_MAX_AGE,
+                 max_users: int = 10000):
+        self._max_pairs = max_pairs
+        self._max_age = max_age
+        self._max_users = max_users
+        self._entries: "OrderedDict[RouteKey, _Entry]" = OrderedDict()
+        self._by_coin: Dict[str, Set[RouteKey]] = {}
+        self._by_route: Dict[Tuple[str, str], Set[RouteKey]] = {}
+        self._matches: "OrderedDict[int, _Match]" = OrderedDict()
+        self._seq = 0
+
+        self.updates = 0
+        self.evictions = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, pair: CompactServerData, received_at: Optional[float] = None):
+        """Новая пара маршрута; подходит как обработчик PairSubscriber"""
+        received_at = time.time() if received_at is None else received_at
+        key = (pair.symbol, pair.withdrawal_exchange, pair.deposit_exchange, pair.withdrawal_network)
+        self._seq += 1
+        self.updates += 1
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        else:
+            self._by_coin.setdefault(pair.symbol, set()).add(key)
+            self._by_route.setdefault((pair.withdrawal_exchange, pair.deposit_exchange), set()).add(key)
+        self._entries[key] = _Entry(pair, received_at, self._seq)
+
+        expired = received_at - self._max_age
+        while self._entries:
+            oldest_key, oldest = next(iter(self._entries.items()))
+            if len(self._entries) <= self._max_pairs and oldest.received_at >= expired:
+                break
+            self._drop(oldest_key)
+            self.evictions += 1
+
+    def _drop(self, key: RouteKey):
+        del self._entries[key]
+        symbol, withdrawal_exchange, deposit_exchange, _ = key
+        for index, index_key in ((self._by_coin, symbol), (self._by_route, (withdrawal_exchange, deposit_exchange))):
+            keys = index[index_key]
+            keys.discard(key)
+            if not keys:
+                del index[index_key]
+
+    def _fresh(self, entry: Optional[_Entry], now: float) -> bool:
+        return entry is not None and entry.received_at >= now - self._max_age
+
+    def _freshest(self, keys: Set[RouteKey], now: float) -> List[CompactServerData]:
+        entries = [self._entries[key] for key in keys]
+        entries.sort(key=lambda entry: entry.seq, reverse=True)
+        return [entry.pair for entry in entries if self._fresh(entry, now)]
+
+    def by_coin(self, symbol: str, now: Optional[float] = None) -> List[CompactServerData]:
+        """Пары монеты, от свежих к старым"""
+        now = time.time() if now is None else now
+        return self._freshest(self._by_coin.get(symbol, set()), now)
+
+    def by_route(self, withdrawal_exchange: str, deposit_exchange: str,
+                 now: Optional[float] = None) -> List[CompactServerData]:
+        """Пары направления биржа вывода -> биржа депозита, от свежих к старым"""
+        now = time.time() if now is None else now
+        return self._freshest(self._by_route.get((withdrawal_exchange, deposit_exchange), set()), now)
+
+    def latest(self, now: Optional[float] = None) -> Optional[CompactServerData]:
+        now = time.time() if now is None else now
+        entry = next(reversed(self._entries.values()), None)
+        return entry.pair if self._fresh(entry, now) else None
+
+    def find(self, user: UserSettings, now: Optional[float] = None) -> Optional[CompactServerData]:
+        """Самая свежая пара, проходящая фильтры пользователя (None - такой нет)"""
+        now = time.time() if now is None else now
+        match = self._matches.get(user.tg_id)
+        if match is not None and match.settings != user:
+            match = None  # фильтры изменились - ищем заново
+        seen_seq = match.seen_seq if match is not None else 0
+
+        found = None
+        for key in reversed(self._entries):
+            entry = self._entries[key]
+            if entry.seq <= seen_seq or not self._fresh(entry, now):
+                break
+            if check_filter(user, entry.pair):
+                found = key, entry
+                break
+
+        if found is None and match is not None and match.key is not None:
+            entry = self._entries.get(match.key)
+            if entry is not None and entry.seq == match.seq and self._fresh(entry, now):
+                found = match.key, entry
+            else:
+                # прежняя пара обновилась или устарела - полный поиск
+                self._matches.pop(user.tg_id, None)
+                return self.find(user, now)
+
+        key, entry = found if found is not None else (None, None)
+        self._remember(user, key, entry.seq if entry is not None else 0)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry.pair
+
+    def _remember(self, user: UserSettings, key: Optional[RouteKey], seq: int):
+        self._matches[user.tg_id] = _Match(user, self._seq, key, seq)
+        self._matches.move_to_end(user.tg_id)
+        while len(self._matches) > self._max_users:
+            self._matches.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self._by_coin.clear()
+        self._by_route.clear()
+        self._matches.clear()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'updates': self.updates,
+            'evictions': self.evictions,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+live_pairs = LivePairCache()
+
+_subscriber: Optional[PairSubscriber] = None
+
+
+async def start_live_pairs():
+    """Подписка на канал обновлений, пары складываются в live_pairs"""
+    global _subscriber
+    if _subscriber is not None:
+        return
+    _subscriber = PairSubscriber()
+    _subscriber.add_handler(live_pairs.put)
+    await _subscriber.start()
+    logger.info("Live pair cache subscribed to updates")
+
+
+async def stop_live_pairs():
+    global _subscriber
+    if _subscriber is None:
+        return
+    await _subscriber.stop()
+    _subscriber = None
+    logger.info(f"Live pair cache stopped: {live_pairs.stats()}")
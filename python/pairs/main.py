@@ -0,0 +1,138 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Callable, List, Optional, Union
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from models.compact import CompactServerData
+from models.models import LowerLimit, Order, OrderBook, ServerData, UpperLimit, VolumeData
+from clients.redis_pool import get_redis
+from pairs.wire import UPDATE_TYPE, PairDecoder
+
+logger = logging.getLogger(__name__)
+
+# Канал, в который сканер публикует пары (его же слушает Go бот)
+UPDATE_CHANNEL = "arbitrage:spot:update"
+
+# Обработчик пары: (пара, время получения unix) - вызывается синхронно, должен быть быстрым
+PairHandler = Callable[[CompactServerData, float], None]
+
+
+def _orders(items) -> List[Order]:
+    return [Order(price=item['price'], amount=item['amount']) for item in items or ()]
+
+
+def server_data_from_dict(data: dict) -> ServerData:
+    """ServerData из JSON пары. Ключи совпадают с полями models.models"""
+    volume = data['data']
+    book = data.get('order_book') or {}
+    return ServerData(
+        symbol=data['symbol'],
+        deposit_exchange=data['deposit_exchange'],
+        deposit_exchange_url=data.get('deposit_exchange_url', ""),
+        withdrawal_exchange=data['withdrawal_exchange'],
+        withdrawal_exchange_url=data.get('withdrawal_exchange_url', ""),
+        withdrawal_network=data.get('withdrawal_network', ""),
+        withdrawal_fee=data.get('withdrawal_fee', 0.0),
+        withdrawal_time=data.get('withdrawal_time', ""),
+        maker_fee=data.get('maker_fee', 0.0),
+        time_life=data.get('time_life', ""),
+        data=VolumeData(up=UpperLimit(**volume['up']), low=LowerLimit(**volume['low'])),
+        order_book=OrderBook(asks=_orders(book.get('asks')), bids=_orders(book.get('bids'))),
+        volume24h=data.get('volume24h', 0.0),
+        same_contracts=data.get('same_contracts', False),
+    )
+
+
+def decode_update_json(payload: Union[str, bytes]) -> Optional[ServerData]:
+    """То же через json и dataclass models.models - эталон для проверок и бенчмарков"""
+    message = json.loads(payload)
+    if message.get('type') != UPDATE_TYPE:
+        return None
+    return server_data_from_dict(message['update'])
+
+
+_decoder = PairDecoder()
+
+
+def decode_update(payload: Union[str, bytes]) -> Optional[CompactServerData]:
+    """Сообщение канала {"type": "update_data", "update": {...}} -> CompactServerData, другие типы - None"""
+    return _decoder.decode(payload)
+
+
+class PairSubscriber:
+    """Подписка на канал обновлений пар: разбирает сообщения и раздаёт пары обработчикам.
+
+    При потере соединения переподключается с экспоненциальной задержкой. Без redis_url
+    подписка берёт соединение из общего пула процесса (clients.redis_pool).
+    """
+
+    def __init__(self, redis_url: Optional[str] = None, channel: str = UPDATE_CHANNEL,
+                 reconnect_delay: float = 1.0, reconnect_max: float = 30.0):
+        self._redis_url = redis_url
+        self._channel = channel
+        self._reconnect_delay = reconnect_delay
+        self._reconnect_max = reconnect_max
+        self._handlers: List[PairHandler] = []
+        self._task: Optional[asyncio.Task] = None
+
+        self.received = 0
+        self.decode_errors = 0
+        self.handler_errors = 0
+
+    def add_handler(self, handler: PairHandler):
+        self._handlers.append(handler)
+
+    def dispatch(self, payload: Union[str, bytes], received_at: Optional[float] = None):
+        """Разбирает одно сообщение канала и передаёт пару обработчикам"""
+        self.received += 1
+        try:
+            pair = decode_update(payload)
+        except (ValueError, KeyError, TypeError) as e:
+            self.decode_errors += 1
+            logger.warning(f"Failed to decode pair update: {e}")
+            return
+        if pair is None:
+            return
+        received_at = time.time() if received_at is None else received_at
+        for handler in self._handlers:
+            try:
+                handler(pair, received_at)
+            except Exception:
+                self.handler_errors += 1
+                logger.exception(f"Pair handler {handler!r} failed")
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        delay = self._reconnect_delay
+        while True:
+            client = aioredis.from_url(self._redis_url) if self._redis_url else get_redis()
+            try:
+                async with client.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(self._channel)
+                    logger.info(f"Subscribed to {self._channel}")
+                    delay = self._reconnect_delay
+                    async for message in pubsub.listen():
+                        if message['type'] == 'message':
+                            self.dispatch(message['data'])
+            except (RedisError, OSError) as e:
+                logger.warning(f"Pair subscription lost: {e}, reconnecting in {delay:.0f}s")
+            finally:
+                if self._redis_url:
+                    await client.aclose()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self._reconnect_max)
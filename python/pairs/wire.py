@@ -0,0 +1,141 @@
+import sys
+from typing import Iterable, List, Optional, Union
+
+import msgspec
+import numpy as np
+
+from models.compact import CompactOrderBook, CompactServerData, CompactVolumeData
+
+# Формат сообщений канала (RedisMessage/ArbPair общего Go модуля):
+#   {"type": "update_data", "update": {<поля ServerData>}}
+# Ключи совпадают с полями models.models. Схема ниже разбирается msgspec за один проход
+# сразу в типизированные структуры: без промежуточных dict и ручной сборки dataclass.
+# Незнакомые ключи пропускаются, nil-срезы Go (null) читаются как пустой стакан.
+
+UPDATE_TYPE = "update_data"
+
+Payload = Union[str, bytes]
+
+
+class _Order(msgspec.Struct, gc=False):
+    price: float
+    amount: float
+
+
+class _OrderBook(msgspec.Struct, gc=False):
+    asks: Optional[List[_Order]] = None
+    bids: Optional[List[_Order]] = None
+
+
+class _Pair(msgspec.Struct, gc=False):
+    symbol: str
+    deposit_exchange: str
+    withdrawal_exchange: str
+    data: CompactVolumeData
+    deposit_exchange_url: str = ""
+    withdrawal_exchange_url: str = ""
+    withdrawal_network: str = ""
+    withdrawal_fee: float = 0.0
+    withdrawal_time: str = ""
+    maker_fee: float = 0.0
+    time_life: str = ""
+    order_book: _OrderBook = msgspec.field(default_factory=_OrderBook)
+    volume24h: float = 0.0
+    same_contracts: bool = False
+
+
+class _Message(msgspec.Struct, gc=False):
+    type: str
+    # update не разбирается, пока не известен тип сообщения
+    update: msgspec.Raw = msgspec.Raw()
+
+
+def _compact(pair: _Pair, book: CompactOrderBook) -> CompactServerData:
+    return CompactServerData(
+        symbol=sys.intern(pair.symbol),
+        deposit_exchange=sys.intern(pair.deposit_exchange),
+        deposit_exchange_url=pair.deposit_exchange_url,
+        withdrawal_exchange=sys.intern(pair.withdrawal_exchange),
+        withdrawal_exchange_url=pair.withdrawal_exchange_url,
+        withdrawal_network=sys.intern(pair.withdrawal_network),
+        withdrawal_fee=pair.withdrawal_fee,
+        withdrawal_time=sys.intern(pair.withdrawal_time),
+        maker_fee=pair.maker_fee,
+        time_life=sys.intern(pair.time_life),
+        data=pair.data,
+        order_book=book,
+        volume24h=pair.volume24h,
+        same_contracts=pair.same_contracts,
+    )
+
+
+def _book(book: _OrderBook) -> CompactOrderBook:
+    asks, bids = book.asks or (), book.bids or ()
+    return CompactOrderBook.from_arrays(
+        [order.price for order in asks], [order.amount for order in asks],
+        [order.price for order in bids], [order.amount for order in bids],
+    )
+
+
+class PairDecoder:
+    """Разбор сообщений канала обновлений в CompactServerData.
+
+    Ошибки формата - msgspec.DecodeError (подкласс ValueError). В decode_batch битые
+    сообщения дают None и считаются в errors, чтобы не терять остальную пачку.
+    """
+
+    def __init__(self):
+        self._message = msgspec.json.Decoder(_Message)
+        self._pair = msgspec.json.Decoder(_Pair)
+        self.errors = 0
+
+    def decode(self, payload: Payload) -> Optional[CompactServerData]:
+        """Одно сообщение канала; сообщения других типов - None"""
+        message = self._message.decode(payload)
+        if message.type != UPDATE_TYPE:
+            return None
+        pair = self._pair.decode(message.update)
+        return _compact(pair, _book(pair.order_book))
+
+    def decode_pair(self, payload: Payload) -> CompactServerData:
+        """Только пара (содержимое update), например из дампа"""
+        pair = self._pair.decode(payload)
+        return _compact(pair, _book(pair.order_book))
+
+    def decode_batch(self, payloads: Iterable[Payload]) -> List[Optional[CompactServerData]]:
+        """Пачка сообщений: стаканы всех пар складываются в один массив, пара получает его срез.
+
+        Срез держит в памяти массив всей пачки - для долгого хранения отдельных пар
+        (кэш, буферы) подходит decode.
+        """
+        pairs: List[Optional[_Pair]] = []
+        for payload in payloads:
+            try:
+                message = self._message.decode(payload)
+                pairs.append(self._pair.decode(message.update) if message.type == UPDATE_TYPE else None)
+            except msgspec.DecodeError:
+                self.errors += 1
+                pairs.append(None)
+
+        prices: List[float] = []
+        amounts: List[float] = []
+        for pair in pairs:
+            if pair is not None:
+                for side in (pair.order_book.asks or (), pair.order_book.bids or ()):
+                    prices.extend([order.price for order in side])
+                    amounts.extend([order.amount for order in side])
+        levels = np.array((prices, amounts), dtype=np.float64).reshape(2, -1)
+        levels.flags.writeable = False
+
+        result: List[Optional[CompactServerData]] = []
+        offset = 0
+        for pair in pairs:
+            if pair is None:
+                result.append(None)
+                continue
+            n_asks = len(pair.order_book.asks or ())
+            end = offset + n_asks + len(pair.order_book.bids or ())
+            result.append(_compact(pair, CompactOrderBook(levels[:, offset:end], n_asks)))
+            offset = end
+        return result
+
@@ -0,0 +1 @@
+from .main import ShardRouter, ShardWorker, extract_user_id, shard_for, run_polling_front, build_webhook_front
@@ -0,0 +1,263 @@
+import asyncio
+import json
+import logging
+import multiprocessing as mp
+import queue as queue_module
+import signal
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+from aiogram import Bot
+from aiogram.types import Update
+
+from webhook.main import check_secret
+
+logger = logging.getLogger(__name__)
+
+# Сигнал воркеру: доработать принятые обновления и завершиться
+_STOP = None
+
+
+def extract_user_id(update: Dict[str, Any]) -> Optional[int]:
+    """tg_id автора обновления из сырого JSON (message.from, callback_query.from, ...)"""
+    for key, event in update.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        for field in ("from", "user"):
+            user = event.get(field)
+            if isinstance(user, dict) and "id" in user:
+                return user["id"]
+        chat = event.get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return chat["id"]
+    return None
+
+
+def shard_for(user_id: Optional[int], shards: int) -> int:
+    """Номер воркера для пользователя: все обновления одного tg_id идут в один процесс"""
+    return user_id % shards if user_id is not None else 0
+
+
+class ShardRouter:
+    """Фронт: раскладывает сырые обновления по очередям процессов-воркеров по tg_id.
+
+    Обновления одного пользователя всегда попадают в один процесс и обрабатываются
+    там по порядку, поэтому FSM состояние и порядок нажатий сохраняются.
+    """
+
+    def __init__(self, workers: int, queue_size: int = 1000, concurrency: int = 16):
+        self._ctx = mp.get_context("spawn")
+        self._queues = [self._ctx.Queue(maxsize=queue_size) for _ in range(max(1, workers))]
+        self._concurrency = concurrency
+        self._processes: List[mp.Process] = []
+
+        self.routed = [0] * len(self._queues)
+        self.rejected = 0
+
+    @property
+    def workers(self) -> int:
+        return len(self._queues)
+
+    def start(self):
+        for index, q in enumerate(self._queues):
+            process = self._ctx.Process(
+                target=run_worker_process,
+                args=(index, q, self._concurrency),
+                name=f"bot-shard-{index}",
+                daemon=False,
+            )
+            process.start()
+            self._processes.append(process)
+        logger.info(f"Started {len(self._processes)} shard workers")
+
+    def queue_depths(self) -> List[int]:
+        """Глубина очереди каждого воркера (-1, если платформа не поддерживает qsize)"""
+        depths = []
+        for q in self._queues:
+            try:
+                depths.append(q.qsize())
+            except NotImplementedError:
+                depths.append(-1)
+        return depths
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'routed': list(self.routed),
+            'rejected': self.rejected,
+            'queue_depths': self.queue_depths(),
+            'alive': [p.is_alive() for p in self._processes],
+        }
+
+    def route_nowait(self, update: Dict[str, Any]) -> bool:
+        """Кладёт обновление в очередь его воркера. False - очередь переполнена"""
+        user_id = extract_user_id(update)
+        index = shard_for(user_id, len(self._queues))
+        try:
+            self._queues[index].put_nowait((user_id, json.dumps(update)))
+        except queue_module.Full:
+            self.rejected += 1
+            return False
+        self.routed[index] += 1
+        return True
+
+    async def route(self, update: Dict[str, Any]):
+        """Кладёт обновление в очередь, при переполнении ждёт освобождения места"""
+        user_id = extract_user_id(update)
+        index = shard_for(user_id, len(self._queues))
+        payload = (user_id, json.dumps(update))
+        try:
+            self._queues[index].put_nowait(payload)
+        except queue_module.Full:
+            await asyncio.get_running_loop().run_in_executor(None, self._queues[index].put, payload)
+        self.routed[index] += 1
+
+    async def stop(self, timeout: float = 30.0):
+        """Отправляет воркерам сигнал остановки и ждёт, пока они доработают очереди"""
+        loop = asyncio.get_running_loop()
+        for q in self._queues:
+            await loop.run_in_executor(None, q.put, _STOP)
+        for process in self._processes:
+            await loop.run_in_executor(None, process.join, timeout)
+            if process.is_alive():
+                logger.warning(f"Shard worker {process.name} did not stop in {timeout}s, terminating")
+                process.terminate()
+        self._processes = []
+
+
+def run_worker_process(index: int, q, concurrency: int):
+    """Точка входа процесса-воркера"""
+    # Остановкой управляет фронт через очередь, Ctrl+C в терминале воркеры игнорируют
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(ShardWorker(index, q, concurrency).run())
+
+
+class ShardWorker:
+    """Процесс-воркер: свой Dispatcher, Bot и outbox воркер.
+
+    Обновления разных пользователей обрабатываются параллельно (до concurrency),
+    обновления одного пользователя - строго по очереди.
+    """
+
+    def __init__(self, index: int, q, concurrency: int = 16):
+        self._index = index
+        self._queue = q
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        # последняя задача каждого пользователя - следующая ждёт её завершения
+        self._tails: Dict[Optional[int], asyncio.Task] = {}
+        self.processed = 0
+        self.failed = 0
+
+    async def run(self):
+        # main.py - точка входа приложения, импортируем при старте процесса
+        from main import (
+            build_dispatcher, create_bot, create_storage, register_cache_gauges,
+            start_filter_sync, stop_filter_sync,
+        )
+        from clients.redis_pool import close_redis
+        from config.main import METRICS_HOST, METRICS_PORT
+        from database.main import engine
+        from monitoring.server import start_monitoring
+
+        if METRICS_PORT > 0:
+            start_monitoring(METRICS_HOST, METRICS_PORT + 1 + self._index, engine)
+            register_cache_gauges()
+        bot = create_bot()
+        storage = create_storage()
+        dp = build_dispatcher(storage)
+        grpc_client, outbox_worker = await start_filter_sync()
+        await dp.emit_startup(bot=bot, dispatcher=dp, **dp.workflow_data)
+        logger.info(f"Shard worker {self._index} started")
+
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                # не берём больше, чем можем обработать: ждём свободный слот до чтения очереди
+                await self._semaphore.acquire()
+                item = await loop.run_in_executor(None, self._queue.get)
+                if item is _STOP:
+                    self._semaphore.release()
+                    break
+                user_id, payload = item
+                try:
+                    update = Update.model_validate_json(payload, context={"bot": bot})
+                except Exception as e:
+                    self._semaphore.release()
+                    self.failed += 1
+                    logger.warning(f"Shard {self._index}: bad update payload: {e}")
+                    continue
+                task = asyncio.create_task(self._process(dp, bot, update, self._tails.get(user_id)))
+                self._tails[user_id] = task
+                task.add_done_callback(lambda t, uid=user_id: self._done(uid, t))
+            if self._tails:
+                await asyncio.gather(*self._tails.values(), return_exceptions=True)
+        finally:
+            await dp.emit_shutdown(bot=bot, dispatcher=dp, **dp.workflow_data)
+            await stop_filter_sync(grpc_client, outbox_worker)
+            await storage.close()
+            await close_redis()
+            await bot.session.close()
+            logger.info(f"Shard worker {self._index} stopped: processed={self.processed}, failed={self.failed}")
+
+    async def _process(self, dp, bot: Bot, update: Update, previous: Optional[asyncio.Task]):
+        try:
+            if previous is not None:
+                # ошибки предыдущего обновления не мешают следующему
+                await asyncio.wait({previous})
+            await dp.feed_update(bot, update)
+            self.processed += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Shard {self._index}: update {update.update_id} processing error: {e}")
+        finally:
+            self._semaphore.release()
+
+    def _done(self, user_id: Optional[int], task: asyncio.Task):
+        if self._tails.get(user_id) is task:
+            del self._tails[user_id]
+
+
+async def run_polling_front(shards: ShardRouter, bot: Bot, allowed_updates: Optional[List[str]] = None,
+                            stats_interval: float = 60.0):
+    """Фронт в режиме polling: getUpdates и раскладка по воркерам (до отмены задачи)"""
+    offset = None
+    loop = asyncio.get_running_loop()
+    next_stats = loop.time() + stats_interval
+    while True:
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=30, allowed_updates=allowed_updates)
+        except Exception as e:
+            logger.error(f"getUpdates error: {e}")
+            await asyncio.sleep(1)
+            continue
+        for update in updates:
+            await shards.route(update.model_dump(mode="json", by_alias=True, exclude_none=True))
+            offset = update.update_id + 1
+        if loop.time() >= next_stats:
+            logger.info(f"Shard stats: {shards.stats()}")
+            next_stats = loop.time() + stats_interval
+
+
+def build_webhook_front(shards: ShardRouter, path: str, secret: str = "") -> web.Application:
+    """Фронт в режиме webhook: обновление без разбора уходит в очередь своего воркера"""
+
+    async def handle(request: web.Request) -> web.Response:
+        if not check_secret(request, secret):
+            return web.Response(status=401)
+        try:
+            update = await request.json()
+        except Exception:
+            return web.Response(status=400)
+        if not isinstance(update, dict) or "update_id" not in update:
+            return web.Response(status=400)
+        if not shards.route_nowait(update):
+            return web.Response(status=503)
+        return web.Response()
+
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response(shards.stats())
+
+    app = web.Application()
+    app.router.add_post(path, handle)
+    app.router.add_get("/healthz", health)
+    return app
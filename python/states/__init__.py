@@ -1 +1,2 @@
-from .main import FilterStates, BlacklistStates
\ No newline at end of file
+from .main import FilterStates, BlacklistStates
+from .storage import FSMWriteBatchMiddleware, TieredStorage
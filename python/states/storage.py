@@ -0,0 +1,243 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Set, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+from aiogram.types import TelegramObject
+from redis.exceptions import RedisError
+
+from config.main import FSM_CACHE_SIZE, FSM_CACHE_TTL
+from monitoring.metrics import observe_fsm_redis
+
+logger = logging.getLogger(__name__)
+
+# Значение ещё не читалось из Redis
+_UNKNOWN: Any = object()
+
+# Storage, в которые писал обработчик текущего обновления (см. FSMWriteBatchMiddleware)
+_batch: ContextVar[Optional[Set["TieredStorage"]]] = ContextVar("fsm_write_batch", default=None)
+
+
+class _Record:
+    __slots__ = ('state', 'data', 'expires')
+
+    def __init__(self, state: Optional[str], data: Any, expires: float):
+        self.state = state
+        self.data = data
+        self.expires = expires
+
+
+class TieredStorage(BaseStorage):
+    """FSM storage: состояние пользователей в памяти процесса поверх RedisStorage.
+
+    Чтения отдаются из LRU кэша (max_size записей, не дольше ttl секунд), промах читает
+    состояние и данные из Redis одним pipeline. Запись сразу меняет кэш, а в Redis уходит
+    одним pipeline на обновление: все set_state/set_data обработчика (через
+    FSMWriteBatchMiddleware) - один round trip; вне обновления запись отправляется сразу.
+    В Redis пишется последнее значение из кэша, pipeline отправляются по очереди, поэтому
+    параллельные обновления одного пользователя не перезаписывают новое старым, а
+    ожидающие своей очереди записи уходят вместе.
+
+    Кэш верен, пока обновления пользователя обрабатывает один процесс (polling, воркер
+    шардинга по tg_id, webhook с привязкой); изменения из других процессов видны через
+    ttl. ttl = 0 - чтения всегда идут в Redis, кэш держит только неотправленные записи.
+    Неудачная запись остаётся в очереди и повторяется со следующей.
+    """
+
+    def __init__(self, redis_storage: RedisStorage, max_size: int = FSM_CACHE_SIZE, ttl: float = FSM_CACHE_TTL):
+        self._redis = redis_storage.redis
+        self._key_builder = redis_storage.key_builder
+        self._state_ttl = redis_storage.state_ttl
+        self._data_ttl = redis_storage.data_ttl
+        self._json_loads = redis_storage.json_loads
+        self._json_dumps = redis_storage.json_dumps
+        self._max_size = max_size
+        self._ttl = ttl
+        self._cache: "OrderedDict[StorageKey, _Record]" = OrderedDict()
+        # записанные, но ещё не отправленные значения: ключ -> запись на момент изменения
+        self._dirty: Dict[StorageKey, Tuple[Optional[str], Any]] = {}
+        self._flush_lock = asyncio.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.round_trips = 0
+        self.flush_errors = 0
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'round_trips': self.round_trips,
+            'pending': len(self._dirty),
+            'flush_errors': self.flush_errors,
+        }
+
+    def _get(self, key: StorageKey) -> Optional[_Record]:
+        record = self._cache.get(key)
+        if record is None:
+            return None
+        if record.expires <= time.monotonic() and key not in self._dirty:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return record
+
+    def _put(self, key: StorageKey, state: Optional[str], data: Any) -> _Record:
+        record = _Record(state, data, time.monotonic() + self._ttl)
+        self._cache[key] = record
+        self._cache.move_to_end(key)
+        while len(self._cache) > self._max_size:
+            oldest = next(iter(self._cache))
+            if oldest in self._dirty:
+                break  # не вытесняем неотправленное - уйдёт после flush
+            del self._cache[oldest]
+        return record
+
+    async def _load(self, key: StorageKey) -> _Record:
+        """Состояние и данные из Redis за один round trip"""
+        self.misses += 1
+        started = time.perf_counter()
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.get(self._key_builder.build(key, "state"))
+            pipe.get(self._key_builder.build(key, "data"))
+            try:
+                state, data = await pipe.execute()
+            except (RedisError, OSError):
+                observe_fsm_redis("load", "error", started)
+                raise
+        self.round_trips += 1
+        observe_fsm_redis("load", "ok", started)
+        if isinstance(state, bytes):
+            state = state.decode("utf-8")
+        data = self._json_loads(data) if data is not None else {}
+        record = self._get(key)
+        if record is None:
+            return self._put(key, state, data)
+        # пока шло чтение, обработчик записал своё - оно новее
+        if record.state is _UNKNOWN:
+            record.state = state
+        if record.data is _UNKNOWN:
+            record.data = data
+        return record
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = self._get(key)
+        if record is None or record.state is _UNKNOWN:
+            # известны только записанные данные - дочитываем состояние
+            return (await self._load(key)).state
+        self.hits += 1
+        return record.state
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = self._get(key)
+        if record is None or record.data is _UNKNOWN:
+            record = await self._load(key)
+        else:
+            self.hits += 1
+        return dict(record.data)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        record = self._get(key)
+        if record is None:
+            self._put(key, state, _UNKNOWN)
+        else:
+            record.state = state
+            record.expires = time.monotonic() + self._ttl
+        await self._written(key)
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        record = self._get(key)
+        if record is None:
+            self._put(key, _UNKNOWN, dict(data))
+        else:
+            record.data = dict(data)
+            record.expires = time.monotonic() + self._ttl
+        await self._written(key)
+
+    async def _written(self, key: StorageKey):
+        record = self._cache[key]
+        self._dirty[key] = (record.state, record.data)
+        batch = _batch.get()
+        if batch is None:
+            await self.flush()
+        else:
+            batch.add(self)
+
+    async def flush(self):
+        """Отправляет все неотправленные записи одним pipeline"""
+        async with self._flush_lock:
+            await self._flush()
+
+    async def _flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+        started = time.perf_counter()
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for key, (state, data) in dirty.items():
+                record = self._cache.get(key)
+                if record is not None:
+                    state, data = record.state, record.data
+                if state is not _UNKNOWN:
+                    state_key = self._key_builder.build(key, "state")
+                    if state is None:
+                        pipe.delete(state_key)
+                    else:
+                        pipe.set(state_key, state, ex=self._state_ttl)
+                if data is not _UNKNOWN:
+                    data_key = self._key_builder.build(key, "data")
+                    if not data:
+                        pipe.delete(data_key)
+                    else:
+                        pipe.set(data_key, self._json_dumps(data), ex=self._data_ttl)
+            try:
+                await pipe.execute()
+            except (RedisError, OSError) as e:
+                self.flush_errors += 1
+                observe_fsm_redis("flush", "error", started)
+                # вернуть в очередь, не затирая записанное за время запроса
+                for key, value in dirty.items():
+                    self._dirty.setdefault(key, value)
+                logger.warning(f"FSM storage flush of {len(dirty)} keys failed: {e}")
+                raise
+        self.round_trips += 1
+        observe_fsm_redis("flush", "ok", started)
+
+    async def close(self) -> None:
+        """Дописывает неотправленное; пул Redis общий и закрывается отдельно (close_redis)"""
+        try:
+            await self.flush()
+        except (RedisError, OSError):
+            pass
+
+
+class FSMWriteBatchMiddleware(BaseMiddleware):
+    """Outer middleware обновления: записи FSM обработчика уходят в Redis одним pipeline"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        batch: Set[TieredStorage] = set()
+        token = _batch.set(batch)
+        try:
+            return await handler(event, data)
+        finally:
+            _batch.reset(token)
+            for storage in batch:
+                try:
+                    await storage.flush()
+                except (RedisError, OSError):
+                    pass  # записи остались в кэше и очереди storage, уйдут со следующим flush
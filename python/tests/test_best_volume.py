@@ -0,0 +1,61 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+# config.main (через пакет analytics) требует токен при импорте; в сеть тесты не ходят
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:test")
+
+from analytics.best_volume import best_volume, best_volume_list
+from analytics.orderbook import BookSide, PairBook
+from models.models import Order
+
+
+def _random_book(rng: random.Random) -> PairBook:
+    ask, bid = 100.0, 100.0 + rng.uniform(-1, 3)
+    asks, bids = [], []
+    for _ in range(rng.randint(1, 30)):
+        ask += rng.uniform(0, 1)
+        asks.append(Order(ask, rng.uniform(0.05, 3)))
+    for _ in range(rng.randint(1, 30)):
+        bid -= rng.uniform(0, 1)
+        bids.append(Order(bid, rng.uniform(0.05, 3)))
+    return PairBook(BookSide.from_orders(asks), BookSide.from_orders(bids),
+                    rng.choice([0, 0.001, 0.002]), rng.choice([0, 0.01, 0.1, 0.5, 2.0]))
+
+
+def _grid_best(book: PairBook, volume_min: float, volume_max: float) -> float:
+    """Перебор: чистый профит на плотной сетке объёмов в монетах внутри диапазона"""
+    grid = book.evaluate_coins(np.linspace(0, book.max_coins(), 20001))
+    inside = grid.valid & (grid.ask_vol_usdt >= volume_min) & ((volume_max == 0) | (grid.ask_vol_usdt <= volume_max))
+    net = np.where(inside, grid.profit - book.maker_fee * grid.ask_vol_usdt, -np.inf)
+    return float(net.max())
+
+
+@pytest.mark.parametrize('seed', range(60))
+def test_best_volume_not_worse_than_grid(seed):
+    rng = random.Random(seed)
+    book = _random_book(rng)
+    volume_min = rng.choice([0, 0, 50, 200])
+    volume_max = rng.choice([0, 0, 100, 400, 1e6])
+    expected = _grid_best(book, volume_min, volume_max)
+
+    result = best_volume(book, volume_min, volume_max)
+    if result is None:
+        assert expected == -np.inf
+        return
+    assert result.net_profit >= expected - 1e-9
+    assert volume_min == 0 or result.volume_usdt >= volume_min - 1e-6
+    assert volume_max == 0 or result.volume_usdt <= volume_max + 1e-6
+    # найденная точка действительно даёт заявленный профит
+    grid = book.evaluate_coins(np.array([result.coins]))
+    assert grid.valid[0]
+    assert grid.profit[0] - book.maker_fee * grid.ask_vol_usdt[0] == pytest.approx(result.net_profit)
+
+
+def test_best_volume_list_matches_single_ranges():
+    book = _random_book(random.Random(1))
+    ranges = [(0, 0), (50, 0), (0, 400), (100, 300), (1e9, 0)]
+    for got, (volume_min, volume_max) in zip(best_volume_list(book, ranges), ranges):
+        assert got == best_volume(book, volume_min, volume_max)
@@ -0,0 +1,67 @@
+import os
+import math
+import random
+
+import numpy as np
+import pytest
+
+# config.main (через пакет analytics) требует токен при импорте; в сеть тесты не ходят
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:test")
+
+from analytics.orderbook import BookSide, PairBook, calculate_price
+from models.models import Order
+
+
+def _random_side(rng: random.Random, ascending: bool) -> list:
+    prices = sorted((rng.uniform(1, 200) for _ in range(rng.randint(1, 30))), reverse=not ascending)
+    return [Order(price, rng.choice([rng.uniform(0.01, 5), 1.0, 2.0])) for price in prices]
+
+
+def _go_profit(asks: list, bids: list, fee: float, coins: float):
+    """Показатели пары как в Go (bot.go): продаётся coins - fee монет по bids"""
+    buy_price = calculate_price(asks, coins)
+    sell_price = calculate_price(bids, coins - fee)
+    if buy_price == -1 or sell_price == -1:
+        return None
+    return buy_price, sell_price, sell_price * (coins - fee) - buy_price * coins
+
+
+def test_sell_side_after_withdrawal_fee():
+    book = PairBook(BookSide.from_orders([Order(1.0, 10)]),
+                    BookSide.from_orders([Order(2.0, 8), Order(1.0, 100)]), 0.0, 2.0)
+    grid = book.evaluate_coins(np.array([10.0]))
+    assert grid.sell_price[0] == pytest.approx(2.0)
+    assert grid.bid_vol_usdt[0] == pytest.approx(16.0)
+    assert grid.profit[0] == pytest.approx(6.0)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_evaluate_coins_matches_calculate_price(seed):
+    rng = random.Random(seed)
+    asks = _random_side(rng, ascending=True)
+    bids = _random_side(rng, ascending=False)
+    fee = rng.choice([0.0, rng.uniform(0, 3)])
+    book = PairBook(BookSide.from_orders(asks), BookSide.from_orders(bids), 0.001, fee)
+    limit = book.max_coins()
+    coins = [rng.uniform(0, limit * 1.2) for _ in range(50)]
+    coins += [float(q) for q in book.asks.cum_amount[1:]] + [float(q) + fee for q in book.bids.cum_amount[1:]]
+    coins = [q for q in coins if q > fee]
+
+    grid = book.evaluate_coins(np.array(coins))
+    for i, q in enumerate(coins):
+        expected = _go_profit(asks, bids, fee, q)
+        if expected is None:
+            assert not grid.valid[i], q
+            continue
+        buy_price, sell_price, profit = expected
+        assert grid.valid[i], q
+        assert math.isclose(grid.buy_price[i], buy_price, rel_tol=1e-9)
+        assert math.isclose(grid.sell_price[i], sell_price, rel_tol=1e-9)
+        assert math.isclose(grid.profit[i], profit, rel_tol=1e-9, abs_tol=1e-9)
+
+
+def test_max_coins_counts_withdrawal_fee():
+    book = PairBook(BookSide.from_orders([Order(1.0, 50)]), BookSide.from_orders([Order(2.0, 8)]), 0.0, 2.0)
+    assert book.max_coins() == pytest.approx(10.0)
+    assert book.evaluate_coins(np.array([10.0])).valid[0]
+    assert not book.evaluate_coins(np.array([10.5])).valid[0]
@@ -0,0 +1,163 @@
+import asyncio
+import os
+import re
+
+import pytest
+
+# config.main (через пакет database) требует токен при импорте; в сеть тесты не ходят,
+# кроме Postgres из TEST_DATABASE_URL
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:test")
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from database import repository
+from database.models import Base, FilterSyncOutbox, User
+
+# Например postgresql+asyncpg://postgres@/postgres?host=/tmp/pgdata; без неё тесты с БД пропускаются
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "")
+
+
+def _sql(statement) -> str:
+    compiled = statement.compile(dialect=postgresql.dialect())
+    return re.sub(r"\s+", " ", str(compiled)).strip()
+
+
+def _normalized(sql: str) -> str:
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+def test_update_sql_renders_update_and_outbox_insert():
+    statement = repository._update_sql(
+        "spread_min = :spread_min, spread_max = :spread_max", ("spread_min", "spread_max"),
+    )
+    assert _sql(statement) == _normalized("""
+        WITH u AS (
+            UPDATE users SET spread_min = %(spread_min)s, spread_max = %(spread_max)s
+            WHERE tg_id = %(tg_id)s
+            RETURNING *
+        ), o AS (
+            INSERT INTO filter_sync_outbox (tg_id, filter, data)
+            SELECT u.tg_id, s.filter, s.data
+            FROM u CROSS JOIN LATERAL (VALUES ('SpreadMin', to_jsonb(u.spread_min)::text),
+                ('SpreadMax', to_jsonb(u.spread_max)::text)) AS s(filter, data)
+        )
+        SELECT * FROM u
+    """)
+
+
+def test_update_sql_with_prev_locks_row_and_inserts_only_changes():
+    statement = repository._update_sql(
+        "blacklisted_coins = prev.value - CAST(:items AS text[])", ("blacklisted_coins",), "blacklisted_coins",
+    )
+    assert _sql(statement) == _normalized("""
+        WITH prev AS (
+            SELECT tg_id, coalesce(blacklisted_coins, '[]'::jsonb) AS value
+            FROM users WHERE tg_id = %(tg_id)s
+            FOR UPDATE
+        ), u AS (
+            UPDATE users SET blacklisted_coins = prev.value - CAST(%(items)s AS text[])
+            FROM prev WHERE users.tg_id = prev.tg_id
+            RETURNING users.*, prev.value AS prev_value
+        ), o AS (
+            INSERT INTO filter_sync_outbox (tg_id, filter, data)
+            SELECT u.tg_id, s.filter, s.data
+            FROM u CROSS JOIN LATERAL (VALUES ('BlacklistedCoins', to_jsonb(u.blacklisted_coins)::text)) AS s(filter, data)
+            WHERE u.blacklisted_coins IS DISTINCT FROM u.prev_value
+        )
+        SELECT * FROM u
+    """)
+
+
+def test_update_sql_is_cached():
+    args = ("check_contract = NOT coalesce(check_contract, true)", ("check_contract",))
+    assert repository._update_sql(*args) is repository._update_sql(*args)
+
+
+def test_unknown_columns_are_rejected():
+    async def run():
+        with pytest.raises(ValueError):
+            await repository.set_filters(None, 1, blacklisted_coins=[])
+        with pytest.raises(ValueError):
+            await repository.add_to_blacklist(None, 1, "spread_min", ["BTC"])
+
+    asyncio.run(run())
+
+
+async def _outbox(session: AsyncSession, tg_id: int):
+    rows = await session.execute(
+        select(FilterSyncOutbox.filter, FilterSyncOutbox.data)
+        .where(FilterSyncOutbox.tg_id == tg_id).order_by(FilterSyncOutbox.id)
+    )
+    return [tuple(row) for row in rows]
+
+
+async def _clear_outbox(session: AsyncSession, tg_id: int):
+    await session.execute(FilterSyncOutbox.__table__.delete().where(FilterSyncOutbox.tg_id == tg_id))
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+def test_round_trips_against_postgres():
+    tg_id = -424242  # отрицательный id не пересекается с настоящими пользователями
+
+    async def run():
+        engine = create_async_engine(TEST_DATABASE_URL)
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            # всё в одной транзакции, которая откатывается в конце
+            async with AsyncSession(engine) as session, session.begin():
+                assert await repository.toggle_param(session, tg_id, 4) is None
+                assert await _outbox(session, tg_id) == []
+
+                session.add(User(tg_id=tg_id))
+                await session.flush()
+
+                settings = await repository.toggle_param(session, tg_id, 4)
+                assert settings.blacklisted_params == 4
+                # часть группы выключена - включаются все, затем все выключаются
+                settings = await repository.toggle_params_group(session, tg_id, 4 | 8)
+                assert settings.blacklisted_params == 0
+                settings = await repository.toggle_params_group(session, tg_id, 4 | 8)
+                assert settings.blacklisted_params == 12
+                settings = await repository.toggle_check_contract(session, tg_id)
+                assert settings.check_contract is False
+                assert await _outbox(session, tg_id) == [
+                    ('BlacklistedParams', '4'), ('BlacklistedParams', '0'), ('BlacklistedParams', '12'),
+                    ('CheckContract', 'false'),
+                ]
+                await _clear_outbox(session, tg_id)
+
+                settings = await repository.set_filters(session, tg_id, spread_min=1.5, spread_max=5)
+                assert (settings.spread_min, settings.spread_max) == (1.5, 5)
+                assert await _outbox(session, tg_id) == [('SpreadMin', '1.5'), ('SpreadMax', '5')]
+                await _clear_outbox(session, tg_id)
+
+                settings, before = await repository.add_to_blacklist(
+                    session, tg_id, 'blacklisted_coins', ['BTC', 'ETH', 'BTC'],
+                )
+                assert (before, settings.blacklisted_coins) == ([], ('BTC', 'ETH'))
+                settings, before = await repository.remove_from_blacklist(
+                    session, tg_id, 'blacklisted_coins', ['BTC'],
+                )
+                assert (before, settings.blacklisted_coins) == (['BTC', 'ETH'], ('ETH',))
+                assert await _outbox(session, tg_id) == [
+                    ('BlacklistedCoins', '["BTC", "ETH"]'), ('BlacklistedCoins', '["ETH"]'),
+                ]
+                await _clear_outbox(session, tg_id)
+
+                # значение не изменилось - события нет
+                settings, before = await repository.add_to_blacklist(session, tg_id, 'blacklisted_coins', ['ETH'])
+                assert (before, settings.blacklisted_coins) == (['ETH'], ('ETH',))
+                settings, before = await repository.remove_from_blacklist(
+                    session, tg_id, 'blacklisted_nets', ['TRC20'],
+                )
+                assert (before, settings.blacklisted_nets) == ([], ())
+                assert await _outbox(session, tg_id) == []
+
+                await session.rollback()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
@@ -0,0 +1,128 @@
+import asyncio
+import os
+from datetime import datetime
+
+import pytest
+
+# config.main (через пакет clients) требует токен при импорте; в сеть тесты не ходят
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "0:test")
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import AnswerCallbackQuery, EditMessageText, SendMessage
+from aiogram.types import CallbackQuery, Chat, Message, Update
+
+from clients.telegram import CallbackAnswerMiddleware, EditDeduplicator
+
+
+class FakeApi:
+    """Вместо Bot API: запоминает методы, sendMessage возвращает сообщение 5"""
+
+    def __init__(self, error: str = ""):
+        self.calls = []
+        self.error = error
+
+    async def __call__(self, bot, method, timeout=None):
+        self.calls.append(method)
+        if isinstance(method, SendMessage):
+            return Message(message_id=5, date=datetime.now(), chat=Chat(id=method.chat_id, type="private"),
+                           text=method.text)
+        if self.error and isinstance(method, EditMessageText):
+            raise TelegramBadRequest(method=method, message=self.error)
+        return True
+
+    def methods(self, kind):
+        return [call for call in self.calls if isinstance(call, kind)]
+
+
+def _bot(api: FakeApi, dedup: EditDeduplicator) -> Bot:
+    bot = Bot(token="1:test")
+    bot.session.make_request = api
+    bot.session.middleware(dedup)
+    return bot
+
+
+def _callback_update(bot: Bot, data: str = "toggle") -> Update:
+    user = {"id": 1, "is_bot": False, "first_name": "u"}
+    message = {"message_id": 5, "date": 0, "chat": {"id": 1, "type": "private"}, "text": "hi"}
+    return Update.model_validate({"update_id": 1, "callback_query": {
+        "id": "q1", "from": user, "chat_instance": "c", "message": message, "data": data,
+    }}, context={"bot": bot})
+
+
+def test_not_modified_is_success():
+    async def run():
+        api = FakeApi(error="Bad Request: message is not modified: specified new message content is the same")
+        dedup = EditDeduplicator(max_messages=10)
+        bot = _bot(api, dedup)
+        # сообщения нет в памяти (например, после перезапуска) - API отвечает "not modified"
+        assert await bot(EditMessageText(chat_id=1, message_id=5, text="hi")) is True
+        assert dedup.stats()['not_modified'] == 1
+        # теперь текст известен - повтор не уходит в API
+        assert await bot(EditMessageText(chat_id=1, message_id=5, text="hi")) is True
+        assert len(api.methods(EditMessageText)) == 1
+        assert dedup.stats()['saved'] == 1
+        await bot.session.close()
+
+    asyncio.run(run())
+
+
+def test_other_bad_request_is_raised_and_forgotten():
+    async def run():
+        api = FakeApi()
+        dedup = EditDeduplicator(max_messages=10)
+        bot = _bot(api, dedup)
+        await bot(SendMessage(chat_id=1, text="hi"))
+        api.error = "Bad Request: message to edit not found"
+        with pytest.raises(TelegramBadRequest):
+            await bot(EditMessageText(chat_id=1, message_id=5, text="new"))
+        assert dedup.stats()['size'] == 0
+        await bot.session.close()
+
+    asyncio.run(run())
+
+
+def _dispatcher(answer: bool) -> Dispatcher:
+    router = Router()
+
+    @router.callback_query(F.data == "toggle")
+    async def handler(callback: CallbackQuery):
+        await callback.message.edit_text("hi")
+        if answer:
+            await callback.answer("done")
+
+    dp = Dispatcher()
+    dp.callback_query.outer_middleware(CallbackAnswerMiddleware())
+    dp.include_router(router)
+    return dp
+
+
+@pytest.mark.parametrize("answer", [False, True])
+def test_skipped_edit_answers_callback_once(answer):
+    async def run():
+        api = FakeApi()
+        dedup = EditDeduplicator(max_messages=10)
+        bot = _bot(api, dedup)
+        await bot(SendMessage(chat_id=1, text="hi"))
+        await _dispatcher(answer).feed_update(bot, _callback_update(bot))
+        # правка пропущена, на callback ответили ровно один раз
+        assert api.methods(EditMessageText) == []
+        answers = api.methods(AnswerCallbackQuery)
+        assert [a.callback_query_id for a in answers] == ["q1"]
+        assert answers[0].text == ("done" if answer else None)
+        await bot.session.close()
+
+    asyncio.run(run())
+
+
+def test_sent_edit_leaves_answer_to_handler():
+    async def run():
+        api = FakeApi()
+        bot = _bot(api, EditDeduplicator(max_messages=10))
+        await bot(SendMessage(chat_id=1, text="old"))
+        await _dispatcher(False).feed_update(bot, _callback_update(bot))
+        assert len(api.methods(EditMessageText)) == 1
+        assert api.methods(AnswerCallbackQuery) == []
+        await bot.session.close()
+
+    asyncio.run(run())
@@ -0,0 +1,2 @@
+from .main import filters_text, exchanges_text, enabled_exchanges, text_cache_stats
+from .pair import compile_pair_template, render_pair, group_by_params, render_pair_groups
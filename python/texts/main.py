@@ -0,0 +1,98 @@
+from functools import lru_cache
+from typing import Dict, Tuple
+
+from config.main import KEYBOARD_CACHE_SIZE
+from models.consts import EXCHANGES_LIST
+from monitoring.metrics import lru_cache_stats
+from texts.pair import compile_pair_template
+
+# Тексты меню кэшируются по кортежу значений, от которых зависят,
+# повторный показ того же экрана - поиск в словаре
+
+_EXCHANGES_MASK = 0
+for _bit, _ in EXCHANGES_LIST:
+    _EXCHANGES_MASK |= _bit
+_EXCHANGES_TOTAL = len(EXCHANGES_LIST)
+
+FiltersKey = Tuple[float, float, float, float, float, float, float, float, bool]
+
+
+def _format_filter(min_val, max_val, suffix=""):
+    if min_val > 0 and max_val > 0:
+        if min_val == max_val:
+            return f"={min_val:.2f}{suffix}"
+        else:
+            return f"{min_val:.2f} - {max_val:.2f}{suffix}"
+    elif min_val > 0:
+        return f"> {min_val:.2f}{suffix}"
+    elif max_val > 0:
+        return f"< {max_val:.2f}{suffix}"
+    else:
+        return "отключён"
+
+
+def filters_key(user) -> FiltersKey:
+    """Значения настроек, от которых зависит текст текущих фильтров"""
+    return (
+        user.spread_min, user.spread_max,
+        user.profit_min, user.profit_max,
+        user.volume_min, user.volume_max,
+        user.total_fee_max, user.daily_turnover_min,
+        bool(user.check_contract),
+    )
+
+
+def filters_text(user) -> str:
+    """Текст "Текущие фильтры" (Markdown) для UserSettings или User"""
+    return _filters_text(filters_key(user))
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def _filters_text(key: FiltersKey) -> str:
+    (spread_min, spread_max, profit_min, profit_max, volume_min, volume_max,
+     total_fee_max, daily_turnover_min, check_contract) = key
+    lines = [
+        "⚙️ *Текущие фильтры:*\n",
+        "❗ Фильтр неактивен, если его значение равно нулю\n",
+        f"🔀 Спред: *{_format_filter(spread_min, spread_max, ' %')}*",
+        f"💰 Профит: *{_format_filter(profit_min, profit_max, ' $')}*",
+        f"📊 Объем: *{_format_filter(volume_min, volume_max, ' $')}*",
+        f"💸 Макс. комиссия: *{total_fee_max:.2f}$*" if total_fee_max > 0 else "💸 Макс. комиссия: *отключена*",
+        f"📈 Мин. 24ч. оборот: *{daily_turnover_min:.2f}$*" if daily_turnover_min > 0 else "📈 Мин. 24ч. оборот: *отключён*",
+        f"📃 Проверять контракты: *{'Да' if check_contract else 'Нет'}*"
+    ]
+    return "\n".join(lines)
+
+
+def enabled_exchanges(blacklist_mask: int) -> int:
+    """Количество разрешённых бирж: всего минус установленные биты черного списка"""
+    return _EXCHANGES_TOTAL - (blacklist_mask & _EXCHANGES_MASK).bit_count()
+
+
+def exchanges_text(withdraw_mask: int, deposit_mask: int) -> str:
+    """Заголовок "Настройка бирж" (HTML). Зависит только от числа разрешённых бирж"""
+    return _exchanges_text(enabled_exchanges(withdraw_mask), enabled_exchanges(deposit_mask))
+
+
+@lru_cache(maxsize=None)
+def _exchanges_text(enabled_withdraw: int, enabled_deposit: int) -> str:
+    return (
+        "🏦 <b>Настройка бирж</b>\n\n"
+        f"Разрешено для вывода: <b>{enabled_withdraw}/{_EXCHANGES_TOTAL}</b>\n"
+        f"Разрешено для депозита: <b>{enabled_deposit}/{_EXCHANGES_TOTAL}</b>\n\n"
+        "Нажмите на ✅/❌ чтобы изменить статус биржи:\n"
+        "• <b>✅ Вывод</b> - можно выводить с этой биржи\n"
+        "• <b>✅ Депозит</b> - можно переводить на эту биржу"
+    )
+
+
+_CACHED_TEXTS = {
+    'filters': _filters_text,
+    'exchanges': _exchanges_text,
+    'pair_template': compile_pair_template,
+}
+
+
+def text_cache_stats() -> Dict[str, Dict[str, float]]:
+    """Статистика кэшей текстов меню"""
+    return lru_cache_stats(_CACHED_TEXTS)
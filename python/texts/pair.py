@@ -0,0 +1,210 @@
+from collections import defaultdict
+from functools import lru_cache
+from string import Formatter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from analytics.best_volume import BestVolume, best_volume, best_volume_list
+from analytics.orderbook import PairBook
+from models.consts import (
+    BEST_COMMISSION_BIT, BEST_PROFIT_BIT, BEST_SPREAD_BIT,
+    CHECK_CONTRACT_BIT, COMMISSION_MAX_BIT, COMMISSION_MIN_BIT, DAILY_TURNOVER_BIT,
+    LIFETIME_BIT, PARAMETERS_LIST, PROFIT_MAX_BIT, PROFIT_MIN_BIT,
+    SPREAD_MAX_BIT, SPREAD_MIN_BIT, WITHDRAW_TIME_BIT,
+)
+from models.models import ServerData
+
+# Сообщение арбитражной пары зависит от пользователя только через blacklisted_params.
+# Для каждой маски шаблон собирается один раз и компилируется в %-строку (одна
+# подстановка без разбора шаблона), значения пары форматируются один раз на пару -
+# рассылка N пользователям стоит (число разных масок) подстановок.
+# Блок наилучшего объёма зависит ещё и от volume_min/volume_max: он считается по
+# стаканам пары один раз на диапазон и только если хоть один его параметр включён
+
+_PARAMS_MASK = 0
+for _bit, _ in PARAMETERS_LIST:
+    _PARAMS_MASK |= _bit
+
+_BEST_MASK = BEST_SPREAD_BIT | BEST_PROFIT_BIT | BEST_COMMISSION_BIT
+
+# ключ группы рассылки: (маска параметров, volume_min, volume_max)
+GroupKey = Tuple[int, float, float]
+
+_HEADER = (
+    "<b>{symbol} | {withdrawal_exchange} → {deposit_exchange} | {up_spread}% {up_profit}$</b>\n\n",
+
+    "🪙 Монета: <b>{symbol}</b>\n",
+    "🏦 Биржи: <b><a href=\"{withdrawal_exchange_url}\">{withdrawal_exchange}</a></b> → "
+    "<b><a href=\"{deposit_exchange_url}\">{deposit_exchange}</a></b>\n",
+    "🔗 Сеть: <b>{withdrawal_network}</b>\n\n",
+
+    # Блок 1 – первая биржа (Ask)
+    "<b><a href=\"{withdrawal_exchange_url}\">{withdrawal_exchange}</a></b> | USDT → {symbol}\n",
+    "    💰 Цена: <b>{low_buy_price}$ - {up_buy_price}$</b>\n",
+    "    📊 min. Объём:\n",
+    "        <b>{low_ask_vol_usdt}</b> USDT\n",
+    "        <b>{low_ask_vol_coin}</b> {symbol}\n",
+    "    📊 max. Объём:\n",
+    "        <b>{up_ask_vol_usdt}</b> USDT\n",
+    "        <b>{up_ask_vol_coin}</b> {symbol}\n\n",
+
+    # Блок 2 – вторая биржа (Bid)
+    "<b><a href=\"{deposit_exchange_url}\">{deposit_exchange}</a></b> | {symbol} → USDT\n",
+    "    💰 Цена: <b>{low_sell_price}$ - {up_sell_price}$</b>\n",
+    "    📊 min. Объём:\n",
+    "        <b>{low_bid_vol_usdt}</b> USDT\n",
+    "        <b>{low_bid_vol_coin}</b> {symbol}\n",
+    "    📊 max. Объём:\n",
+    "        <b>{up_bid_vol_usdt}</b> USDT\n",
+    "        <b>{up_bid_vol_coin}</b> {symbol}\n\n",
+)
+
+_MAX_BLOCK = (
+    (SPREAD_MAX_BIT, "    🔀 Спред: <b>{up_spread}%</b>"),
+    (PROFIT_MAX_BIT, "    💵 Профит: <b>{up_profit}$</b>"),
+    (COMMISSION_MAX_BIT, "    ✂️ Комиссия: <b>{up_total_fee}$</b>"),
+)
+
+_MIN_BLOCK = (
+    (SPREAD_MIN_BIT, "    🔀 Спред: <b>{low_spread}%</b>"),
+    (PROFIT_MIN_BIT, "    💵 Профит: <b>{low_profit}$</b>"),
+    (COMMISSION_MIN_BIT, "    ✂️ Комиссия: <b>{low_total_fee}$</b>"),
+)
+
+_BEST_BLOCK = (
+    (BEST_SPREAD_BIT, "    🔀 Спред: <b>{best_spread}</b>"),
+    (BEST_PROFIT_BIT, "    💵 Профит: <b>{best_profit}</b>"),
+    (BEST_COMMISSION_BIT, "    ✂️ Комиссия: <b>{best_total_fee}</b>"),
+)
+
+_FOOTER = (
+    (CHECK_CONTRACT_BIT, "{contracts}\n"),
+    (DAILY_TURNOVER_BIT, "🔄 24ч оборот: <b>{volume24h}</b>\n"),
+    (WITHDRAW_TIME_BIT, "⏳ Время вывода: ~<b>{withdrawal_time}</b>\n"),
+    (LIFETIME_BIT, "⏳ Время жизни: <b>{time_life}</b>"),
+)
+
+
+@lru_cache(maxsize=None)
+def compile_pair_template(params_mask: int) -> str:
+    """Скомпилированный шаблон сообщения пары для маски blacklisted_params (подстановка через %)"""
+    parts = list(_HEADER)
+
+    max_block = [line for bit, line in _MAX_BLOCK if not params_mask & bit]
+    if max_block:
+        parts.append("\n".join(["<b>max. Объём:</b>"] + max_block) + "\n")
+
+    min_block = [line for bit, line in _MIN_BLOCK if not params_mask & bit]
+    if min_block:
+        parts.append("\n".join(["<b>min. Объём:</b>"] + min_block) + "\n")
+
+    best_block = [line for bit, line in _BEST_BLOCK if not params_mask & bit]
+    if best_block:
+        parts.append("\n".join(["<b>🌟 Наилучший объём: {best_volume}</b>"] + best_block) + "\n")
+
+    parts.append("\n")
+    parts.extend(line for bit, line in _FOOTER if not params_mask & bit)
+
+    # Убираем последний \n если он есть
+    parts[-1] = parts[-1].rstrip("\n")
+    return _compile("".join(parts))
+
+
+def _compile(template: str) -> str:
+    """{name} -> %(name)s, литеральные % экранируются"""
+    return "".join(
+        literal.replace("%", "%%") + (f"%({name})s" if name else "")
+        for literal, name, _, _ in Formatter().parse(template)
+    )
+
+
+def pair_fields(data: ServerData) -> Dict[str, str]:
+    """Отформатированные значения пары для подстановки в любой шаблон"""
+    up, low = data.data.up, data.data.low
+    return {
+        'symbol': data.symbol,
+        'withdrawal_exchange': data.withdrawal_exchange,
+        'withdrawal_exchange_url': data.withdrawal_exchange_url,
+        'deposit_exchange': data.deposit_exchange,
+        'deposit_exchange_url': data.deposit_exchange_url,
+        'withdrawal_network': data.withdrawal_network,
+        'up_spread': f"{up.spread:.2f}",
+        'up_profit': f"{up.profit:.2f}",
+        'low_spread': f"{low.spread:.2f}",
+        'low_profit': f"{low.profit:.2f}",
+        'low_buy_price': f"{low.buy_price:.2f}",
+        'up_buy_price': f"{up.buy_price:.2f}",
+        'low_sell_price': f"{low.sell_price:.2f}",
+        'up_sell_price': f"{up.sell_price:.2f}",
+        'low_ask_vol_usdt': f"{low.ask_vol_usdt:.2f}",
+        'up_ask_vol_usdt': f"{up.ask_vol_usdt:.2f}",
+        'low_ask_vol_coin': f"{low.ask_vol_usdt / low.buy_price:.2f}",
+        'up_ask_vol_coin': f"{up.ask_vol_usdt / up.buy_price:.2f}",
+        'low_bid_vol_usdt': f"{low.bid_vol_usdt}",
+        'up_bid_vol_usdt': f"{up.bid_vol_usdt}",
+        'low_bid_vol_coin': f"{low.bid_vol_usdt / low.sell_price:.2f}",
+        'up_bid_vol_coin': f"{up.bid_vol_usdt / up.sell_price:.2f}",
+        # Расчет общей комиссии (аналогично Go версии)
+        'up_total_fee': f"{data.maker_fee * up.ask_vol_usdt + data.withdrawal_fee:.2f}",
+        'low_total_fee': f"{data.maker_fee * low.ask_vol_usdt + data.withdrawal_fee:.2f}",
+        'contracts': "✅ Контракты совпадают!" if data.same_contracts else "❌ Контракты не совпадают!",
+        'volume24h': f"{data.volume24h}",
+        'withdrawal_time': data.withdrawal_time,
+        'time_life': data.time_life,
+    }
+
+
+def best_fields(best: Optional[BestVolume]) -> Dict[str, str]:
+    """Значения блока наилучшего объёма (с единицами); без исполнимого объёма в диапазоне - прочерки"""
+    if best is None:
+        return dict.fromkeys(('best_volume', 'best_spread', 'best_profit', 'best_total_fee'), "—")
+    return {
+        'best_volume': f"{best.volume_usdt:.2f} USDT",
+        'best_spread': f"{best.spread:.2f}%",
+        'best_profit': f"{best.profit:.2f}$",
+        'best_total_fee': f"{best.total_fee:.2f}$",
+    }
+
+
+def render_pair(data: ServerData, params_mask: int, volume_min: float = 0.0, volume_max: float = 0.0) -> str:
+    """Сообщение пары (HTML) для одного пользователя"""
+    params_mask &= _PARAMS_MASK
+    fields = pair_fields(data)
+    if ~params_mask & _BEST_MASK:
+        fields.update(best_fields(best_volume(PairBook.from_pair(data), volume_min, volume_max)))
+    return compile_pair_template(params_mask) % fields
+
+
+def group_key(params_mask: int, volume_min: float, volume_max: float) -> GroupKey:
+    """Ключ группы; диапазон объёмов важен только при включённом блоке наилучшего объёма"""
+    params_mask &= _PARAMS_MASK
+    if ~params_mask & _BEST_MASK:
+        return params_mask, volume_min or 0.0, volume_max or 0.0
+    return params_mask, 0.0, 0.0
+
+
+def group_by_params(users: Iterable) -> Dict[GroupKey, List[int]]:
+    """tg_id пользователей, сгруппированные по маске blacklisted_params (и диапазону объёмов)"""
+    groups: Dict[GroupKey, List[int]] = defaultdict(list)
+    for user in users:
+        groups[group_key(user.blacklisted_params, user.volume_min, user.volume_max)].append(user.tg_id)
+    return groups
+
+
+def render_pair_groups(data: ServerData, groups: Dict[GroupKey, List[int]]) -> Dict[GroupKey, str]:
+    """Сообщение пары для каждой группы: ключ -> текст, одна подстановка на группу.
+
+    Наилучшие объёмы для всех диапазонов групп считаются одним вызовом best_volume_list.
+    """
+    fields = pair_fields(data)
+    ranges = sorted({(vmin, vmax) for mask, vmin, vmax in groups if ~mask & _BEST_MASK})
+    best = {}
+    if ranges:
+        results = best_volume_list(PairBook.from_pair(data), ranges)
+        best = {volume_range: best_fields(result) for volume_range, result in zip(ranges, results)}
+
+    texts = {}
+    for key in groups:
+        mask, vmin, vmax = key
+        group_fields = {**fields, **best[vmin, vmax]} if ~mask & _BEST_MASK else fields
+        texts[key] = compile_pair_template(mask) % group_fields
+    return texts
@@ -0,0 +1 @@
+from .main import WebhookServer, SECRET_HEADER, check_secret
@@ -0,0 +1,116 @@
+import asyncio
+import hmac
+import logging
+from typing import List, Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def check_secret(request: web.Request, secret: str) -> bool:
+    """Проверка секретного заголовка Telegram (пустой secret - проверка отключена)"""
+    return not secret or hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), secret)
+
+
+class WebhookServer:
+    """Приём обновлений Telegram через webhook (aiohttp) вместо long polling.
+
+    Запрос проверяется по секретному заголовку, обновление кладётся в ограниченную
+    очередь и сразу подтверждается ответом 200. Очередь разбирают workers корутин
+    через dp.feed_update - это ограничивает число одновременно обрабатываемых
+    обновлений. Если очередь заполнена, отвечаем 503 и Telegram повторит доставку.
+    """
+
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        path: str = "/webhook",
+        secret: str = "",
+        workers: int = 16,
+        queue_size: int = 1000,
+    ):
+        self._dp = dp
+        self._bot = bot
+        self._path = path
+        self._secret = secret
+        self._workers_count = max(1, workers)
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._workers: List[asyncio.Task] = []
+        self._runner: Optional[web.AppRunner] = None
+
+        self.received = 0   # принятых обновлений
+        self.rejected = 0   # отклонённых из-за переполнения очереди
+        self.failed = 0     # обновлений, обработка которых упала с ошибкой
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self._path, self._handle)
+        app.router.add_get("/healthz", self._health)
+        return app
+
+    def queue_size(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            'received': self.received,
+            'rejected': self.rejected,
+            'failed': self.failed,
+            'queued': self._queue.qsize(),
+        }
+
+    async def start(self, host: str, port: int):
+        await self._dp.emit_startup(bot=self._bot, dispatcher=self._dp, **self._dp.workflow_data)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self._workers_count)]
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        logger.info(f"Webhook server listening on {host}:{port}{self._path}, workers={self._workers_count}")
+
+    async def stop(self):
+        """Перестаёт принимать запросы и дорабатывает уже принятые обновления"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        await self._queue.join()
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await self._dp.emit_shutdown(bot=self._bot, dispatcher=self._dp, **self._dp.workflow_data)
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        if not check_secret(request, self._secret):
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self._bot})
+        except Exception as e:
+            logger.warning(f"Bad webhook payload: {e}")
+            return web.Response(status=400)
+        try:
+            self._queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return web.Response(status=503)
+        self.received += 1
+        return web.Response()
+
+    async def _health(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    async def _worker(self):
+        while True:
+            update = await self._queue.get()
+            try:
+                await self._dp.feed_update(self._bot, update)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Update {update.update_id} processing error: {e}")
+            finally:
+                self._queue.task_done()